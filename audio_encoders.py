@@ -0,0 +1,286 @@
+"""Compressed output encoders shared by the /api/tts endpoints.
+
+Formats are negotiated from an explicit `format` request field or the
+`Accept` header. Whole responses can be WAV, FLAC, MP3 or Ogg/Opus; streamed
+responses use Ogg/Opus, which libsndfile writes page by page without
+seeking back. Encoding for streams runs on a worker thread so it never
+stalls the generator that is producing audio.
+"""
+import io
+import queue
+import threading
+import time
+
+import numpy as np
+import soundfile as sf
+
+# name -> (libsndfile format, subtype, mimetype)
+FORMATS = {
+    'wav': ('WAV', 'PCM_16', 'audio/wav'),
+    'flac': ('FLAC', 'PCM_16', 'audio/flac'),
+    'mp3': ('MP3', 'MPEG_LAYER_III', 'audio/mpeg'),
+    'ogg': ('OGG', 'OPUS', 'audio/ogg'),
+}
+FORMAT_ALIASES = {'opus': 'ogg', 'mpeg': 'mp3', 'wave': 'wav'}
+# Formats that can be encoded incrementally for /api/tts/stream
+STREAMING_FORMATS = ('ogg',)
+# Stream `format` values served uncompressed by audio_stream.PCMStream rather than an encoder
+PCM_STREAM_FORMATS = ('wav', 'pcm')
+# Sample rates a format can be encoded at, where libsndfile restricts them
+FORMAT_SAMPLE_RATES = {'ogg': (8000, 12000, 16000, 24000, 48000)}
+
+# Accept-header mimetypes in preference order; WAV first so */* keeps today's behaviour
+_ACCEPT_TYPES = [
+    ('audio/wav', 'wav'), ('audio/x-wav', 'wav'), ('audio/wave', 'wav'),
+    ('audio/ogg', 'ogg'), ('audio/opus', 'ogg'),
+    ('audio/flac', 'flac'), ('audio/x-flac', 'flac'),
+    ('audio/mpeg', 'mp3'), ('audio/mp3', 'mp3'),
+]
+
+
+def negotiate_format(requested, accept_mimetypes=None, allowed=tuple(FORMATS)):
+    """Pick an output format name from a request field or Accept header.
+
+    `accept_mimetypes` is a werkzeug MIMEAccept (`request.accept_mimetypes`).
+    Returns None when neither names a format, so callers keep their default.
+    Raises ValueError for an explicit format that is unknown or not allowed.
+    """
+    if requested:
+        name = FORMAT_ALIASES.get(str(requested).lower(), str(requested).lower())
+        if name not in allowed:
+            raise ValueError(f"Unsupported format '{requested}' (expected one of {', '.join(allowed)})")
+        return name
+    if accept_mimetypes:
+        candidates = [mimetype for mimetype, name in _ACCEPT_TYPES if name in allowed]
+        best = accept_mimetypes.best_match(candidates)
+        if best and accept_mimetypes.best != '*/*':
+            return dict(_ACCEPT_TYPES)[best]
+    return None
+
+
+def negotiate_stream_format(requested, accept_mimetypes, stream_format=None):
+    """Pick (encoded format, PCM stream_format) for a /api/tts/stream request.
+
+    The encoded format is None for an uncompressed stream; a stream_format
+    of None means the service's default. An explicit `format` of "wav" or
+    "pcm" selects the continuous PCM stream of that kind, unless the
+    request's `stream_format` names one (e.g. "l16").
+    """
+    if not requested:
+        return negotiate_format(None, accept_mimetypes, allowed=STREAMING_FORMATS), stream_format
+    fmt = negotiate_format(requested, allowed=STREAMING_FORMATS + PCM_STREAM_FORMATS)
+    if fmt in PCM_STREAM_FORMATS:
+        return None, stream_format or fmt
+    return fmt, stream_format
+
+
+def output_sample_rate(fmt, requested, native):
+    """Rate to encode `fmt` at: the `requested` rate, or else the model's `native` one.
+
+    `requested` comes from resample.parse_sample_rate with a default of 0
+    (not given). Raises ValueError for a requested rate the format cannot
+    be encoded at. A native rate the format does not support is raised to
+    the next one it does (44.1 kHz Ogg/Opus is sent at 48 kHz); a native
+    rate of 0 (not known yet) is returned as is.
+    """
+    rates = FORMAT_SAMPLE_RATES.get(fmt)
+    if requested:
+        if rates and requested not in rates:
+            raise ValueError(
+                f"Format '{fmt}' supports sample rates of {', '.join(str(r) for r in rates)} Hz, got {requested}"
+            )
+        return requested
+    if rates and native and native not in rates:
+        return next((rate for rate in rates if rate >= native), rates[-1])
+    return native
+
+
+def mimetype_for(fmt):
+    return FORMATS[fmt][2]
+
+
+def encode_audio(audio, sample_rate, fmt):
+    """Encode a whole float or int16 array and return (bytes, encode_seconds)."""
+    started = time.perf_counter()
+    container, subtype, _ = FORMATS[fmt]
+    out = io.BytesIO()
+    sf.write(out, np.asarray(audio), int(sample_rate), format=container, subtype=subtype)
+    return out.getvalue(), time.perf_counter() - started
+
+
+def encode_pcm(pcm, sample_rate, fmt):
+    """Encode an audio_stream.PCMBuffer for a whole response without copying it.
+
+    Returns (parts, content_length, encode_seconds) where `parts` is a list
+    of bytes-like buffers: for WAV an exact-size header and a view of the
+    buffer itself, otherwise the encoder's output buffer. Serve them with
+    audio_stream.iter_chunks.
+    """
+    started = time.perf_counter()
+    if fmt == 'wav':
+        parts = pcm.wav_parts(sample_rate)
+    else:
+        container, subtype, _ = FORMATS[fmt]
+        out = io.BytesIO()
+        sf.write(out, pcm.samples, int(sample_rate), format=container, subtype=subtype)
+        parts = [out.getbuffer()]
+    return parts, sum(len(part) for part in parts), time.perf_counter() - started
+
+
+class _StreamSink:
+    """Write-only file object that hands out bytes as libsndfile produces them.
+
+    Writes that land before the last drained offset (header fix-ups some
+    encoders do on close) cannot be sent any more and are dropped.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._base = 0  # absolute offset of _buf[0]
+        self._pos = 0
+
+    def write(self, data):
+        data = bytes(data)
+        written = len(data)
+        start = self._pos - self._base
+        if start < 0:
+            data = data[-start:]
+            start = 0
+        end = start + len(data)
+        if end > len(self._buf):
+            self._buf.extend(b'\0' * (end - len(self._buf)))
+        self._buf[start:end] = data
+        self._pos += written
+        return written
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._base + len(self._buf)
+        self._pos = offset
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def read(self, size=-1):
+        return b''
+
+    def drain(self):
+        data = bytes(self._buf)
+        self._base += len(self._buf)
+        self._buf.clear()
+        return data
+
+
+class StreamEncoder:
+    """Incremental encoder: feed float blocks, collect encoded bytes."""
+
+    def __init__(self, fmt, sample_rate, channels=1):
+        if fmt not in STREAMING_FORMATS:
+            raise ValueError(f"Format '{fmt}' cannot be streamed (expected one of {', '.join(STREAMING_FORMATS)})")
+        container, subtype, mimetype = FORMATS[fmt]
+        self.mimetype = mimetype
+        self.bytes_out = 0
+        self.encode_seconds = 0.0
+        self._sink = _StreamSink()
+        self._file = sf.SoundFile(
+            self._sink, mode='w', samplerate=int(sample_rate), channels=channels,
+            format=container, subtype=subtype,
+        )
+
+    def _drain(self):
+        data = self._sink.drain()
+        self.bytes_out += len(data)
+        return data
+
+    def encode(self, block):
+        started = time.perf_counter()
+        self._file.write(np.asarray(block, dtype=np.float32))
+        data = self._drain()
+        self.encode_seconds += time.perf_counter() - started
+        return data
+
+    def close(self):
+        started = time.perf_counter()
+        self._file.close()
+        data = self._drain()
+        self.encode_seconds += time.perf_counter() - started
+        return data
+
+
+_END = object()
+
+
+def encode_stream(blocks, encoder, max_pending=8):
+    """Encode an iterable of float audio blocks on a worker thread.
+
+    The caller's thread keeps pulling blocks from `blocks` (i.e. running
+    inference) while the worker encodes; encoded bytes are yielded as they
+    become available and the remainder is flushed once `blocks` is exhausted.
+    If the generator is closed early, the worker closes the encoder and exits.
+    """
+    pending = queue.Queue(maxsize=max_pending)
+    encoded = queue.Queue()
+    stop = threading.Event()
+
+    def worker():
+        try:
+            while True:
+                block = pending.get()
+                if block is _END or stop.is_set():
+                    break
+                data = encoder.encode(block)
+                if data:
+                    encoded.put(data)
+            encoded.put(encoder.close())
+        except Exception as e:
+            encoded.put(e)
+        finally:
+            encoded.put(_END)
+
+    thread = threading.Thread(target=worker, name='audio-encoder', daemon=True)
+    thread.start()
+    finished = False
+    try:
+        for block in blocks:
+            # Don't block forever on a full queue if the worker has died
+            while True:
+                try:
+                    pending.put(block, timeout=0.1)
+                    break
+                except queue.Full:
+                    if not thread.is_alive():
+                        break
+            while True:
+                try:
+                    item = encoded.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if item:
+                    yield item
+        pending.put(_END)
+        finished = True
+        while True:
+            item = encoded.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if item:
+                yield item
+    finally:
+        if not finished:
+            # Client went away mid-stream: drop the queued blocks so there is room
+            # for _END, and let the worker close the encoder and exit
+            stop.set()
+            while True:
+                try:
+                    pending.get_nowait()
+                except queue.Empty:
+                    break
+            pending.put_nowait(_END)
+        thread.join(timeout=1.0)
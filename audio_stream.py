@@ -0,0 +1,193 @@
+"""Helpers for turning model output into 16-bit PCM responses.
+
+A streamed response is one WAV header followed by raw little-endian PCM
+frames. The header's size fields are set to the maximum value because the
+total length is not known up front; players and ffmpeg treat that as
+"read until EOF".
+
+Whole responses are built in a `PCMBuffer`: model tensors are converted to
+int16 block by block straight into one preallocated buffer, and the body is
+served from a memoryview of it in bounded chunks, so no full-length float
+or bytes copies of the audio are made along the way.
+"""
+import struct
+
+import numpy as np
+
+# RIFF/data sizes for a stream of unknown length
+UNKNOWN_LENGTH = 0xFFFFFFFF
+# Samples converted per step; bounds the float32 scratch space to 256 KiB
+_BLOCK_SAMPLES = 65536
+# Size of the bytes chunks a response body is written in
+RESPONSE_CHUNK_BYTES = 65536
+
+
+def wav_header(sample_rate, channels=1, sample_width=2, data_size=UNKNOWN_LENGTH):
+    """Return a 44-byte PCM WAV header for `data_size` bytes of frames."""
+    byte_rate = int(sample_rate) * channels * sample_width
+    block_align = channels * sample_width
+    riff_size = UNKNOWN_LENGTH if data_size == UNKNOWN_LENGTH else 36 + data_size
+    return b''.join([
+        b'RIFF', struct.pack('<I', riff_size), b'WAVE',
+        b'fmt ', struct.pack('<IHHIIHH', 16, 1, channels, int(sample_rate), byte_rate, block_align, sample_width * 8),
+        b'data', struct.pack('<I', data_size),
+    ])
+
+
+def wav_stream_header(sample_rate, channels=1, sample_width=2):
+    """Return a 44-byte PCM WAV header with open-ended RIFF and data sizes."""
+    return wav_header(sample_rate, channels, sample_width)
+
+
+def as_float32(audio):
+    """View model output (torch tensor, ndarray or list) as a 1-D float32 array.
+
+    CPU tensors and float32 arrays are returned without copying.
+    """
+    if hasattr(audio, 'detach'):
+        audio = audio.detach().cpu().numpy()
+    audio = np.asarray(audio, dtype=np.float32)
+    return audio.reshape(-1) if audio.ndim > 1 else audio
+
+
+def pcm16_into(audio, out, gain=1.0):
+    """Write float `audio` * `gain`, clipped to [-1, 1], as 16-bit PCM into `out`.
+
+    `out` is an int16 array (either byte order) of the same length. Works in
+    fixed-size blocks so the only temporary is a small float32 scratch buffer.
+    """
+    audio = as_float32(audio)
+    scale = 32767.0 * gain
+    scratch = np.empty(min(len(audio), _BLOCK_SAMPLES), dtype=np.float32)
+    for start in range(0, len(audio), _BLOCK_SAMPLES):
+        block = audio[start:start + _BLOCK_SAMPLES]
+        tmp = scratch[:len(block)]
+        np.multiply(block, scale, out=tmp)
+        np.clip(tmp, -32767.0, 32767.0, out=tmp)
+        np.copyto(out[start:start + len(block)], tmp, casting='unsafe')
+    return out
+
+
+def wav_bytes(audio, sample_rate):
+    """Return a standalone 16-bit mono WAV file for one block of float audio.
+
+    Header and frames are written into a single array, so the only copy is
+    the final conversion to `bytes`.
+    """
+    audio = as_float32(audio)
+    out = np.empty(22 + len(audio), dtype='<i2')
+    out[:22].view(np.uint8)[:] = np.frombuffer(wav_header(sample_rate, data_size=2 * len(audio)), dtype=np.uint8)
+    pcm16_into(audio, out[22:])
+    return out.tobytes()
+
+
+def iter_chunks(parts, chunk_bytes=RESPONSE_CHUNK_BYTES):
+    """Yield bytes-like `parts` as bounded `bytes` chunks (WSGI and ASGI need bytes)."""
+    for part in parts:
+        view = memoryview(part).cast('B')
+        for start in range(0, len(view), chunk_bytes):
+            yield bytes(view[start:start + chunk_bytes])
+
+
+class PCMBuffer:
+    """16-bit PCM buffer that model output is converted straight into.
+
+    Pass the total sample count as `capacity` when it is known (e.g. after
+    collecting segment tensors) to avoid any reallocation; otherwise the
+    buffer grows geometrically.
+    """
+
+    def __init__(self, capacity=0, dtype='<i2'):
+        self._data = np.empty(int(capacity), dtype=dtype)
+        self.length = 0
+
+    @classmethod
+    def from_blocks(cls, blocks, gain=1.0):
+        """Convert a list of model output blocks into one exactly-sized buffer."""
+        blocks = [as_float32(block) for block in blocks]
+        pcm = cls(sum(len(block) for block in blocks))
+        for block in blocks:
+            pcm.append(block, gain)
+        return pcm
+
+    def _reserve(self, extra):
+        needed = self.length + extra
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self.length] = self._data[:self.length]
+            self._data = grown
+
+    def append(self, audio, gain=1.0):
+        audio = as_float32(audio)
+        self._reserve(len(audio))
+        pcm16_into(audio, self._data[self.length:self.length + len(audio)], gain)
+        self.length += len(audio)
+
+    def append_silence(self, samples):
+        self._reserve(samples)
+        self._data[self.length:self.length + samples] = 0
+        self.length += samples
+
+    @property
+    def samples(self):
+        """The filled part of the buffer as an int16 array (a view, not a copy)."""
+        return self._data[:self.length]
+
+    @property
+    def nbytes(self):
+        return self.length * self._data.itemsize
+
+    def memoryview(self):
+        return memoryview(self.samples).cast('B')
+
+    def wav_parts(self, sample_rate, channels=1):
+        """A complete WAV file as [exact-size header, memoryview of the frames]."""
+        return [wav_header(sample_rate, channels, data_size=self.nbytes), self.memoryview()]
+
+
+STREAM_FORMATS = ('wav', 'pcm', 'l16')
+
+
+class PCMStream:
+    """Framing for a continuous 16-bit PCM stream.
+
+    - ``wav``: one open-ended WAV header, then little-endian frames
+    - ``pcm``: headerless little-endian frames (s16le)
+    - ``l16``: headerless big-endian frames, served as ``audio/L16`` (RFC 2586)
+
+    For the headerless variants the sample rate and channel count travel in
+    the HTTP response headers instead.
+    """
+
+    def __init__(self, fmt, sample_rate, channels=1):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Unsupported stream format '{fmt}' (expected one of {', '.join(STREAM_FORMATS)})")
+        self.fmt = fmt
+        self.sample_rate = int(sample_rate)
+        self.channels = channels
+        self.dtype = '>i2' if fmt == 'l16' else '<i2'
+
+    @property
+    def mimetype(self):
+        if self.fmt == 'wav':
+            return 'audio/wav'
+        if self.fmt == 'l16':
+            return f'audio/L16;rate={self.sample_rate};channels={self.channels}'
+        return 'application/octet-stream'
+
+    @property
+    def headers(self):
+        return {
+            'X-Sample-Rate': str(self.sample_rate),
+            'X-Channels': str(self.channels),
+            'X-Sample-Format': 's16be' if self.fmt == 'l16' else 's16le',
+        }
+
+    def header(self):
+        """Bytes to send before the first frame."""
+        return wav_stream_header(self.sample_rate, self.channels) if self.fmt == 'wav' else b''
+
+    def frames(self, audio):
+        """Convert float audio in [-1, 1] (array or tensor) to frame bytes for this stream."""
+        audio = as_float32(audio)
+        return pcm16_into(audio, np.empty(len(audio), dtype=self.dtype)).tobytes()
@@ -0,0 +1,258 @@
+"""Microbenchmarks for the per-request text and audio code around the models.
+
+Usage:
+    python benchmarks/hotpath_bench.py [--sizes sentence,paragraph,chapter]
+        [--only resample] [--save-baseline] [--threshold 0.25]
+        [--min-delta-ms 0.1] [--json]
+
+Times the code that runs on every request besides inference: text cleanup
+and segmentation, float to 16-bit PCM conversion, loudness normalisation,
+resampling, joining chunks, and WAV/FLAC encoding. Inputs come in four
+sizes: one sentence, a paragraph, a chapter (~10 minutes of audio) and an
+audiobook (2 hours; opt-in with `--sizes audiobook`, it needs ~2 GB of
+memory). Text is built from benchmarks/corpus_sample.txt; audio is
+synthetic speech-like noise at 24 kHz, split into model-sized blocks of
+about 4 seconds.
+
+Each case runs repeatedly for at least `--min-time` seconds (fast cases in
+batches of calls lasting at least 5 ms) and reports its fastest run, which
+is the most stable figure on a shared machine. A fixed calibration workload
+is timed alongside, and baseline times are scaled by how much slower or
+faster it runs now, so a busy or throttled host does not read as a code
+regression. Results are compared with benchmarks/baselines/hotpath.json: a
+case more than `--threshold` (default 25%) and more than `--min-delta-ms`
+(default 0.1 ms) slower than its scaled baseline is re-run for longer
+against a fresh calibration, and if it is still slower it is flagged and
+the exit status is 1. The absolute floor keeps microsecond-sized cases,
+whose timings jitter by more than 25%, from failing the gate.
+
+`text.preprocess` times `normalize_whitespace`, which is all xtts2's
+`preprocess_text` does; xtts2 itself cannot be imported without torch and
+the model libraries. `--save-baseline` records the
+current run as the new baseline. Baselines are only comparable on the same
+hardware; the file records the machine it was made on.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_encoders import encode_pcm  # noqa: E402
+from audio_stream import PCMBuffer, wav_bytes  # noqa: E402
+from loudness import LoudnessNormalizer, normalize_stream  # noqa: E402
+from resample import resample_stream  # noqa: E402
+from text_segmentation import normalize_whitespace, segment_text  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, 'corpus_sample.txt')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines', 'hotpath.json')
+SAMPLE_RATE = 24000
+BLOCK_SECONDS = 4.0
+# Roughly 15 characters of text per second of speech
+CHARS_PER_SECOND = 15
+SIZES = {
+    'sentence': 4.0,
+    'paragraph': 40.0,
+    'chapter': 600.0,
+    'audiobook': 7200.0,
+}
+DEFAULT_SIZES = ('sentence', 'paragraph', 'chapter')
+
+
+def make_text(seconds, corpus=DEFAULT_CORPUS):
+    """Corpus paragraphs repeated to about `seconds` of speech, with the corpus's raw whitespace."""
+    with open(corpus, encoding='utf-8') as f:
+        paragraphs = [p for p in re.split(r'\n\s*\n', f.read()) if p.strip()]
+    target = int(seconds * CHARS_PER_SECOND)
+    parts, length = [], 0
+    while length < target:
+        paragraph = paragraphs[len(parts) % len(paragraphs)]
+        parts.append(paragraph)
+        length += len(paragraph) + 2
+    return '\n\n'.join(parts)[:max(target, 1)]
+
+
+def make_blocks(seconds, sample_rate=SAMPLE_RATE, seed=0):
+    """Speech-like float32 audio: noise shaped by a syllable-rate envelope, in ~4 s blocks."""
+    rng = np.random.default_rng(seed)
+    block = int(BLOCK_SECONDS * sample_rate)
+    total = int(seconds * sample_rate)
+    blocks = []
+    for start in range(0, total, block):
+        n = min(block, total - start)
+        t = np.arange(start, start + n, dtype=np.float32) / sample_rate
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4.0 * t)
+        blocks.append((0.3 * envelope * rng.standard_normal(n)).astype(np.float32))
+    return blocks
+
+
+def cases(size):
+    """(name, function, units) for one input size; units are audio seconds or text characters."""
+    seconds = SIZES[size]
+    text = make_text(seconds)
+    clean = normalize_whitespace(text)
+    blocks = make_blocks(seconds)
+    pcm = PCMBuffer.from_blocks(blocks)
+
+    def resample_to(rate):
+        return lambda: sum(len(b) for b in resample_stream(blocks, SAMPLE_RATE, rate))
+
+    return [
+        ('text.preprocess', lambda: normalize_whitespace(text), ('chars', len(text))),
+        ('text.segment_xtts', lambda: segment_text(clean, 'xtts'), ('chars', len(clean))),
+        ('text.segment_kokoro', lambda: segment_text(clean, 'kokoro'), ('chars', len(clean))),
+        ('audio.concatenate', lambda: np.concatenate(blocks), ('audio_s', seconds)),
+        ('audio.pcm16_from_blocks', lambda: PCMBuffer.from_blocks(blocks), ('audio_s', seconds)),
+        ('audio.loudness_normalize', lambda: sum(len(b) for b in normalize_stream(
+            blocks, LoudnessNormalizer(SAMPLE_RATE))), ('audio_s', seconds)),
+        ('audio.resample_24k_to_16k', resample_to(16000), ('audio_s', seconds)),
+        ('audio.resample_24k_to_44k1', resample_to(44100), ('audio_s', seconds)),
+        ('encode.wav', lambda: b''.join(pcm.wav_parts(SAMPLE_RATE)), ('audio_s', seconds)),
+        ('encode.wav_chunks', lambda: [wav_bytes(b, SAMPLE_RATE) for b in blocks], ('audio_s', seconds)),
+        ('encode.flac', lambda: encode_pcm(pcm, SAMPLE_RATE, 'flac'), ('audio_s', seconds)),
+    ]
+
+
+def _batch_size(fn, target=0.005):
+    """Calls per timed run, so that fast cases are not timed below the clock's resolution."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - started >= target:
+            return number
+        number *= 10
+
+
+def measure(fn, min_time, max_runs):
+    """Time `fn` for at least `min_time` seconds (and at least twice); returns (fastest, median) seconds per call."""
+    number = _batch_size(fn)
+    times = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < max_runs and (len(times) < 2 or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - started) / number)
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def _calibration_workload(data=np.random.default_rng(1).standard_normal(65536).astype(np.float32)):
+    # A fixed mix of interpreter and numpy work, timed to estimate machine speed
+    total = 0
+    for i in range(2000):
+        total += i * i
+    return total + float(np.dot(np.sort(data), data))
+
+
+def calibrate(min_time):
+    """Seconds per run of the calibration workload."""
+    return measure(_calibration_workload, min_time, 1000)[0]
+
+
+def machine():
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES), help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument('--only', default=None, help="run only cases whose name contains this")
+    parser.add_argument('--min-time', type=float, default=0.5, help="seconds to repeat each case for")
+    parser.add_argument('--max-runs', type=int, default=200)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help="write this run as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = 25%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.1,
+                        help="ignore slowdowns smaller than this many milliseconds per call")
+    parser.add_argument('--json', action='store_true', help="print machine-readable results")
+    args = parser.parse_args()
+
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+
+    baseline = {}
+    baseline_calibration = None
+    calibration = calibrate(args.min_time)
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            saved = json.load(f)
+        baseline = saved.get("results", {})
+        baseline_calibration = saved.get("calibration_ms")
+
+    def slowdown():
+        # >1 when this machine (or this moment) is slower than when the baseline was made
+        return calibration * 1000 / baseline_calibration if baseline_calibration else 1.0
+
+    def regressed(fastest, reference):
+        expected = reference["min_ms"] * slowdown()
+        return fastest * 1000 > expected * (1 + args.threshold) and fastest * 1000 - expected > args.min_delta_ms
+
+    results = {}
+    regressions = []
+    for size in sizes:
+        for name, fn, (unit, amount) in cases(size):
+            key = f"{size}/{name}"
+            if args.only and args.only not in key:
+                continue
+            fastest, median = measure(fn, args.min_time, args.max_runs)
+            reference = baseline.get(key)
+            if reference and regressed(fastest, reference):
+                # Confirm an apparent regression with a longer run before reporting it
+                calibration = calibrate(args.min_time)
+                fastest = min(fastest, measure(fn, 3 * args.min_time, 3 * args.max_runs)[0])
+            row = {"min_ms": round(fastest * 1000, 6), "median_ms": round(median * 1000, 6)}
+            if unit == 'audio_s':
+                row["x_realtime"] = round(amount / fastest, 1)
+            else:
+                row["mb_per_s"] = round(amount / fastest / 1e6, 2)
+            if reference:
+                row["vs_baseline"] = round(fastest * 1000 / (reference["min_ms"] * slowdown()), 3)
+                if regressed(fastest, reference):
+                    regressions.append(key)
+            results[key] = row
+            if not args.json:
+                rate = f"{row['x_realtime']:>10}x rt" if 'x_realtime' in row else f"{row['mb_per_s']:>9} MB/s"
+                change = f"  {row['vs_baseline']:.2f}x baseline" if 'vs_baseline' in row else ''
+                flag = '  REGRESSION' if key in regressions else ''
+                print(f"{key:<40} {row['min_ms']:>12.3f} ms {rate}{change}{flag}", flush=True)
+
+    if args.json:
+        print(json.dumps({
+            "machine": machine(), "calibration_ms": round(calibration * 1000, 6), "slowdown_vs_baseline": round(slowdown(), 3),
+            "results": results, "regressions": regressions,
+        }, indent=2))
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"machine": machine(), "calibration_ms": round(calibration * 1000, 6), "results": results},
+                      f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%} "
+              f"and {args.min_delta_ms:g} ms: "
+              f"{', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""Load-test a running TTS service and report latency percentiles.
+
+Usage:
+    python benchmarks/load_bench.py [corpus.txt ...] [--url http://localhost:5000]
+        [--endpoint stream|tts] [--concurrency 4 | --rate 2.0] [--requests 100]
+        [--replay requests.jsonl] [--field engine=stub ...] [--json results.json]
+
+Requests are the blank-line separated paragraphs of the corpus files
+(default benchmarks/corpus_sample.txt), sent in order and cycled until
+`--requests` have been made. Two load models:
+
+- closed loop (`--concurrency N`, default 1): N clients, each sending its
+  next request as soon as the previous response has been read;
+- open loop (`--rate R`): requests start on a Poisson schedule at R per
+  second whatever the server's latency, up to `--max-in-flight` at once.
+  Latency is measured from the scheduled start, so a saturated server
+  shows up as growing latency rather than as a slower request rate.
+
+`--replay` sends a captured request log instead. It is a JSON-lines file
+with one request per line: `{"at": 1.25, "endpoint": "/api/tts/stream",
+"body": {...}}`, where `at` is the arrival time in seconds since the start
+(both `at` and `endpoint` are optional).
+
+Per request it records time to first byte, total latency, bytes and audio
+seconds (from the WAV header, or from the X-Sample-Rate header of
+headerless PCM). The summary has p50/p95/p99 of both latencies, request and
+error rates, and audio seconds per wall-clock second. `--json` writes the
+summary, every request and the git commit, for comparing runs. The
+unified server's `stub` engine (`TTS_ENGINES=stub python tts_server.py`
+with `--field engine=stub`) needs no model weights, so the serving path
+can be benchmarked on a CPU-only CI machine.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus_sample.txt')
+ENDPOINTS = {'tts': '/api/tts', 'stream': '/api/tts/stream'}
+WAV_HEADER_BYTES = 44
+
+
+def load_corpus(paths):
+    texts = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            texts.extend(' '.join(block.split()) for block in re.split(r'\n\s*\n', f.read()) if block.strip())
+    return texts
+
+
+def load_replay(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_fields(pairs):
+    """`key=value` pairs to a dict; values are parsed as JSON when possible."""
+    fields = {}
+    for pair in pairs:
+        key, sep, value = pair.partition('=')
+        if not sep:
+            raise SystemExit(f"--field expects key=value, got {pair!r}")
+        try:
+            fields[key] = json.loads(value)
+        except ValueError:
+            fields[key] = value
+    return fields
+
+
+def audio_seconds(head, size, headers):
+    """Audio duration of a 16-bit response from its first bytes, total size and headers."""
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE' and len(head) >= WAV_HEADER_BYTES:
+        channels, rate = struct.unpack('<HI', head[22:28])
+        bits = struct.unpack('<H', head[34:36])[0]
+        return (size - WAV_HEADER_BYTES) / (rate * channels * bits // 8)
+    if 'X-Sample-Rate' in headers:
+        return size / (int(headers['X-Sample-Rate']) * int(headers.get('X-Channels', 1)) * 2)
+    return None
+
+
+def send(session, base_url, job, timeout, scheduled):
+    """Send one request and read the whole response; returns a result record."""
+    started = time.perf_counter()
+    record = {"index": job["index"], "endpoint": job["endpoint"], "chars": len(job["body"].get("text", ""))}
+    record["start_delay_s"] = round(started - scheduled, 6) if scheduled is not None else 0.0
+    origin = scheduled if scheduled is not None else started
+    ttfb = None
+    size = 0
+    head = b''
+    try:
+        with session.post(base_url + job["endpoint"], json=job["body"], stream=True, timeout=timeout) as response:
+            for chunk in response.iter_content(chunk_size=None):
+                if not chunk:
+                    continue
+                if ttfb is None:
+                    ttfb = time.perf_counter() - origin
+                if len(head) < WAV_HEADER_BYTES:
+                    head += chunk[:WAV_HEADER_BYTES - len(head)]
+                size += len(chunk)
+            record["status"] = response.status_code
+            record["ok"] = response.ok and size > 0
+            record["audio_s"] = audio_seconds(head, size, response.headers) if record["ok"] else None
+    except requests.RequestException as e:
+        record.update(status=None, ok=False, audio_s=None, error=str(e))
+    record["ttfb_s"] = ttfb
+    record["latency_s"] = time.perf_counter() - origin
+    record["bytes"] = size
+    return record
+
+
+def build_jobs(args):
+    endpoint = ENDPOINTS[args.endpoint]
+    fields = parse_fields(args.field)
+    if args.endpoint == 'stream':
+        fields.setdefault('stream_format', 'wav')
+    if args.replay:
+        jobs = []
+        for i, entry in enumerate(load_replay(args.replay)):
+            jobs.append({
+                "index": i,
+                "at": entry.get("at"),
+                "endpoint": entry.get("endpoint", endpoint),
+                "body": {**fields, **entry.get("body", {})},
+            })
+        return jobs
+    texts = load_corpus(args.corpus)
+    if not texts:
+        raise SystemExit("The corpus is empty")
+    return [
+        {"index": i, "at": None, "endpoint": endpoint, "body": {**fields, "text": texts[i % len(texts)]}}
+        for i in range(args.requests)
+    ]
+
+
+def run_closed_loop(jobs, base_url, concurrency, timeout):
+    results = []
+    lock = threading.Lock()
+    pending = iter(jobs)
+
+    def client():
+        session = requests.Session()
+        while True:
+            with lock:
+                job = next(pending, None)
+            if job is None:
+                return
+            record = send(session, base_url, job, timeout, None)
+            with lock:
+                results.append(record)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_open_loop(jobs, base_url, rate, max_in_flight, timeout, seed):
+    """Start each job at its `at` time, or on a Poisson schedule at `rate` per second."""
+    rng = random.Random(seed)
+    sessions = threading.local()
+
+    def task(job, scheduled):
+        if not hasattr(sessions, 'session'):
+            sessions.session = requests.Session()
+        return send(sessions.session, base_url, job, timeout, scheduled)
+
+    futures = []
+    offset = 0.0
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        start = time.perf_counter()
+        for job in jobs:
+            if job["at"] is not None:
+                offset = float(job["at"])
+            elif rate:
+                offset += rng.expovariate(rate)
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(task, job, scheduled))
+        return [future.result() for future in futures]
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile of `values` (q in 0-100), or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _distribution(values):
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": statistics.mean(values) if values else None,
+        "max": max(values) if values else None,
+    }
+
+
+def summarize(results, wall_s):
+    ok = [r for r in results if r["ok"]]
+    audio = sum(r["audio_s"] or 0.0 for r in ok)
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": round((len(results) - len(ok)) / len(results), 4) if results else None,
+        "wall_s": round(wall_s, 3),
+        "requests_per_s": round(len(results) / wall_s, 3) if wall_s else None,
+        "audio_s": round(audio, 3),
+        "audio_s_per_wall_s": round(audio / wall_s, 3) if wall_s else None,
+        "ttfb_s": _distribution([r["ttfb_s"] for r in ok if r["ttfb_s"] is not None]),
+        "latency_s": _distribution([r["latency_s"] for r in ok]),
+        "status_codes": {str(k): sum(1 for r in results if r["status"] == k) for k in sorted({r["status"] for r in results}, key=str)},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('corpus', nargs='*', default=[DEFAULT_CORPUS])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--endpoint', default='stream', choices=sorted(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=50, help="requests to send from the corpus")
+    parser.add_argument('--concurrency', type=int, default=1, help="closed-loop clients")
+    parser.add_argument('--rate', type=float, default=None, help="open-loop arrivals per second")
+    parser.add_argument('--max-in-flight', type=int, default=256, help="open-loop cap on concurrent requests")
+    parser.add_argument('--replay', help="JSON-lines request log to replay instead of the corpus")
+    parser.add_argument('--field', action='append', default=[], help="extra body field key=value (repeatable)")
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--seed', type=int, default=0, help="seed for open-loop arrival times")
+    parser.add_argument('--json', metavar='PATH', help="write summary and per-request results to PATH")
+    args = parser.parse_args()
+
+    jobs = build_jobs(args)
+    base_url = args.url.rstrip('/')
+    open_loop = args.rate is not None or any(job["at"] is not None for job in jobs)
+    started = time.perf_counter()
+    if open_loop:
+        results = run_open_loop(jobs, base_url, args.rate, args.max_in_flight, args.timeout, args.seed)
+    else:
+        results = run_closed_loop(jobs, base_url, max(1, args.concurrency), args.timeout)
+    wall_s = time.perf_counter() - started
+    results.sort(key=lambda r: r["index"])
+    summary = summarize(results, wall_s)
+
+    mode = (f"open loop, {args.rate}/s" if args.rate else "replay") if open_loop else f"closed loop, concurrency {args.concurrency}"
+    print(f"{summary['requests']} requests to {base_url} ({args.endpoint}, {mode}) in {summary['wall_s']:.1f} s")
+    print(f"  errors: {summary['errors']} ({(summary['error_rate'] or 0) * 100:.1f}%)  status codes: {summary['status_codes']}")
+    for name in ('ttfb_s', 'latency_s'):
+        d = summary[name]
+        if d["p50"] is not None:
+            print(f"  {name[:-2]:<8} p50={d['p50'] * 1000:8.1f} ms  p95={d['p95'] * 1000:8.1f} ms  p99={d['p99'] * 1000:8.1f} ms")
+    print(f"  throughput: {summary['requests_per_s']} req/s, {summary['audio_s_per_wall_s']} audio s per wall s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                "commit": git_commit(),
+                "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                "args": vars(args),
+                "summary": summary,
+                "results": results,
+            }, f, indent=2)
+        print(f"Wrote {args.json}")
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
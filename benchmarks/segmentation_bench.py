@@ -0,0 +1,91 @@
+"""Compare the old regex sentence splitter with text_segmentation.segment_text.
+
+Usage:
+    python benchmarks/segmentation_bench.py [corpus.txt ...] [--engine xtts] [--json]
+
+Each non-empty line (or blank-line separated paragraph) of the corpus files
+is one request. Reports, per splitter, the number of model calls, segment
+length statistics (mean, coefficient of variation, min/max), how many
+segments exceed the engine budget, and splitting throughput. Defaults to
+benchmarks/corpus_sample.txt; point it at an export of production text for
+representative numbers.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_segmentation import ENGINE_BUDGETS, budget_for, segment_text  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus_sample.txt')
+
+
+def regex_split(text):
+    # The splitter xtts2.py used before text_segmentation
+    return [s for s in re.split('(?<=[.!?]) +', ' '.join(text.split())) if s.strip()]
+
+
+def load_requests(paths):
+    requests = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            requests.extend(block.strip() for block in re.split(r'\n\s*\n', f.read()) if block.strip())
+    return requests
+
+
+def measure(name, splitter, requests, budget, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        segments = [segment for text in requests for segment in splitter(text)]
+    elapsed = (time.perf_counter() - started) / repeat
+    lengths = [len(s) for s in segments]
+    mean = statistics.mean(lengths)
+    chars = sum(len(text) for text in requests)
+    return {
+        "splitter": name,
+        "requests": len(requests),
+        "segments": len(segments),
+        "segments_per_request": round(len(segments) / len(requests), 2),
+        "mean_chars": round(mean, 1),
+        "cv": round(statistics.pstdev(lengths) / mean, 3),
+        "min_chars": min(lengths),
+        "max_chars": max(lengths),
+        "short_segments": sum(1 for n in lengths if n < budget // 5),
+        "over_budget": sum(1 for n in lengths if n > budget),
+        "mb_per_s": round(chars / elapsed / 1e6, 2) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('corpus', nargs='*', default=[DEFAULT_CORPUS])
+    parser.add_argument('--engine', default='xtts', choices=sorted(ENGINE_BUDGETS))
+    parser.add_argument('--max-chars', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help="print machine-readable results")
+    args = parser.parse_args()
+
+    requests = load_requests(args.corpus)
+    budget = budget_for(args.engine, args.max_chars)
+    results = [
+        measure('regex', regex_split, requests, budget, args.repeat),
+        measure('segment_text', lambda t: segment_text(t, args.engine, args.max_chars), requests, budget, args.repeat),
+    ]
+
+    if args.json:
+        print(json.dumps({"engine": args.engine, "budget_chars": budget, "results": results}, indent=2))
+        return
+    print(f"engine={args.engine} budget={budget} chars, {len(requests)} requests")
+    columns = list(results[0])[1:]
+    print(f"{'':14}" + ''.join(f"{c:>{max(len(c), 8) + 2}}" for c in columns))
+    for row in results:
+        print(f"{row['splitter']:14}" + ''.join(f"{str(row[c]):>{max(len(c), 8) + 2}}" for c in columns))
+
+
+if __name__ == '__main__':
+    main()
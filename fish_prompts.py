@@ -0,0 +1,69 @@
+"""Content-addressed cache of FishSpeech reference prompts.
+
+FishSpeech conditions generation on VQ prompt tokens obtained by encoding
+the reference audio with the decoder model. Clients typically reuse a
+handful of cloned voices, so the encoded tokens are cached under a hash of
+the reference audio bytes plus its transcript, in a bounded in-memory LRU
+and optionally as `.npy` files on disk.
+"""
+import os
+import threading
+
+import numpy as np
+import torch
+
+from cache_utils import LRUCache, content_hash
+
+
+class ReferencePromptCache:
+    """Map (reference audio bytes, reference text) to encoded prompt tokens."""
+
+    def __init__(self, engine, max_entries=16, cache_dir=None):
+        self.engine = engine
+        self.cache_dir = cache_dir
+        self._memory = LRUCache(max_entries)
+        self._lock = threading.Lock()
+        self.encodes = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _npy_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def _load_from_disk(self, key):
+        if not self.cache_dir or not os.path.exists(self._npy_path(key)):
+            return None
+        codes = np.load(self._npy_path(key))
+        return torch.from_numpy(codes).to(self.engine.decoder_model.device)
+
+    def _encode(self, key, audio_bytes):
+        # encode_reference accepts raw bytes and decodes them from memory
+        with torch.inference_mode():
+            prompt_tokens = self.engine.encode_reference(reference_audio=audio_bytes, enable_reference_audio=True)
+        self.encodes += 1
+        if self.cache_dir:
+            tmp_path = self._npy_path(key) + '.tmp.npy'
+            np.save(tmp_path, prompt_tokens.cpu().numpy())
+            os.replace(tmp_path, self._npy_path(key))
+        return prompt_tokens
+
+    def get(self, audio_bytes, ref_text):
+        """Return (prompt_tokens, prompt_texts) lists ready for the LLAMA request."""
+        key = content_hash(audio_bytes, ref_text)
+        prompt_tokens = self._memory.get(key)
+        if prompt_tokens is None:
+            with self._lock:
+                # Another request may have encoded the same reference while we waited
+                prompt_tokens = self._memory.get(key)
+                if prompt_tokens is None:
+                    prompt_tokens = self._load_from_disk(key)
+                    if prompt_tokens is None:
+                        prompt_tokens = self._encode(key, audio_bytes)
+                    self._memory.put(key, prompt_tokens)
+        return [prompt_tokens], [ref_text]
+
+    def stats(self):
+        stats = self._memory.stats()
+        stats["encodes"] = self.encodes
+        stats["persistent"] = bool(self.cache_dir)
+        return stats
@@ -50,13 +50,20 @@ if not os.path.exists(project_root_file):
 ensure_venv()
 
 
-from fish_speech_lib.inference import FishSpeech
-import soundfile as sf
-from flask import Flask, request, jsonify, send_file, Response
-import io
-import numpy as np
-import tempfile
+from flask import Flask, request, jsonify, Response
+import threading
+import time
 import traceback
+from contextlib import nullcontext
+from audio_stream import PCMBuffer, PCMStream, iter_chunks
+from resample import Resampler, parse_sample_rate
+from audio_encoders import (
+    StreamEncoder, encode_pcm, encode_stream, mimetype_for, negotiate_format, negotiate_stream_format,
+    output_sample_rate,
+)
+from output_archive import OutputArchive
+from metrics import ServiceMetrics
+from tts_engines import FishSpeechEngine
 
 # Optional torch check for CUDA device; fall back to cpu if torch not available
 try:
@@ -65,91 +72,150 @@ try:
 except Exception:
     device = "cpu"
 
-# Lazily initialized FishSpeech instance
-_tts_instance = None
+# Lazily initialized FishSpeech engine, the same one the unified server uses
+# (see tts_engines.py). It keeps encoded reference prompts, keyed by hash of
+# reference audio bytes + ref_text; set FISH_PROMPT_CACHE_DIR to also persist
+# them across restarts.
+_engine = None
 
 
-def get_tts():
-    global _tts_instance
-    if _tts_instance is None:
+def get_engine():
+    global _engine
+    if _engine is None:
         logger.info(f"Initializing FishSpeech on device: {device}")
-        _tts_instance = FishSpeech(device=device)
-    return _tts_instance
+        engine = FishSpeechEngine(device)
+        engine.load()
+        _engine = engine
+    return _engine
 
 
-def synthesize_bytes(text, ref_audio_path, ref_text, max_new_tokens=1000, chunk_length=1000):
+# Default output sample rate (matches kokoro); requests can ask for another with `sample_rate`
+TARGET_SR = 24000
+
+# Copies of generated audio, written off the request path (see output_archive.py).
+# FISH_ARCHIVE_OUTPUTS=0 disables them.
+ARCHIVE_OUTPUTS = os.getenv('FISH_ARCHIVE_OUTPUTS', '1') == '1'
+output_archive = OutputArchive(
+    'outputs',
+    max_bytes=int(float(os.getenv('FISH_ARCHIVE_MAX_MB', 500)) * 1024 * 1024) or None,
+    max_age_seconds=float(os.getenv('FISH_ARCHIVE_MAX_AGE_HOURS', 168)) * 3600 or None,
+    max_queue=int(os.getenv('FISH_ARCHIVE_QUEUE', 32)),
+    logger=logger,
+) if ARCHIVE_OUTPUTS else None
+
+# Incremental streaming stats reported by /api/status
+_stream_stats = {"streams": 0, "total_ttfb_ms": 0.0, "total_ms": 0.0, "last_ttfb_ms": None, "last_total_ms": None}
+_stream_stats_lock = threading.Lock()
+
+
+def generate_segments(text, ref_audio_bytes, ref_text, max_new_tokens=1000, chunk_length=1000):
+    """
+    Yield (sample_rate, float32 audio) for each segment decoded by FishSpeech.
+    """
+    engine = get_engine()
+    options = {
+        "ref_audio_bytes": ref_audio_bytes,
+        "ref_text": ref_text,
+        "max_new_tokens": max_new_tokens,
+        "chunk_length": chunk_length,
+    }
+    for segment in engine.synthesize(text, options):
+        yield engine.sample_rate, segment
+
+
+def synthesize_pcm(text, ref_audio_bytes, ref_text, max_new_tokens=1000, chunk_length=1000, output_rate=TARGET_SR,
+                   tracker=None):
     """
-    Synthesize and return WAV bytes (RIFF) for the given inputs.
+    Synthesize the given inputs into a 16-bit PCMBuffer at `output_rate`.
 
-    We force the output WAV to 24000 Hz (24 kHz) to match kokoro's behavior.
-    If the model returns audio at a different sample rate, perform a simple
-    resampling using numpy interpolation to avoid adding heavy dependencies.
+    Output defaults to 24000 Hz (24 kHz) to match kokoro's behavior. Segments
+    are resampled from the model's rate with a band-limited polyphase filter
+    (see resample.py) as they arrive, carrying filter state across segment
+    boundaries, and converted straight into the buffer. Model and conversion
+    time are added to `tracker`, if given.
     """
-    TARGET_SR = 24000
-
-    tts = get_tts()
-    sample_rate, audio_data = tts(
-        text=text,
-        reference_audio=ref_audio_path,
-        reference_audio_text=ref_text,
-        max_new_tokens=max_new_tokens,
-        chunk_length=chunk_length
+    stage = tracker.stage if tracker else (lambda name: nullcontext())
+    resampler = None
+    segments = 0
+    pcm = PCMBuffer()
+    decoded = generate_segments(text, ref_audio_bytes, ref_text, max_new_tokens=max_new_tokens, chunk_length=chunk_length)
+    for sample_rate, segment in tracker.timed(decoded, 'inference') if tracker else decoded:
+        with stage('encoding'):
+            if resampler is None:
+                resampler = Resampler(int(sample_rate), output_rate)
+            pcm.append(resampler.process(segment))
+        segments += 1
+    if resampler is None:
+        raise RuntimeError("No audio generated, please check the input text.")
+    with stage('encoding'):
+        pcm.append(resampler.flush())
+    if tracker:
+        tracker.add_audio(pcm.length / output_rate)
+    logger.info(
+        f"Synthesized audio: sample_rate={resampler.src_rate}, segments={segments}, "
+        f"output_rate={output_rate}, samples={pcm.length}"
     )
+    return pcm
 
-    # Ensure numpy array and float32 dtype
-    audio = np.asarray(audio_data).astype('float32')
-    try:
-        channels = 1 if audio.ndim == 1 else audio.shape[1]
-    except Exception:
-        channels = None
 
-    logger.info(
-        f"Synthesized audio: sample_rate={int(sample_rate)}, shape={audio.shape}, "
-        f"dtype={audio.dtype}, channels={channels}"
-    )
+def _load_reference_audio(uploaded_file, ref_audio_path):
+    """
+    Return (ref_audio_bytes, error_response) for a request.
 
-    def _resample_audio(aud, orig_sr, target_sr):
-        if int(orig_sr) == int(target_sr):
-            return aud
-        # aud shape: (n_samples,) or (n_samples, channels)
-        n_samples = aud.shape[0]
-        new_len = int(round(n_samples * float(target_sr) / float(orig_sr)))
-        if new_len <= 0:
-            raise ValueError("Computed new length for resampling is <= 0")
-        # Create new sample positions
-        old_positions = np.linspace(0, n_samples - 1, num=n_samples)
-        new_positions = np.linspace(0, n_samples - 1, num=new_len)
-        if aud.ndim == 1:
-            return np.interp(new_positions, old_positions, aud).astype('float32')
+    Uploaded files are read straight into memory; otherwise `ref_audio_path`
+    or ./voices/default.wav is read from disk. On failure ref_audio_bytes is
+    None and error_response is a ready-to-return Flask response.
+    """
+    default_ref_audio = os.path.join(os.getcwd(), 'voices', 'default.wav')
+    if uploaded_file:
+        return uploaded_file.read(), None
+    if ref_audio_path:
+        # Use provided path on disk if it exists, otherwise fall back to default
+        if os.path.exists(ref_audio_path):
+            ref_audio_to_use = ref_audio_path
         else:
-            # Process each channel separately
-            channels = aud.shape[1]
-            resampled = np.zeros((new_len, channels), dtype='float32')
-            for ch in range(channels):
-                resampled[:, ch] = np.interp(new_positions, old_positions, aud[:, ch])
-            return resampled
-
-    # Resample if needed
-    if int(sample_rate) != TARGET_SR:
-        try:
-            logger.info(f"Resampling audio from {int(sample_rate)} Hz to {TARGET_SR} Hz")
-            audio = _resample_audio(audio, int(sample_rate), TARGET_SR)
-            sample_rate = TARGET_SR
-            logger.info(f"Resampling complete: new shape={audio.shape}, dtype={audio.dtype}")
-        except Exception as e:
-            logger.warning(f"Resampling failed: {e}. Proceeding with original audio and sample rate.")
+            logger.warning(f"Provided ref_audio_path {ref_audio_path} does not exist; attempting to use default reference audio.")
+            if os.path.exists(default_ref_audio):
+                ref_audio_to_use = default_ref_audio
+                logger.warning(f"Using default reference audio at {default_ref_audio}")
+            else:
+                logger.error(f"Provided ref_audio_path {ref_audio_path} not found and default reference audio './voices/default.wav' not found")
+                return None, (jsonify({"error": "Reference audio not found (ref_audio_path invalid and ./voices/default.wav missing)"}), 400)
+    else:
+        # No uploaded file and no path provided -> use default reference audio if available
+        if os.path.exists(default_ref_audio):
+            ref_audio_to_use = default_ref_audio
+            logger.warning(f"No ref_audio provided; using default reference audio at {default_ref_audio}")
+        else:
+            logger.error("No ref_audio provided and default reference audio './voices/default.wav' not found")
+            return None, (jsonify({"error": "Reference audio is required (upload, ref_audio_path, or ./voices/default.wav)"}), 400)
+    with open(ref_audio_to_use, 'rb') as f:
+        return f.read(), None
+
+
+def _voice_label(uploaded_file, ref_audio_path):
+    """Metrics label for a request's reference audio."""
+    if uploaded_file:
+        return 'upload'
+    return os.path.basename(ref_audio_path) if ref_audio_path else 'default'
 
-    # Ensure float32 and write WAV using the target sample rate
-    audio = audio.astype('float32')
-    wav_io = io.BytesIO()
-    sf.write(wav_io, audio, int(sample_rate), format='WAV')
-    wav_io.seek(0)
-    return wav_io
+
+def _record_stream(ttfb_ms, total_ms):
+    with _stream_stats_lock:
+        _stream_stats["streams"] += 1
+        _stream_stats["total_ttfb_ms"] += ttfb_ms or 0.0
+        _stream_stats["total_ms"] += total_ms
+        _stream_stats["last_ttfb_ms"] = round(ttfb_ms, 1) if ttfb_ms is not None else None
+        _stream_stats["last_total_ms"] = round(total_ms, 1)
 
 
 # Flask app
 app = Flask(__name__)
 
+# Prometheus metrics, served at /api/metrics (see metrics.py)
+metrics = ServiceMetrics('fishspeech')
+metrics.install(app)
+
 
 @app.route('/api/tts', methods=['POST'])
 def http_tts():
@@ -166,6 +232,7 @@ def http_tts():
     in the "ref_audio_path" JSON/form field (path on disk accessible by the service).
     """
     logger.info(f"Received TTS request from {request.remote_addr}")
+    tracker = metrics.track('tts')
     try:
         # Accept both JSON and form-data
         if request.is_json:
@@ -175,6 +242,8 @@ def http_tts():
             ref_audio_path = req.get("ref_audio_path")
             max_new_tokens = req.get("max_new_tokens", 1000)
             chunk_length = req.get("chunk_length", 1000)
+            requested_format = req.get("format")
+            requested_rate = req.get("sample_rate")
             uploaded_file = None
         else:
             text = request.form.get("text")
@@ -182,7 +251,10 @@ def http_tts():
             ref_audio_path = request.form.get("ref_audio_path")
             max_new_tokens = int(request.form.get("max_new_tokens", 1000))
             chunk_length = int(request.form.get("chunk_length", 1000))
+            requested_format = request.form.get("format")
+            requested_rate = request.form.get("sample_rate")
             uploaded_file = request.files.get("ref_audio")
+        tracker.voice = _voice_label(uploaded_file, ref_audio_path)
 
         if not text:
             logger.error("No text provided in request")
@@ -193,58 +265,32 @@ def http_tts():
             logger.warning("No ref_text provided in request; proceeding with empty ref_text. Provide ref_text for better voice cloning quality.")
             ref_text = ""
 
-        temp_file_path = None
-        default_ref_audio = os.path.join(os.getcwd(), 'voices', 'default.wav')
-        if uploaded_file:
-            # Save uploaded reference audio to a temporary file
-            tmpf = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-            uploaded_file.save(tmpf.name)
-            temp_file_path = tmpf.name
-            ref_audio_to_use = temp_file_path
-        elif ref_audio_path:
-            # Use provided path on disk if it exists, otherwise fall back to default
-            if os.path.exists(ref_audio_path):
-                ref_audio_to_use = ref_audio_path
-            else:
-                logger.warning(f"Provided ref_audio_path {ref_audio_path} does not exist; attempting to use default reference audio.")
-                if os.path.exists(default_ref_audio):
-                    ref_audio_to_use = default_ref_audio
-                    logger.warning(f"Using default reference audio at {default_ref_audio}")
-                else:
-                    logger.error(f"Provided ref_audio_path {ref_audio_path} not found and default reference audio './voices/default.wav' not found")
-                    return jsonify({"error": "Reference audio not found (ref_audio_path invalid and ./voices/default.wav missing)"}), 400
-        else:
-            # No uploaded file and no path provided -> use default reference audio if available
-            if os.path.exists(default_ref_audio):
-                ref_audio_to_use = default_ref_audio
-                logger.warning(f"No ref_audio provided; using default reference audio at {default_ref_audio}")
-            else:
-                logger.error("No ref_audio provided and default reference audio './voices/default.wav' not found")
-                return jsonify({"error": "Reference audio is required (upload, ref_audio_path, or ./voices/default.wav)"}), 400
-
-        wav_io = synthesize_bytes(text, ref_audio_to_use, ref_text, max_new_tokens=max_new_tokens, chunk_length=chunk_length)
-
-        # Save a copy to ./outputs/output.wav for direct playback, then clean up temp file if created
         try:
-            os.makedirs('outputs', exist_ok=True)
-            out_path = os.path.join('outputs', 'output.wav')
-            with open(out_path, 'wb') as out_f:
-                out_f.write(wav_io.getvalue())
-            logger.info(f"Saved generated audio to {out_path}")
-        except Exception as e:
-            logger.warning(f"Failed to save generated audio to ./outputs/output.wav: {e}")
-
-        # Clean up temp file if created
-        if temp_file_path:
-            try:
-                os.remove(temp_file_path)
-            except Exception:
-                logger.warning(f"Could not remove temp file {temp_file_path}")
+            output_format = negotiate_format(requested_format, request.accept_mimetypes) or 'wav'
+            output_rate = output_sample_rate(output_format, parse_sample_rate(requested_rate, 0), TARGET_SR)
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({"error": str(e)}), 400
+
+        with tracker.stage('preprocess'):
+            ref_audio_bytes, error_response = _load_reference_audio(uploaded_file, ref_audio_path)
+        if error_response:
+            return error_response
+
+        pcm = synthesize_pcm(text, ref_audio_bytes, ref_text, max_new_tokens=max_new_tokens, chunk_length=chunk_length, output_rate=output_rate, tracker=tracker)
+        with tracker.stage('encoding'):
+            parts, length, encode_seconds = encode_pcm(pcm, output_rate, output_format)
+        tracker.first_audio()
+        logger.info(f"Encoded {output_format}: {length} bytes in {encode_seconds * 1000:.1f} ms")
+
+        if output_archive:
+            output_archive.submit(parts, output_format)
 
         logger.info("Successfully generated audio")
-        # Rewind buffer before sending
-        wav_io.seek(0)
-        return send_file(wav_io, mimetype='audio/wav', as_attachment=True, download_name='output.wav')
+        return Response(iter_chunks(parts), mimetype=mimetype_for(output_format), headers={
+            'Content-Length': str(length),
+            'Content-Disposition': f'attachment; filename=output.{output_format}',
+        })
 
     except Exception as e:
         logger.error(f"Error generating audio: {e}\n{traceback.format_exc()}")
@@ -254,9 +300,14 @@ def http_tts():
 @app.route('/api/tts/stream', methods=['POST'])
 def http_tts_stream():
     """
-    Streamed endpoint. For compatibility it will generate audio and stream the WAV bytes as a single chunk.
+    Streamed endpoint. Sends a WAV header immediately and then raw 16-bit PCM frames
+    as each `chunk_length` text segment is decoded, so playback can start after the
+    first segment. "stream_format" may be "pcm" or "l16" for headerless frames. Pass "buffered": true to get the whole WAV as a single response
+    with Content-Length instead.
     """
     logger.info(f"Received streaming TTS request from {request.remote_addr}")
+    started = time.perf_counter()
+    tracker = metrics.track('tts_stream')
     try:
         if request.is_json:
             req = request.get_json()
@@ -265,6 +316,10 @@ def http_tts_stream():
             ref_audio_path = req.get("ref_audio_path")
             max_new_tokens = req.get("max_new_tokens", 1000)
             chunk_length = req.get("chunk_length", 1000)
+            buffered = bool(req.get("buffered", False))
+            stream_format = req.get("stream_format")
+            requested_format = req.get("format")
+            requested_rate = req.get("sample_rate")
             uploaded_file = None
         else:
             text = request.form.get("text")
@@ -272,7 +327,12 @@ def http_tts_stream():
             ref_audio_path = request.form.get("ref_audio_path")
             max_new_tokens = int(request.form.get("max_new_tokens", 1000))
             chunk_length = int(request.form.get("chunk_length", 1000))
+            buffered = request.form.get("buffered", "false").lower() in ("1", "true", "yes")
+            stream_format = request.form.get("stream_format")
+            requested_format = request.form.get("format")
+            requested_rate = request.form.get("sample_rate")
             uploaded_file = request.files.get("ref_audio")
+        tracker.voice = _voice_label(uploaded_file, ref_audio_path)
 
         if not text:
             logger.error("No text provided in request")
@@ -282,67 +342,110 @@ def http_tts_stream():
             logger.warning("No ref_text provided in request; proceeding with empty ref_text for streaming. Provide ref_text for better voice cloning quality.")
             ref_text = ""
 
-        temp_file_path = None
-        default_ref_audio = os.path.join(os.getcwd(), 'voices', 'default.wav')
-        if uploaded_file:
-            tmpf = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-            uploaded_file.save(tmpf.name)
-            temp_file_path = tmpf.name
-            ref_audio_to_use = temp_file_path
-        elif ref_audio_path:
-            # Use provided path on disk if it exists, otherwise fall back to default
-            if os.path.exists(ref_audio_path):
-                ref_audio_to_use = ref_audio_path
-            else:
-                logger.warning(f"Provided ref_audio_path {ref_audio_path} does not exist; attempting to use default reference audio.")
-                if os.path.exists(default_ref_audio):
-                    ref_audio_to_use = default_ref_audio
-                    logger.warning(f"Using default reference audio at {default_ref_audio}")
-                else:
-                    logger.error(f"Provided ref_audio_path {ref_audio_path} not found and default reference audio './voices/default.wav' not found")
-                    return jsonify({"error": "Reference audio not found (ref_audio_path invalid and ./voices/default.wav missing)"}), 400
-        else:
-            # No uploaded file and no path provided -> use default reference audio if available
-            if os.path.exists(default_ref_audio):
-                ref_audio_to_use = default_ref_audio
-                logger.warning(f"No ref_audio provided; using default reference audio at {default_ref_audio}")
-            else:
-                logger.error("No ref_audio provided and default reference audio './voices/default.wav' not found")
-                return jsonify({"error": "Reference audio is required (upload, ref_audio_path, or ./voices/default.wav)"}), 400
-
-        # Generate full WAV bytes synchronously and return them with explicit Content-Length.
-        # Returning the full bytes ensures clients receive a complete WAV file with a correct header
-        # and Content-Length which prevents some players from assuming an incorrect sample rate/format.
         try:
-            wav_io = synthesize_bytes(text, ref_audio_to_use, ref_text, max_new_tokens=max_new_tokens, chunk_length=chunk_length)
-
-            # Save a copy to ./outputs/output.wav for direct playback
+            # A compressed format ('ogg') is encoded incrementally off the inference thread
+            output_format, stream_format = negotiate_stream_format(requested_format, request.accept_mimetypes, stream_format)
+            output_rate = output_sample_rate(output_format, parse_sample_rate(requested_rate, 0), TARGET_SR)
+            pcm_stream = None if output_format else PCMStream(stream_format or 'wav', output_rate)
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({"error": str(e)}), 400
+
+        with tracker.stage('preprocess'):
+            ref_audio_bytes, error_response = _load_reference_audio(uploaded_file, ref_audio_path)
+        if error_response:
+            return error_response
+
+        if buffered:
+            # Generate full WAV bytes synchronously and return them with explicit Content-Length.
+            # Returning the full bytes ensures clients receive a complete WAV file with a correct header
+            # and Content-Length which prevents some players from assuming an incorrect sample rate/format.
             try:
-                os.makedirs('outputs', exist_ok=True)
-                out_path = os.path.join('outputs', 'output.wav')
-                with open(out_path, 'wb') as out_f:
-                    out_f.write(wav_io.getvalue())
-                logger.info(f"Saved streamed-generated audio to {out_path}")
+                pcm = synthesize_pcm(text, ref_audio_bytes, ref_text, max_new_tokens=max_new_tokens, chunk_length=chunk_length, output_rate=output_rate, tracker=tracker)
+                with tracker.stage('encoding'):
+                    parts, length, _ = encode_pcm(pcm, output_rate, 'wav')
+                tracker.first_audio()
+                if output_archive:
+                    output_archive.submit(parts, 'wav')
+
+                # Build a full response with Content-Length to avoid player/sample-rate misinterpretation.
+                resp = Response(iter_chunks(parts), mimetype='audio/wav')
+                resp.headers['Content-Length'] = str(length)
+                logger.info("Streamed audio (single chunk, returned as full response)")
             except Exception as e:
-                logger.warning(f"Failed to save streamed-generated audio to ./outputs/output.wav: {e}")
-
-            data = wav_io.getvalue()
-            # Build a full response with Content-Length to avoid player/sample-rate misinterpretation.
-            resp = Response(data, mimetype='audio/wav')
-            resp.headers['Content-Length'] = str(len(data))
-            logger.info("Streamed audio (single chunk, returned as full response)")
-        except Exception as e:
-            logger.error(f"Error during streaming synthesis: {e}\n{traceback.format_exc()}")
-            return jsonify({"error": str(e)}), 500
-
-        # Clean up temp file if created (do it after generation)
-        if temp_file_path:
+                logger.error(f"Error during streaming synthesis: {e}\n{traceback.format_exc()}")
+                return jsonify({"error": str(e)}), 500
+            return resp
+
+        # The streamed audio is kept as 16-bit PCM only when it will be archived
+        archived = PCMBuffer() if output_archive else None
+        blocks_sent = 0
+
+        def resampled_segments():
+            nonlocal blocks_sent
+            # One resampler for the whole stream, so filter state carries across segments
+            resampler = None
+            decoded = tracker.timed(generate_segments(
+                text, ref_audio_bytes, ref_text, max_new_tokens=max_new_tokens, chunk_length=chunk_length
+            ), 'inference')
+            for i, (sample_rate, segment) in enumerate(decoded):
+                with tracker.stage('encoding'):
+                    if resampler is None:
+                        resampler = Resampler(int(sample_rate), output_rate)
+                    audio = resampler.process(segment)
+                    if len(audio) and archived is not None:
+                        archived.append(audio)
+                if len(audio):
+                    blocks_sent += 1
+                    tracker.add_audio(len(audio) / output_rate)
+                    yield audio
+                logger.info(f"Streamed audio segment {i}")
+            with tracker.stage('encoding'):
+                tail = resampler.flush() if resampler else ()
+                if len(tail) and archived is not None:
+                    archived.append(tail)
+            if len(tail):
+                tracker.add_audio(len(tail) / output_rate)
+                yield tail
+
+        def generate():
+            encoder = None
+            ttfb_ms = None
             try:
-                os.remove(temp_file_path)
-            except Exception:
-                logger.warning(f"Could not remove temp file {temp_file_path}")
-
-        return resp
+                if output_format:
+                    encoder = StreamEncoder(output_format, output_rate)
+                    chunks = encode_stream(resampled_segments(), encoder)
+                else:
+                    # One header up front (for 'wav'), then raw int16 frames per decoded segment
+                    yield pcm_stream.header()
+                    chunks = tracker.timed((pcm_stream.frames(audio) for audio in resampled_segments()), 'encoding')
+                for chunk in chunks:
+                    tracker.first_audio()
+                    if ttfb_ms is None:
+                        ttfb_ms = (time.perf_counter() - started) * 1000.0
+                        logger.info(f"First audio bytes sent after {ttfb_ms:.0f} ms")
+                    yield chunk
+            except Exception as e:
+                logger.error(f"Error during streaming synthesis: {e}\n{traceback.format_exc()}")
+                # We can't return an error in a stream, so just log it
+                return
+            finally:
+                if encoder:
+                    # The encoder runs on its own thread; its time is added once
+                    tracker.add('encoding', encoder.encode_seconds)
+
+            total_ms = (time.perf_counter() - started) * 1000.0
+            _record_stream(ttfb_ms, total_ms)
+            logger.info(f"Streamed {blocks_sent} segments: ttfb={ttfb_ms or 0:.0f} ms, total={total_ms:.0f} ms")
+            if encoder:
+                logger.info(f"Streamed {output_format} audio: {encoder.bytes_out} bytes, encoded in {encoder.encode_seconds * 1000:.1f} ms")
+
+            if archived is not None and archived.length:
+                output_archive.submit(archived.wav_parts(output_rate), 'wav')
+
+        if output_format:
+            return Response(generate(), mimetype=mimetype_for(output_format))
+        return Response(generate(), mimetype=pcm_stream.mimetype, headers=pcm_stream.headers)
 
     except Exception as e:
         logger.error(f"Error preparing streaming response: {e}\n{traceback.format_exc()}")
@@ -352,7 +455,20 @@ def http_tts_stream():
 @app.route('/api/status', methods=['GET'])
 def status():
     logger.info(f"Status check from {request.remote_addr}")
-    return jsonify({"status": "running", "device": device}), 200
+    prompt_cache = _engine.prompt_cache.stats() if _engine is not None else None
+    with _stream_stats_lock:
+        streams = _stream_stats["streams"]
+        streaming = {
+            "streams": streams,
+            "mean_ttfb_ms": round(_stream_stats["total_ttfb_ms"] / streams, 1) if streams else None,
+            "mean_total_ms": round(_stream_stats["total_ms"] / streams, 1) if streams else None,
+            "last_ttfb_ms": _stream_stats["last_ttfb_ms"],
+            "last_total_ms": _stream_stats["last_total_ms"],
+        }
+    return jsonify({
+        "status": "running", "device": device, "prompt_cache": prompt_cache, "streaming": streaming,
+        "archive": output_archive.stats() if output_archive else None,
+    }), 200
 
 
 if __name__ == '__main__':
@@ -0,0 +1,185 @@
+"""Bounded inference executor for the async (ASGI) serving mode.
+
+HTTP handling runs on the event loop; synthesis runs on dedicated worker
+threads that own the models. Each job carries a key (the engine name) and
+keys listed in `limits` get their own threads, so one model never runs
+more jobs at once than it is given threads for. Jobs wait in a bounded queue:
+when it is full, `submit()` raises `QueueFull` instead of letting requests
+pile up, so the server can answer 429 with a `Retry-After` estimate.
+
+A job is a generator function run on a worker thread. Everything it yields
+is forwarded, in order, to an asyncio queue the request handler reads from.
+The forwarding blocks while that queue is full, which gives streams
+backpressure, and it stops early if the client goes away.
+"""
+import asyncio
+import concurrent.futures
+import math
+import queue
+import threading
+import time
+
+
+class QueueFull(Exception):
+    """Raised by `submit()` when no more jobs can be accepted."""
+
+    def __init__(self, retry_after, status=429):
+        reason = "Inference queue is full" if status == 429 else "Server is shutting down"
+        super().__init__(f"{reason}; retry after {retry_after} s")
+        self.retry_after = retry_after
+        self.status = status
+
+
+class JobError:
+    """Item forwarded to the caller when a job raises."""
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+JOB_DONE = object()
+
+
+class _Job:
+    def __init__(self, fn, loop, max_pending):
+        self.fn = fn
+        self.loop = loop
+        self.events = asyncio.Queue(maxsize=max_pending)
+        self.cancelled = threading.Event()
+        self.enqueued = time.monotonic()
+
+    def forward(self, item):
+        """Hand `item` to the event loop; returns False once the caller has gone."""
+        future = asyncio.run_coroutine_threadsafe(self.events.put(item), self.loop)
+        while not self.cancelled.is_set():
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                continue
+        future.cancel()
+        return False
+
+
+class InferenceExecutor:
+    """Run jobs on dedicated threads with at most `max_queue` waiting.
+
+    `limits` maps a job key to the number of threads that run jobs with that
+    key; jobs with any other key share `workers` threads. Only jobs that
+    find all of their threads busy count against `max_queue`, so with a
+    `max_queue` of 0 a job is accepted exactly when a thread is free for it.
+    """
+
+    def __init__(self, workers=1, max_queue=16, max_pending_chunks=8, limits=None):
+        self.limits = {key: max(1, int(n)) for key, n in (limits or {}).items()}
+        self.max_queue = max(0, int(max_queue))
+        self.max_pending_chunks = max(1, int(max_pending_chunks))
+        # Threads per lane; lane None runs the jobs whose key has no limit
+        self._lanes = {None: max(1, int(workers)), **self.limits}
+        self._queues = {lane: queue.Queue() for lane in self._lanes}
+        # Jobs per lane that are waiting or running
+        self._assigned = dict.fromkeys(self._lanes, 0)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        self._closed = False
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._total_service_s = 0.0
+        self._total_wait_s = 0.0
+        self._threads = [
+            threading.Thread(target=self._run, args=(lane,), daemon=True,
+                             name=f'inference-{lane}-{i}' if lane is not None else f'inference-{i}')
+            for lane, n in self._lanes.items() for i in range(n)
+        ]
+        self.workers = len(self._threads)
+        for thread in self._threads:
+            thread.start()
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up, from the mean job duration."""
+        with self._lock:
+            mean = self._total_service_s / self.completed if self.completed else 1.0
+            backlog = self._waiting + self._active
+        return max(1, math.ceil(backlog * mean / self.workers))
+
+    def submit(self, fn, key=None):
+        """Queue generator function `fn` under `key`; its output arrives on the returned job's `events`.
+
+        Must be called from the event loop. Raises QueueFull when the queue is
+        at capacity (status 429) or the executor is shutting down (status 503).
+        """
+        job = _Job(fn, asyncio.get_running_loop(), self.max_pending_chunks)
+        lane = key if key in self._lanes else None
+        with self._lock:
+            closed = self._closed
+            full = self._assigned[lane] >= self._lanes[lane] and self._queued() >= self.max_queue
+            if closed or full:
+                self.rejected += 1
+            else:
+                self._waiting += 1
+                self._assigned[lane] += 1
+        if closed:
+            raise QueueFull(self.retry_after(), status=503)
+        if full:
+            raise QueueFull(self.retry_after(), status=429)
+        self._queues[lane].put(job)
+        return job
+
+    def _queued(self):
+        # Jobs waiting because every thread of their lane is busy; call with _lock held
+        return sum(max(0, self._assigned[lane] - n) for lane, n in self._lanes.items())
+
+    def close(self):
+        """Stop accepting jobs; queued ones still run."""
+        with self._lock:
+            self._closed = True
+        for lane, n in self._lanes.items():
+            for _ in range(n):
+                self._queues[lane].put(None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "limits": dict(self.limits),
+                "max_queue": self.max_queue,
+                "queued": self._waiting,
+                "active": self._active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "mean_queue_wait_ms": round(self._total_wait_s * 1000.0 / self.completed, 1) if self.completed else 0.0,
+                "mean_service_ms": round(self._total_service_s * 1000.0 / self.completed, 1) if self.completed else 0.0,
+            }
+
+    def _run(self, lane):
+        while True:
+            job = self._queues[lane].get()
+            if job is None:
+                return
+            started = time.monotonic()
+            with self._lock:
+                self._waiting -= 1
+                self._active += 1
+            failed = False
+            if not job.cancelled.is_set():
+                generator = job.fn()
+                try:
+                    for item in generator:
+                        if not job.forward(item):
+                            break
+                except Exception as e:
+                    failed = True
+                    job.forward(JobError(e))
+                finally:
+                    generator.close()
+                job.forward(JOB_DONE)
+            with self._lock:
+                self._active -= 1
+                self._assigned[lane] -= 1
+                self.completed += 1
+                self.failed += int(failed)
+                self._total_wait_s += started - job.enqueued
+                self._total_service_s += time.monotonic() - started
@@ -0,0 +1,210 @@
+"""Cross-request micro-batching for the Kokoro service.
+
+Concurrent requests submit phoneme segments to a shared scheduler. A single
+worker thread collects segments for a short window, runs them through the
+Kokoro model as one padded batch and routes each audio slice back to the
+request that owns it.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import torch
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+
+@torch.no_grad()
+def forward_batch(model, items):
+    """Run several (phonemes, ref_s, speed) items through a KModel at once.
+
+    Mirrors `KModel.forward_with_tokens` but pads the token sequences of the
+    batch to a common width. The text side (ALBERT, duration predictor and
+    text encoder) runs as a single masked batch. The frame-level half
+    (F0/noise predictor and decoder) runs per item, because its instance
+    norms would otherwise pick up statistics from the padding and change the
+    audio. Returns a list of 1-D float CPU tensors in input order.
+    """
+    device = model.device
+    token_ids = []
+    for phonemes, _, _ in items:
+        ids = [i for i in map(model.vocab.get, phonemes) if i is not None]
+        if len(ids) + 2 > model.context_length:
+            raise ValueError(f"Phoneme sequence too long: {len(ids) + 2} > {model.context_length}")
+        token_ids.append([0, *ids, 0])
+
+    lengths = torch.tensor([len(ids) for ids in token_ids], dtype=torch.long)
+    width = int(lengths.max())
+    input_ids = torch.zeros((len(items), width), dtype=torch.long)
+    for row, ids in enumerate(token_ids):
+        input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+    input_ids = input_ids.to(device)
+    text_mask = (torch.arange(width).unsqueeze(0) + 1 > lengths.unsqueeze(1)).to(device)
+
+    ref_s = torch.cat([ref.reshape(1, -1) for _, ref, _ in items]).to(device)
+    speed = torch.tensor([float(s) for _, _, s in items], device=device).unsqueeze(1)
+    style = ref_s[:, 128:]
+
+    bert_dur = model.bert(input_ids, attention_mask=(~text_mask).int())
+    d_en = model.bert_encoder(bert_dur).transpose(-1, -2)
+    d = model.predictor.text_encoder(d_en, style, lengths, text_mask)
+    # The duration LSTM is called unpacked in KModel; pack it here so padding
+    # cannot leak into the backward direction of shorter items.
+    model.predictor.lstm.flatten_parameters()
+    x, _ = model.predictor.lstm(pack_padded_sequence(d, lengths, batch_first=True, enforce_sorted=False))
+    x, _ = pad_packed_sequence(x, batch_first=True, total_length=width)
+    duration = torch.sigmoid(model.predictor.duration_proj(x)).sum(axis=-1) / speed
+    t_en = model.text_encoder(input_ids, lengths, text_mask)
+
+    audios = []
+    for row, length in enumerate(lengths.tolist()):
+        pred_dur = torch.round(duration[row, :length]).clamp(min=1).long()
+        indices = torch.repeat_interleave(torch.arange(length, device=device), pred_dur)
+        pred_aln_trg = torch.zeros((length, indices.shape[0]), device=device)
+        pred_aln_trg[indices, torch.arange(indices.shape[0], device=device)] = 1
+        pred_aln_trg = pred_aln_trg.unsqueeze(0)
+        en = d[row:row + 1, :length].transpose(-1, -2) @ pred_aln_trg
+        F0_pred, N_pred = model.predictor.F0Ntrain(en, style[row:row + 1])
+        asr = t_en[row:row + 1, :, :length] @ pred_aln_trg
+        audio = model.decoder(asr, F0_pred, N_pred, ref_s[row:row + 1, :128]).squeeze()
+        audios.append(audio.cpu())
+    return audios
+
+
+class _Segment:
+    __slots__ = ('phonemes', 'ref_s', 'speed', 'future', 'enqueued')
+
+    def __init__(self, phonemes, ref_s, speed):
+        self.phonemes = phonemes
+        self.ref_s = ref_s
+        self.speed = speed
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class MicroBatchScheduler:
+    """Collect segments from concurrent requests and run them as padded batches.
+
+    `submit()` returns a Future resolving to the segment's audio tensor. Each
+    request should pass its own `owner` token; batches are filled round-robin
+    across owners so one long paragraph cannot starve everyone else.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait_ms=10.0):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self._pending = OrderedDict()  # owner -> deque of _Segment
+        self._pending_count = 0
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._segments = 0
+        self._fallbacks = 0
+        self._largest_batch = 0
+        self._last_batch = None
+        self._total_wait_ms = 0.0
+        self._total_infer_ms = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='kokoro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, owner, phonemes, ref_s, speed=1.0):
+        segment = _Segment(phonemes, ref_s, speed)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Scheduler is closed")
+            self._pending.setdefault(owner, deque()).append(segment)
+            self._pending_count += 1
+            self._cond.notify()
+        return segment.future
+
+    def close(self):
+        """Stop the worker once already-submitted segments have been run."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            pending = self._pending_count
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "pending_segments": pending,
+                "batches": batches,
+                "segments": self._segments,
+                "fallbacks": self._fallbacks,
+                "largest_batch": self._largest_batch,
+                "mean_batch_size": round(self._segments / batches, 2) if batches else 0.0,
+                "mean_queue_wait_ms": round(self._total_wait_ms / self._segments, 2) if self._segments else 0.0,
+                "mean_inference_ms": round(self._total_infer_ms / batches, 2) if batches else 0.0,
+                "last_batch": self._last_batch,
+            }
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending_count:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            # Give other requests a short window to add segments to this batch
+            deadline = time.monotonic() + self.max_wait_ms / 1000.0
+            while self._pending_count < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                owner, queue = next(iter(self._pending.items()))
+                batch.append(queue.popleft())
+                if queue:
+                    self._pending.move_to_end(owner)
+                else:
+                    del self._pending[owner]
+            self._pending_count -= len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            started = time.monotonic()
+            wait_ms = sum((started - s.enqueued) * 1000.0 for s in batch)
+            fallback = False
+            try:
+                audios = forward_batch(self.model, [(s.phonemes, s.ref_s, s.speed) for s in batch])
+            except Exception:
+                # Retry one by one so a single bad segment does not fail the whole batch
+                audios = None
+                fallback = len(batch) > 1
+            if audios is not None:
+                for segment, audio in zip(batch, audios):
+                    segment.future.set_result(audio)
+            else:
+                for segment in batch:
+                    try:
+                        audio = self.model(segment.phonemes, segment.ref_s, segment.speed)
+                    except Exception as e:
+                        segment.future.set_exception(e)
+                    else:
+                        segment.future.set_result(audio)
+            infer_ms = (time.monotonic() - started) * 1000.0
+            with self._stats_lock:
+                self._batches += 1
+                self._segments += len(batch)
+                self._fallbacks += int(fallback)
+                self._largest_batch = max(self._largest_batch, len(batch))
+                self._total_wait_ms += wait_ms
+                self._total_infer_ms += infer_ms
+                self._last_batch = {
+                    "size": len(batch),
+                    "inference_ms": round(infer_ms, 2),
+                    "mean_queue_wait_ms": round(wait_ms / len(batch), 2),
+                }
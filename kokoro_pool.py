@@ -0,0 +1,116 @@
+"""Shared-model pool of Kokoro language front-ends and voice packs.
+
+One KModel serves every language. Per-language G2P front-ends ("quiet"
+KPipelines without a model) are built on first use and voice packs are
+loaded onto the model's device on first use (or at startup via `preload`).
+Both are evicted least-recently-used: front-ends by count, voices by a byte
+budget.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+import torch
+from huggingface_hub import hf_hub_download
+from kokoro import KPipeline
+from kokoro.pipeline import ALIASES, LANG_CODES
+
+REPO_ID = 'hexgrad/Kokoro-82M'
+_VOICE_NAME_RE = re.compile(r'^[a-z]{2}_[a-z0-9]+$')
+
+
+def resolve_lang_code(lang_code, voice):
+    """Normalise `lang_code`, defaulting to the voice's language prefix (af_* -> 'a')."""
+    code = (lang_code or voice.split(',')[0][:1]).lower()
+    code = ALIASES.get(code, code)
+    if code not in LANG_CODES:
+        raise ValueError(f"Unsupported lang_code '{lang_code or code}' (expected one of {', '.join(LANG_CODES)})")
+    return code
+
+
+class PipelinePool:
+    """Lazily built G2P front-ends and device-resident voice packs for one KModel."""
+
+    def __init__(self, model, max_pipelines=3, voice_budget_bytes=64 * 1024 * 1024):
+        self.model = model
+        self.max_pipelines = max(1, int(max_pipelines))
+        self.voice_budget_bytes = int(voice_budget_bytes)
+        self._frontends = OrderedDict()  # lang_code -> quiet KPipeline
+        self._voices = OrderedDict()  # voice name -> pack tensor on device
+        self._voice_bytes = 0
+        self._lock = threading.Lock()
+        self.pipeline_evictions = 0
+        self.voice_evictions = 0
+        self.voice_loads = 0
+
+    def frontend(self, lang_code):
+        """Return the G2P-only KPipeline for `lang_code`, building it on first use."""
+        with self._lock:
+            pipeline = self._frontends.get(lang_code)
+            if pipeline is not None:
+                self._frontends.move_to_end(lang_code)
+                return pipeline
+        # Building a G2P front-end can take a while; don't hold the lock for it
+        pipeline = KPipeline(lang_code=lang_code, repo_id=REPO_ID, model=False)
+        with self._lock:
+            pipeline = self._frontends.setdefault(lang_code, pipeline)
+            self._frontends.move_to_end(lang_code)
+            while len(self._frontends) > self.max_pipelines:
+                self._frontends.popitem(last=False)
+                self.pipeline_evictions += 1
+        return pipeline
+
+    def _load_pack(self, voice):
+        packs = []
+        for name in voice.split(','):
+            if not _VOICE_NAME_RE.match(name):
+                raise ValueError(f"Invalid voice name '{name}'")
+            try:
+                path = hf_hub_download(repo_id=REPO_ID, filename=f'voices/{name}.pt')
+            except Exception as e:
+                raise ValueError(f"Unknown voice '{name}': {e}")
+            packs.append(torch.load(path, weights_only=True))
+        # Comma-separated voices are averaged, as KPipeline.load_voice does
+        pack = packs[0] if len(packs) == 1 else torch.mean(torch.stack(packs), dim=0)
+        return pack.to(self.model.device)
+
+    def voice(self, voice):
+        """Return the voice pack for `voice` on the model's device."""
+        with self._lock:
+            pack = self._voices.get(voice)
+            if pack is not None:
+                self._voices.move_to_end(voice)
+                return pack
+        pack = self._load_pack(voice)
+        size = pack.numel() * pack.element_size()
+        with self._lock:
+            if voice not in self._voices:
+                self._voices[voice] = pack
+                self._voice_bytes += size
+                self.voice_loads += 1
+            self._voices.move_to_end(voice)
+            # Always keep the voice we were asked for, even if it alone exceeds the budget
+            while self._voice_bytes > self.voice_budget_bytes and len(self._voices) > 1:
+                _, evicted = self._voices.popitem(last=False)
+                self._voice_bytes -= evicted.numel() * evicted.element_size()
+                self.voice_evictions += 1
+            return self._voices[voice]
+
+    def preload(self, voices):
+        """Build front-ends and load packs for `voices` ahead of traffic."""
+        for voice in voices:
+            self.frontend(resolve_lang_code(None, voice))
+            self.voice(voice)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pipelines": list(self._frontends),
+                "max_pipelines": self.max_pipelines,
+                "pipeline_evictions": self.pipeline_evictions,
+                "voices": list(self._voices),
+                "voice_bytes": self._voice_bytes,
+                "voice_budget_bytes": self.voice_budget_bytes,
+                "voice_loads": self.voice_loads,
+                "voice_evictions": self.voice_evictions,
+            }
@@ -1,11 +1,16 @@
 import os
 import sys
 import subprocess
+import hashlib
+import importlib
+import json
 import logging
 from logging.handlers import RotatingFileHandler
-import io
 import shutil
 import textwrap
+import threading
+import time
+from contextlib import nullcontext
 
 # NOTE: This launcher prefers to run inside a Conda environment. If a suitable
 # Conda env (name controlled by `KOKORO_CONDA_ENV`, default `kokoro`) exists
@@ -13,8 +18,31 @@ import textwrap
 # re-exec inside that env. The script will avoid using the system Python
 # unless the user explicitly requests it with the `--use-system-python`
 # command-line flag or `KOKORO_ALLOW_SYSTEM_PYTHON=1` environment variable.
+#
+# Once an interpreter has passed these checks the launcher writes a stamp
+# (`KOKORO_ENV_STAMP`, default `.kokoro_env_stamp.json` next to this file)
+# recording the interpreter, the installed versions of the requirements and
+# a hash of the requirement list. Later starts that match the stamp skip the
+# interpreter probing, Conda lookups and package checks entirely.
+# `--check-only` runs the full checks, writes the stamp and exits; run it
+# while building an image so containers start on the fast path.
 
 SUPPORTED_PYTHON_VERSIONS = ((3, 11),)
+# Packages installed into the active interpreter; changing this list invalidates the stamp
+REQUIREMENTS = (
+    'torch==2.8.0+cu128',
+    'numpy',
+    'soundfile',
+    'kokoro',
+    'misaki[en]',
+    'flask',
+    'flask-cors',
+    'torchfile'
+)
+CUDA_INDEX_URL = 'https://download.pytorch.org/whl/cu128'
+ENV_STAMP_FILE = os.environ.get(
+    'KOKORO_ENV_STAMP', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.kokoro_env_stamp.json')
+)
 
 
 def _python_version_tuple(python_cmd):
@@ -111,10 +139,60 @@ def _resolve_bootstrap_python():
     ).strip()
     raise RuntimeError(instructions)
 
+def _distribution_name(requirement):
+    return requirement.split('==')[0].split('[')[0]
+
+
+def _environment_fingerprint():
+    """Describe the running interpreter and its installed requirements, without importing them."""
+    from importlib import metadata
+    packages = {}
+    for requirement in REQUIREMENTS:
+        name = _distribution_name(requirement)
+        try:
+            packages[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            packages[name] = None
+    return {
+        "python": sys.executable,
+        "python_version": '%d.%d.%d' % sys.version_info[:3],
+        "requirements": hashlib.sha256('\n'.join(REQUIREMENTS).encode('utf-8')).hexdigest(),
+        "packages": packages,
+    }
+
+
+def _read_env_stamp():
+    try:
+        with open(ENV_STAMP_FILE, encoding='utf-8') as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return stamp if isinstance(stamp, dict) else None
+
+
+def _write_env_stamp():
+    # Pick up packages installed by this run
+    importlib.invalidate_caches()
+    stamp = _environment_fingerprint()
+    stamp["validated_at"] = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    tmp_path = f'{ENV_STAMP_FILE}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stamp, f, indent=2)
+        os.replace(tmp_path, ENV_STAMP_FILE)
+    except OSError as e:
+        logger.warning("Could not write environment stamp %s: %s", ENV_STAMP_FILE, e)
+
+
 def ensure_environment():
     """Ensure we're running inside a supported interpreter, preferring Conda.
 
     Behavior:
+      - If the environment stamp matches the running interpreter and its
+        installed packages, return immediately. If the stamp names another
+        interpreter that still exists, re-exec directly under it (unless
+        `--use-system-python` or `KOKORO_PYTHON` asks for a different one).
+        `--check-only` ignores the stamp and always runs the full checks.
       - If `--use-system-python` is passed or `KOKORO_ALLOW_SYSTEM_PYTHON=1`
         the script may use the current system interpreter (subject to version
         checks and `KOKORO_PYTHON`).
@@ -126,6 +204,21 @@ def ensure_environment():
     allow_system = ('--use-system-python' in sys.argv) or (os.environ.get('KOKORO_ALLOW_SYSTEM_PYTHON') == '1')
     conda_env_name = os.environ.get('KOKORO_CONDA_ENV', 'kokoro')
 
+    stamp = None if '--check-only' in sys.argv else _read_env_stamp()
+    if stamp:
+        fingerprint = _environment_fingerprint()
+        if all(stamp.get(key) == value for key, value in fingerprint.items()):
+            logger.info("Environment matches stamp %s (validated %s); skipping checks",
+                        ENV_STAMP_FILE, stamp.get('validated_at'))
+            return
+        stamped_python = stamp.get('python')
+        if (stamped_python and stamped_python != sys.executable and os.path.exists(stamped_python)
+                and not allow_system and not os.environ.get('KOKORO_PYTHON')):
+            print(f"Re-running with validated interpreter {stamped_python}...", flush=True)
+            subprocess.run([stamped_python, __file__, *sys.argv[1:]], check=True)
+            sys.exit()
+        logger.info("Environment stamp %s is out of date; re-validating", ENV_STAMP_FILE)
+
     # Defer resolving a bootstrap python until after attempting Conda-based
     # activation/creation. `_resolve_bootstrap_python` may raise if no
     # suitable interpreter exists; we only want to call it as a fallback.
@@ -165,7 +258,6 @@ def ensure_environment():
             try:
                 # Check existing envs via `conda env list --json`
                 out = subprocess.check_output([conda_cmd, 'env', 'list', '--json'], text=True)
-                import json
                 envs = json.loads(out).get('envs', [])
                 target_prefix = None
                 for p in envs:
@@ -224,27 +316,16 @@ def ensure_environment():
     # At this point we should be running inside a supported interpreter (Conda
     # env or allowed system interpreter). Proceed to ensure required packages
     # are installed into the active interpreter.
-    # List of required packages with versions where needed
-    requirements = [
-        'torch==2.8.0+cu128',
-        'numpy',
-        'soundfile',
-        'kokoro',
-        'misaki[en]',
-        'flask',
-        'flask-cors',
-        'torchfile'
-    ]
-    CUDA_INDEX_URL = 'https://download.pytorch.org/whl/cu128'
-    for pkg in requirements:
+    for pkg in REQUIREMENTS:
         try:
-            __import__(pkg.split('==')[0].split('[')[0])  # Check if importable
+            __import__(_distribution_name(pkg).replace('-', '_'))  # Check if importable
         except ImportError as e:
             print(f"Installing {pkg}...", flush=True)
             cmd = [sys.executable, '-m', 'pip', 'install', pkg]
             if pkg.startswith('torch=='):
                 cmd.extend(['--index-url', CUDA_INDEX_URL])
             subprocess.run(cmd, check=True)
+    _write_env_stamp()
 
 # Set up logging
 log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service.log')
@@ -271,13 +352,24 @@ except PermissionError:
 
 # Ensure a supported Python interpreter / Conda environment is active
 ensure_environment()
+if '--check-only' in sys.argv:
+    print(f"Environment OK; stamp written to {ENV_STAMP_FILE}", flush=True)
+    sys.exit(0)
 
 # Original script imports (now safe after installs)
-import numpy as np
-from flask import Flask, request, jsonify, send_file, Response
+from flask import Flask, request, jsonify, Response
 import torch
-import soundfile as sf
-from kokoro import KPipeline
+from metrics import ServiceMetrics
+from prefork import serve_prefork
+from response_cache import ResponseCache
+from text_segmentation import progressive_segments
+from tts_engines import KokoroEngine
+from resample import parse_sample_rate, resample_stream
+from audio_stream import PCMBuffer, PCMStream, iter_chunks, wav_bytes
+from audio_encoders import (
+    StreamEncoder, encode_pcm, encode_stream, mimetype_for, negotiate_format, negotiate_stream_format,
+    output_sample_rate,
+)
 
 # Remove any existing handlers from the root logger
 logging.getLogger().handlers = []
@@ -288,24 +380,135 @@ device = "cuda" if torch.cuda.is_available() else "cpu"
 # Initialize Flask app
 app = Flask(__name__)
 
-# Global pipeline instance
-pipeline = None
-
-
-def get_pipeline():
-    global pipeline
-    if pipeline is None:
-        logger.info("Initializing Kokoro pipeline and downloading model weights if needed")
-        pipeline = KPipeline(lang_code='a', device=device)  # American English, use detected device
-    return pipeline
-
+# Prometheus metrics, served at /api/metrics (see metrics.py)
+metrics = ServiceMetrics('kokoro', queue_depth=lambda: engine.scheduler.stats()["pending_segments"])
+metrics.install(app)
+
+# The same engine the unified server uses (see tts_engines.py): one shared model,
+# per-language G2P front-ends built on demand, voice packs kept on the device
+# within a byte budget, and segments from concurrent requests micro-batched.
+# Configured by the KOKORO_* variables documented in tts-api.md.
+engine = KokoroEngine(device)
+
+# Latency-oriented streaming: the first segment is at most KOKORO_FIRST_CHUNK_WORDS
+# words (or the first clause) and each later one may be KOKORO_CHUNK_GROWTH
+# times longer, so audio starts quickly and synthesis stays ahead of playback.
+# Opt-in (per request with "adaptive", or for all streams with the variable)
+# so existing clients keep the packed segments they were built against.
+ADAPTIVE_STREAMING = os.getenv('KOKORO_ADAPTIVE_STREAMING', '0') == '1'
+FIRST_CHUNK_WORDS = int(os.getenv('KOKORO_FIRST_CHUNK_WORDS', 8))
+CHUNK_GROWTH = float(os.getenv('KOKORO_CHUNK_GROWTH', 2.0))
+
+# Encoded /api/tts responses keyed by request content (see response_cache.py).
+# KOKORO_RESPONSE_CACHE_MB=0 disables the cache; an empty KOKORO_RESPONSE_CACHE_DIR
+# keeps it in memory only.
+RESPONSE_CACHE_MB = float(os.getenv('KOKORO_RESPONSE_CACHE_MB', 64))
+response_cache = ResponseCache(
+    max_memory_bytes=int(RESPONSE_CACHE_MB * 1024 * 1024),
+    cache_dir=os.getenv('KOKORO_RESPONSE_CACHE_DIR', os.path.join('outputs', 'response_cache')) or None,
+    max_disk_bytes=int(float(os.getenv('KOKORO_RESPONSE_CACHE_DISK_MB', 1024)) * 1024 * 1024),
+    logger=logger,
+) if RESPONSE_CACHE_MB > 0 else None
+# Phrases (one per line, optionally "voice<TAB>phrase") rendered into the
+# cache at startup; also settable with --warmup FILE
+WARMUP_FILE = os.getenv('KOKORO_WARMUP_FILE')
+WARMUP_FORMATS = [f.strip() for f in os.getenv('KOKORO_WARMUP_FORMATS', 'wav').split(',') if f.strip()]
+
+# Per-stream time to first audio and playback-buffer headroom, reported by /api/status
+_stream_stats = {"streams": 0, "adaptive": 0, "underruns": 0, "total_ttfb_ms": 0.0, "last": None}
+_stream_stats_lock = threading.Lock()
+
+
+def _record_stream(ttfb_ms, min_headroom_s, audio_s, adaptive):
+    underrun = min_headroom_s is not None and min_headroom_s < 0
+    with _stream_stats_lock:
+        _stream_stats["streams"] += 1
+        _stream_stats["adaptive"] += int(adaptive)
+        _stream_stats["underruns"] += int(underrun)
+        _stream_stats["total_ttfb_ms"] += ttfb_ms or 0.0
+        _stream_stats["last"] = {
+            "adaptive": adaptive,
+            "ttfb_ms": round(ttfb_ms, 1) if ttfb_ms is not None else None,
+            "min_headroom_s": round(min_headroom_s, 3) if min_headroom_s is not None else None,
+            "audio_s": round(audio_s, 2),
+        }
+    logger.info(
+        f"Stream finished ({'adaptive' if adaptive else 'packed'} segments): ttfb={ttfb_ms or 0:.0f} ms, "
+        f"min headroom={min_headroom_s or 0:.2f} s{' (underrun)' if underrun else ''}, audio={audio_s:.2f} s"
+    )
+
+
+def _start_worker(index):
+    """Start the batching thread in this process (threads don't survive fork).
+
+    The first worker also renders the warm-up phrases in the background; the
+    disk tier of the response cache shares them with the other workers.
+    """
+    engine.start_scheduler()
+    logger.info(f"Micro-batching enabled (max_batch_size={engine.max_batch_size}, max_wait_ms={engine.max_batch_wait_ms})")
+    metrics.worker = str(index)
+    if index == 0 and WARMUP_FILE and response_cache:
+        threading.Thread(target=warm_up, args=(WARMUP_FILE,), name='kokoro-warmup', daemon=True).start()
+
+
+# Warm the pipeline during startup so required assets download before handling traffic.
+# The scheduler thread is started by _start_worker, in each serving process.
+logger.info("Initializing Kokoro model and downloading weights if needed")
+engine.load_model()
+logger.info(f"Pipeline pool ready (preloaded voices: {', '.join(engine.preload_voices) or 'none'})")
+
+def render_response(text, options, output_format, output_rate, tracker=None):
+    """Synthesise and encode a whole response; returns encode_pcm's (parts, length, seconds)."""
+    audio_chunks = []
+    for i, audio in enumerate(engine.synthesize_segments(text, options, tracker=tracker)):
+        audio_chunks.append(audio)
+        logger.info(f"Generated audio chunk {i}")
+    if not audio_chunks:
+        raise RuntimeError("No audio generated")
+    # Convert the model tensors straight into one 16-bit buffer and encode
+    with tracker.stage('encoding') if tracker else nullcontext():
+        pcm = PCMBuffer.from_blocks(resample_stream(audio_chunks, 24000, output_rate))
+        encoded = encode_pcm(pcm, output_rate, output_format)
+    if tracker:
+        tracker.add_audio(pcm.length / output_rate)
+        tracker.first_audio()
+    return encoded
+
+
+def warm_up(path):
+    """Render each phrase in `path` into the response cache, skipping cached ones."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            lines = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    except OSError as e:
+        logger.warning(f"Could not read warm-up phrases from {path}: {e}")
+        return
+    started = time.perf_counter()
+    rendered = 0
+    for line in lines:
+        voice, _, phrase = line.rpartition('\t')
+        try:
+            options = engine.parse_options({'voice': voice.strip()})
+        except Exception as e:
+            logger.warning(f"Skipping warm-up phrase {phrase!r}: {e}")
+            continue
+        for output_format in WARMUP_FORMATS:
+            key = engine.response_key(phrase, options, output_format, 24000)
+            if response_cache.get(key, output_format)[0] is not None:
+                continue
+            try:
+                parts, _, _ = render_response(phrase, options, output_format, 24000)
+                response_cache.put(key, output_format, b''.join(parts))
+                rendered += 1
+            except Exception as e:
+                logger.warning(f"Warm-up failed for {phrase!r} ({options['voice']}, {output_format}): {e}")
+    logger.info(f"Warm-up rendered {rendered} responses for {len(lines)} phrases in {time.perf_counter() - started:.1f} s")
 
-# Warm the pipeline during startup so required assets download before handling traffic
-get_pipeline()
 
 @app.route('/api/tts', methods=['POST'])
 def text_to_speech():
     logger.info(f"Received TTS request from {request.remote_addr}")
+    tracker = metrics.track('tts')
     data = request.json
     text = data.get('text')
     
@@ -314,31 +517,41 @@ def text_to_speech():
         return jsonify({"error": "Text is required"}), 400
 
     try:
-        # Generate audio
-        pipeline = get_pipeline()
-        voice = 'af_heart'
-        generator = pipeline(text, voice=voice, speed=1.0)
-        
-        # Collect all audio chunks
-        audio_chunks = []
-        for i, (gs, ps, audio) in enumerate(generator):
-            audio_chunks.append(audio)
-            logger.info(f"Generated audio chunk {i}")
-        
-        # Concatenate audio chunks
-        if audio_chunks:
-            concatenated_audio = np.concatenate(audio_chunks)
-        else:
-            logger.error("No audio generated")
-            return jsonify({"error": "No audio generated"}), 500
-        
-        # Create in-memory WAV file
-        wav_io = io.BytesIO()
-        sf.write(wav_io, concatenated_audio, 24000, format='WAV')
-        wav_io.seek(0)
-        
-        logger.info("Successfully generated audio")
-        return send_file(wav_io, mimetype='audio/wav')
+        with tracker.stage('preprocess'):
+            output_format = negotiate_format(data.get('format'), request.accept_mimetypes) or 'wav'
+            options = engine.parse_options(data)
+            output_rate = output_sample_rate(output_format, parse_sample_rate(data.get('sample_rate'), 0), 24000)
+    except ValueError as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 400
+    tracker.voice = options["voice"]
+
+    # Identical requests give identical audio, so the cache key is also the ETag
+    key = engine.response_key(text, options, output_format, output_rate) if response_cache else None
+    headers = {}
+    if key:
+        headers['ETag'] = f'"{key}"'
+        if request.if_none_match.contains(key):
+            logger.info("Client copy is current (304)")
+            return Response(status=304, headers={**headers, 'X-Cache': 'HIT'})
+        body, tier = response_cache.get(key, output_format)
+        if body is not None:
+            tracker.first_audio()
+            logger.info(f"Served cached audio from {tier} ({output_format}, {len(body)} bytes)")
+            return Response(body, mimetype=mimetype_for(output_format), headers={**headers, 'X-Cache': 'HIT', 'X-Cache-Tier': tier})
+
+    try:
+        # Encode in the negotiated format (WAV unless asked otherwise)
+        parts, length, encode_seconds = render_response(text, options, output_format, output_rate, tracker)
+        logger.info(f"Successfully generated audio ({output_format}, {length} bytes, encoded in {encode_seconds * 1000:.1f} ms)")
+        if key:
+            headers['X-Cache'] = 'MISS'
+            if length <= response_cache.max_entry_bytes:
+                body = b''.join(parts)
+                response_cache.put(key, output_format, body)
+                return Response(body, mimetype=mimetype_for(output_format), headers=headers)
+        headers['Content-Length'] = str(length)
+        return Response(iter_chunks(parts), mimetype=mimetype_for(output_format), headers=headers)
         
     except Exception as e:
         logger.error(f"Error generating audio: {str(e)}")
@@ -347,6 +560,7 @@ def text_to_speech():
 @app.route('/api/tts/stream', methods=['POST'])
 def text_to_speech_stream():
     logger.info(f"Received streaming TTS request from {request.remote_addr}")
+    tracker = metrics.track('tts_stream')
     data = request.json
     text = data.get('text')
     
@@ -354,19 +568,106 @@ def text_to_speech_stream():
         logger.error("No text provided in request")
         return jsonify({"error": "Text is required"}), 400
 
+    # A compressed format ('ogg') is encoded incrementally off the inference thread
+    try:
+        with tracker.stage('preprocess'):
+            output_format, stream_format = negotiate_stream_format(
+                data.get('format'), request.accept_mimetypes, data.get('stream_format'),
+            )
+            options = engine.parse_options(data)
+            output_rate = output_sample_rate(output_format, parse_sample_rate(data.get('sample_rate'), 0), 24000)
+    except ValueError as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 400
+    tracker.voice = options["voice"]
+
+    # 'wav_chunks' (default) sends a standalone WAV file per chunk; 'wav', 'pcm'
+    # and 'l16' send one continuous PCM stream (see audio_stream.PCMStream)
+    stream_format = stream_format or 'wav_chunks'
+    pcm_stream = None
+    if stream_format != 'wav_chunks' and not output_format:
+        try:
+            pcm_stream = PCMStream(stream_format, output_rate)
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({"error": str(e)}), 400
+
+    # Strings such as "false" (form fields, hand-written JSON) must not count as true
+    adaptive = str(data.get('adaptive', ADAPTIVE_STREAMING)).lower() in ('1', 'true', 'yes')
+    try:
+        first_chunk_words = int(data.get('first_chunk_words', FIRST_CHUNK_WORDS))
+        chunk_growth = float(data.get('chunk_growth', CHUNK_GROWTH))
+    except (TypeError, ValueError):
+        return jsonify({"error": "first_chunk_words and chunk_growth must be numbers"}), 400
+    if first_chunk_words < 1 or chunk_growth < 1.0:
+        return jsonify({"error": "first_chunk_words must be >= 1 and chunk_growth >= 1.0"}), 400
+    started = time.perf_counter()
+
+    def timed_segments(text_to_process):
+        """Synthesised audio, recording time to first audio and playback headroom.
+
+        Headroom is how much already-delivered audio is left to play when the
+        next segment is ready, assuming playback starts with the first one;
+        negative means the listener heard a gap.
+        """
+        if adaptive:
+            with tracker.stage('segmentation'):
+                segments = progressive_segments(text_to_process, 'kokoro', first_words=first_chunk_words, growth=chunk_growth)
+            source = engine.synthesize_segments(text_to_process, options, segments=segments, in_flight=1, tracker=tracker)
+        else:
+            source = engine.synthesize_segments(text_to_process, options, tracker=tracker)
+        ttfb_ms = None
+        first_at = None
+        audio_s = 0.0
+        min_headroom_s = None
+        for audio in source:
+            now = time.perf_counter()
+            if first_at is None:
+                first_at = now
+                ttfb_ms = (now - started) * 1000.0
+            else:
+                headroom = audio_s - (now - first_at)
+                min_headroom_s = headroom if min_headroom_s is None else min(min_headroom_s, headroom)
+            audio_s += len(audio) / 24000
+            yield audio
+        tracker.add_audio(audio_s)
+        _record_stream(ttfb_ms, min_headroom_s, audio_s, adaptive)
+
+    def generate_encoded(text_to_process):
+        encoder = None
+        try:
+            encoder = StreamEncoder(output_format, output_rate)
+            resampled = tracker.timed(resample_stream(timed_segments(text_to_process), 24000, output_rate), 'encoding')
+            for chunk in encode_stream(resampled, encoder):
+                tracker.first_audio()
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error generating audio stream: {str(e)}")
+            return
+        finally:
+            # The encoder runs on its own thread; its time is added once
+            if encoder:
+                tracker.add('encoding', encoder.encode_seconds)
+        logger.info(f"Streamed {output_format} audio: {encoder.bytes_out} bytes, encoded in {encoder.encode_seconds * 1000:.1f} ms")
+
+    if output_format:
+        return Response(generate_encoded(text), mimetype=mimetype_for(output_format))
+
     def generate(text_to_process):
         try:
-            pipeline = get_pipeline()
-            voice = 'af_heart'
-            generator = pipeline(text_to_process, voice=voice, speed=1.0)
+            if pcm_stream:
+                yield pcm_stream.header()
             
-            for i, (gs, ps, audio) in enumerate(generator):
-                # Create in-memory WAV file for this chunk
-                wav_io = io.BytesIO()
-                sf.write(wav_io, audio, 24000, format='WAV')
-                wav_io.seek(0)
-                
-                yield wav_io.getvalue()
+            resampled = tracker.timed(resample_stream(timed_segments(text_to_process), 24000, output_rate), 'encoding')
+            for i, audio in enumerate(resampled):
+                with tracker.stage('encoding'):
+                    if pcm_stream:
+                        chunk = pcm_stream.frames(audio)
+                    else:
+                        # Standalone WAV file for this chunk
+                        chunk = wav_bytes(audio, output_rate)
+                tracker.first_audio()
+                yield chunk
                 logger.info(f"Streamed audio chunk {i}")
                 
         except Exception as e:
@@ -374,12 +675,26 @@ def text_to_speech_stream():
             # We can't return an error in a stream, so just log it
             return
 
+    if pcm_stream:
+        return Response(generate(text), mimetype=pcm_stream.mimetype, headers=pcm_stream.headers)
     return Response(generate(text), mimetype='audio/wav')
 
 @app.route('/api/status', methods=['GET'])
 def status():
     logger.info(f"Status check from {request.remote_addr}")
-    return jsonify({"status": "running", "device": device}), 200
+    with _stream_stats_lock:
+        streams = _stream_stats["streams"]
+        streaming = {
+            "streams": streams,
+            "adaptive": _stream_stats["adaptive"],
+            "underruns": _stream_stats["underruns"],
+            "mean_ttfb_ms": round(_stream_stats["total_ttfb_ms"] / streams, 1) if streams else None,
+            "last": _stream_stats["last"],
+        }
+    return jsonify({
+        "status": "running", "device": device, "batching": engine.scheduler.stats(), "pool": engine.pool.stats(),
+        "streaming": streaming, "response_cache": response_cache.stats() if response_cache else None,
+    }), 200
 
 if __name__ == "__main__":
     # Create necessary directories if they don't exist
@@ -387,8 +702,18 @@ if __name__ == "__main__":
     
     # Get port from environment variable, default to 5000 if not set
     port = int(os.getenv('PORT', 5000))
+
+    # --warmup FILE pre-renders the phrases in FILE into the response cache
+    if '--warmup' in sys.argv[:-1]:
+        WARMUP_FILE = sys.argv[sys.argv.index('--warmup') + 1]
     
     logger.info(f"Starting Kokoro TTS service on port {port}")
     
-    # Run the Flask app 
-    app.run(host='0.0.0.0', port=port)
+    # Run the Flask app, forking TTS_WORKERS processes that share the loaded weights
+    serve_prefork(
+        app, '0.0.0.0', port,
+        workers=int(os.getenv('TTS_WORKERS', 1)),
+        threads_per_worker=int(os.getenv('TTS_THREADS_PER_WORKER', 0)) or None,
+        post_fork=_start_worker,
+        logger=logger,
+    )
@@ -0,0 +1,170 @@
+"""Single-pass loudness normaliser and lookahead peak limiter for streams.
+
+`LoudnessNormalizer` brings speech to a target RMS level and keeps peaks
+under a ceiling while audio flows through it block by block, with bounded
+memory and a fixed delay of under one frame plus the lookahead (~15 ms at
+the defaults). Whole files and streams go through the same code, so
+`/api/tts` and `/api/tts/stream` come out at the same level, and long
+documents never need to be held in memory for a global peak scan.
+
+- Level: RMS is measured over fixed frames counted from the start of the
+  stream (so the result does not depend on how audio is split into blocks).
+  Frames below the gate (pauses) do not count. The level is a running mean
+  until `window_s` of speech has been seen, then an exponential average
+  over about that long, so the gain settles quickly and then moves slowly.
+  The gain ramps linearly across each frame.
+- Limiter: the gain reduction each sample needs is spread over the
+  `lookahead_ms` before it (a sliding minimum followed by a moving average
+  of the same length), so output never exceeds `ceiling` and limiting does
+  not click.
+
+Both stages are vectorised per block: the running mean is a cumulative sum,
+the exponential average a first-order `lfilter`, and the sliding minimum a
+van Herk/Gil-Werman pass, so the cost per sample does not depend on the
+window or lookahead length.
+"""
+import numpy as np
+from scipy.signal import lfilter
+
+
+def db_to_gain(db):
+    return 10.0 ** (db / 20.0)
+
+
+def sliding_min(values, width):
+    """out[j] = min(values[j:j + width]) for every full window, in O(n) (van Herk/Gil-Werman)."""
+    count = len(values) - width + 1
+    if count <= 0:
+        return values[:0]
+    blocks = -(-len(values) // width)
+    padded = np.full(blocks * width, np.inf, dtype=values.dtype)
+    padded[:len(values)] = values
+    padded = padded.reshape(blocks, width)
+    # Minimum from the start of each block up to j, and from j to the end of its block
+    prefix = np.minimum.accumulate(padded, axis=1).reshape(-1)
+    suffix = np.minimum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].reshape(-1)
+    return np.minimum(suffix[:count], prefix[width - 1:width - 1 + count])
+
+
+class LoudnessNormalizer:
+    """Feed float blocks to `process`, then call `flush` for the tail."""
+
+    def __init__(self, sample_rate, target_dbfs=-18.0, ceiling=0.98, lookahead_ms=5.0, frame_ms=10.0,
+                 window_s=3.0, max_gain_db=20.0, gate_dbfs=-50.0):
+        self.sample_rate = int(sample_rate)
+        self.ceiling = float(ceiling)
+        self._target_energy = db_to_gain(target_dbfs) ** 2
+        self._gate_energy = db_to_gain(gate_dbfs) ** 2
+        self._max_gain = db_to_gain(max_gain_db)
+        self._frame = max(1, int(self.sample_rate * frame_ms / 1000))
+        self._lookahead = max(1, int(self.sample_rate * lookahead_ms / 1000))
+        # Frames after which the running mean turns into an exponential average
+        self._window_frames = max(1, int(window_s * self.sample_rate / self._frame))
+        self._ramp = np.arange(1, self._frame + 1, dtype=np.float32) / self._frame
+
+        self._level = None  # smoothed speech energy
+        self._active_frames = 0
+        self._gain = None  # gain at the end of the last frame
+        self._pending = np.zeros(0, dtype=np.float32)  # input not yet a whole frame
+        self._delayed = np.zeros(0, dtype=np.float32)  # gained samples awaiting the limiter
+        # Limiter gain needed per sample, from 2 * lookahead before the first delayed sample
+        self._needed = np.ones(2 * self._lookahead, dtype=np.float32)
+
+    @property
+    def latency(self):
+        """Maximum number of samples held back between `process` calls."""
+        return self._frame - 1 + self._lookahead
+
+    def _frame_gains(self, energies):
+        """Gain at the end of each frame, from the gated speech level (see the module docstring)."""
+        active = energies > self._gate_energy
+        speech = energies[active]
+        previous = np.nan if self._level is None else self._level
+        if len(speech):
+            levels = np.empty(len(speech))
+            counts = self._active_frames + np.arange(1, len(speech) + 1)
+            # Running mean until window_frames speech frames have been seen...
+            warm = int(np.count_nonzero(counts <= self._window_frames))
+            if warm:
+                total = previous * self._active_frames if self._active_frames else 0.0
+                levels[:warm] = (total + np.cumsum(speech[:warm])) / counts[:warm]
+            # ...then an exponential average with weight 1 / window_frames
+            if warm < len(speech):
+                alpha = 1.0 / self._window_frames
+                start = levels[warm - 1] if warm else previous
+                levels[warm:], _ = lfilter([alpha], [1.0, alpha - 1.0], speech[warm:], zi=[(1.0 - alpha) * start])
+            self._active_frames += len(speech)
+            self._level = float(levels[-1])
+            # Frames below the gate keep the level of the last speech frame before them
+            last = np.cumsum(active) - 1
+            frame_levels = np.where(last >= 0, levels[np.maximum(last, 0)], previous)
+        else:
+            frame_levels = np.full(len(energies), previous)
+        with np.errstate(invalid='ignore'):
+            gains = np.clip(np.sqrt(self._target_energy / frame_levels), 1.0 / self._max_gain, self._max_gain)
+        # No speech yet: unity gain
+        return np.where(np.isnan(frame_levels), 1.0, gains).astype(np.float32)
+
+    def _apply_gain(self, audio):
+        """Gain stage over whole frames; returns the gained samples."""
+        frames = len(audio) // self._frame
+        if not frames:
+            return np.zeros(0, dtype=np.float32)
+        blocks = audio[:frames * self._frame].reshape(frames, self._frame)
+        energies = np.einsum('ij,ij->i', blocks, blocks, dtype=np.float64) / self._frame
+        ends = self._frame_gains(energies)
+        starts = np.concatenate([[ends[0] if self._gain is None else self._gain], ends[:-1]])
+        self._gain = float(ends[-1])
+        gains = starts[:, None] + (ends - starts)[:, None] * self._ramp
+        return (blocks * gains).reshape(-1)
+
+    def _limit(self, gained, final=False):
+        """Limiter stage; returns every sample whose lookahead is available."""
+        L = self._lookahead
+        with np.errstate(divide='ignore'):
+            needed = np.minimum(1.0, self.ceiling / np.abs(gained)).astype(np.float32)
+        self._delayed = np.concatenate([self._delayed, gained])
+        self._needed = np.concatenate([self._needed, needed])
+        if final:
+            # Nothing follows the end of the stream, so no more limiting is needed
+            self._needed = np.concatenate([self._needed, np.ones(L, dtype=np.float32)])
+        count = len(self._needed) - 3 * L
+        if count <= 0:
+            return np.zeros(0, dtype=np.float32)
+        # window[j] = min of needed[j .. j+L]; smooth[i] = mean of window[i .. i+L]
+        window = sliding_min(self._needed, L + 1)
+        sums = np.concatenate([[0.0], np.cumsum(window, dtype=np.float64)])
+        smooth = (sums[L + 1:] - sums[:-L - 1]) / (L + 1)
+        out = self._delayed[:count] * smooth[L:L + count].astype(np.float32)
+        self._delayed = self._delayed[count:]
+        self._needed = self._needed[count:]
+        return out
+
+    def process(self, audio):
+        """Normalise the next block of float audio; returns the output that is ready."""
+        audio = np.concatenate([self._pending, np.asarray(audio, dtype=np.float32).reshape(-1)])
+        whole = len(audio) - len(audio) % self._frame
+        self._pending = audio[whole:]
+        return self._limit(self._apply_gain(audio[:whole]))
+
+    def flush(self):
+        """Return the held-back tail at the end of the stream."""
+        tail = self._pending
+        self._pending = np.zeros(0, dtype=np.float32)
+        if len(tail):
+            padded = np.concatenate([tail, np.zeros(self._frame - len(tail), dtype=np.float32)])
+            gained = self._apply_gain(padded)[:len(tail)]
+        else:
+            gained = np.zeros(0, dtype=np.float32)
+        return self._limit(gained, final=True)
+
+
+def normalize_stream(blocks, normalizer):
+    """Yield `blocks` passed through `normalizer`, skipping empty outputs."""
+    for block in blocks:
+        out = normalizer.process(block)
+        if len(out):
+            yield out
+    out = normalizer.flush()
+    if len(out):
+        yield out
@@ -0,0 +1,326 @@
+"""Prometheus metrics for the TTS services, in the text exposition format.
+
+Each service creates one `ServiceMetrics(engine)`, calls `install(app)` to
+serve `GET /api/metrics`, and starts a `RequestTracker` with `track()` at
+the top of each handler. Stage times accumulate on the tracker while the
+request runs and are observed once, after the last response chunk has been
+sent, so a stream of fifty chunks is one observation per stage just like a
+whole-file request:
+
+- `preprocess`: request parsing and text cleanup
+- `segmentation`: sentence splitting and, for Kokoro, G2P
+- `inference`: model time as seen by the request, including any wait for
+  a batch
+- `encoding`: PCM conversion, normalisation, resampling and container
+  encoding
+- `send`: time the server spent handing response chunks to the client
+
+Stage timers nest: time spent in an inner stage (say, inference pulled
+through an encoding loop) is not counted again in the outer one. Timers on
+a producer thread run in parallel with the request thread, so stage times
+can add up to more than the request's duration.
+
+Requests, in-flight requests, time to first audio, audio produced and real-time
+factor are labelled by engine, endpoint and voice. Beyond `MAX_VOICE_LABELS`
+distinct voices, new ones are reported as "other", so uploaded voices cannot
+multiply the number of series. Process RSS, torch memory and queue depth are
+sampled when scraped. Values are per process; with TTS_WORKERS > 1 each worker
+labels its series with `worker`, and a scrape sees whichever worker answered.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+STAGES = ('preprocess', 'segmentation', 'inference', 'encoding', 'send')
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 4.0)
+MAX_VOICE_LABELS = 50
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_END = object()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+            lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+            lines.extend(self._render_items(items))
+        return lines
+
+    def _render_items(self, items):
+        return [f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _render_items(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            for bound, cumulative in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", f"{bound:g}")])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+def resident_memory_bytes():
+    """Current RSS of this process, or None where it cannot be read."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+class RequestTracker:
+    """Stage times and audio produced for one request; see the module docstring."""
+
+    def __init__(self, metrics, endpoint, voice='default', engine=None):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.voice = voice
+        self.engine = engine or metrics.engine
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.ttfb = None
+        self.audio_seconds = 0.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as `name`, excluding nested stages on this thread."""
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.add(name, elapsed - inner)
+
+    def timed(self, iterable, name):
+        """Yield from `iterable`, timing each step as stage `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _END)
+            if item is _END:
+                return
+            yield item
+
+    def first_audio(self):
+        """Mark that audio is ready to send; the first call sets time to first audio."""
+        if self.ttfb is None:
+            self.ttfb = time.perf_counter() - self.started
+
+    def add_audio(self, seconds):
+        with self._lock:
+            self.audio_seconds += seconds
+
+    def wrap(self, chunks, status=200):
+        """Yield response `chunks`, timing the server's writes as `send`; finishes the request."""
+        try:
+            for chunk in chunks:
+                start = time.perf_counter()
+                yield chunk
+                self.add('send', time.perf_counter() - start)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            self.finish(status)
+
+    def finish(self, status=200):
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        self.metrics.record(self, status, time.perf_counter() - self.started)
+
+
+class ServiceMetrics:
+    """Registry of one service's metrics."""
+
+    def __init__(self, engine, queue_depth=None):
+        self.engine = engine
+        self.worker = '0'
+        # Callable returning the number of queued work items, sampled on scrape
+        self.queue_depth = queue_depth
+        self._voices = set()
+        self._voices_lock = threading.Lock()
+        base = ('engine', 'worker')
+        labels = base + ('endpoint', 'voice')
+        self.requests = Counter('tts_requests_total', 'Requests handled, by response status.', labels + ('status',))
+        self.in_flight = Gauge('tts_requests_in_flight', 'Requests being processed or sent.', base + ('endpoint',))
+        self.stage_seconds = Histogram('tts_stage_seconds', 'Time per request spent in each processing stage.', labels + ('stage',))
+        self.request_seconds = Histogram('tts_request_duration_seconds', 'Time from request start to last byte sent.', labels)
+        self.ttfb = Histogram('tts_time_to_first_audio_seconds', 'Time from request start until the first audio was ready to send.', labels)
+        self.audio_seconds = Counter('tts_audio_seconds_total', 'Seconds of audio produced.', labels)
+        self.rtf = Histogram('tts_real_time_factor', 'Request duration divided by the duration of the audio produced.', labels, RTF_BUCKETS)
+        self.queue = Gauge('tts_queue_depth', 'Work items waiting for the model.', base)
+        self.rss = Gauge('process_resident_memory_bytes', 'Resident set size of this process.', base)
+        self.torch_memory = Gauge('tts_torch_memory_bytes', 'CUDA memory held by torch.', base + ('device', 'kind'))
+
+    def _voice_label(self, voice):
+        voice = str(voice or 'default')
+        with self._voices_lock:
+            if voice in self._voices:
+                return voice
+            if len(self._voices) >= MAX_VOICE_LABELS:
+                return 'other'
+            self._voices.add(voice)
+            return voice
+
+    def track(self, endpoint, voice='default', engine=None):
+        """Start tracking the current Flask request; `install` finishes it with the response.
+
+        `engine` labels this request's series in place of the service's own
+        engine, for servers that host several.
+        """
+        tracker = RequestTracker(self, endpoint, voice, engine)
+        self.in_flight.inc(engine=tracker.engine, worker=self.worker, endpoint=endpoint)
+        g.request_metrics = tracker
+        return tracker
+
+    def record(self, tracker, status, duration):
+        labels = dict(engine=tracker.engine, worker=self.worker, endpoint=tracker.endpoint, voice=self._voice_label(tracker.voice))
+        self.in_flight.inc(-1, engine=tracker.engine, worker=self.worker, endpoint=tracker.endpoint)
+        self.requests.inc(status=status, **labels)
+        self.request_seconds.observe(duration, **labels)
+        for stage, seconds in tracker.stages.items():
+            self.stage_seconds.observe(seconds, stage=stage, **labels)
+        if tracker.ttfb is not None:
+            self.ttfb.observe(tracker.ttfb, **labels)
+        if tracker.audio_seconds:
+            self.audio_seconds.inc(tracker.audio_seconds, **labels)
+            self.rtf.observe(duration / tracker.audio_seconds, **labels)
+
+    def _sample(self):
+        base = dict(engine=self.engine, worker=self.worker)
+        if self.queue_depth is not None:
+            self.queue.set(self.queue_depth(), **base)
+        rss = resident_memory_bytes()
+        if rss is not None:
+            self.rss.set(rss, **base)
+        if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+            for index in range(torch.cuda.device_count()):
+                device = f'cuda:{index}'
+                self.torch_memory.set(torch.cuda.memory_allocated(index), device=device, kind='allocated', **base)
+                self.torch_memory.set(torch.cuda.memory_reserved(index), device=device, kind='reserved', **base)
+
+    def render(self):
+        self._sample()
+        lines = []
+        for metric in (self.requests, self.in_flight, self.stage_seconds, self.request_seconds, self.ttfb,
+                       self.audio_seconds, self.rtf, self.queue, self.rss, self.torch_memory):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def install(self, app):
+        """Serve GET /api/metrics and finish each tracked request once its response is sent (or it fails)."""
+
+        @app.after_request
+        def finish_request_metrics(response):
+            tracker = g.pop('request_metrics', None)
+            if tracker is not None:
+                if response.is_streamed:
+                    response.response = tracker.wrap(response.response, response.status_code)
+                else:
+                    tracker.finish(response.status_code)
+            return response
+
+        @app.teardown_request
+        def finish_failed_request_metrics(exc):
+            # after_request does not run for an unhandled exception; don't leave it in flight
+            tracker = g.pop('request_metrics', None)
+            if tracker is not None:
+                tracker.finish(500)
+
+        @app.route('/api/metrics', methods=['GET'])
+        def metrics():
+            return Response(self.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,355 @@
+"""Memory-mapped weight snapshots for fast model cold starts.
+
+Loading Kokoro or XTTS the usual way unpickles the whole checkpoint and
+copies every tensor into freshly initialised parameters, all in private
+heap memory. A snapshot is the same weights exported once to a
+safetensors file. Loading one builds the model's modules on the `meta`
+device (no memory, no random init), maps the file read-only and points
+every parameter and buffer at its slice of the mapping:
+
+- nothing is unpickled or copied, so startup is bounded by building the
+  module tree rather than by reading ~2 GB through pickle;
+- on CPU the weights stay file-backed pages in the page cache, so any
+  number of processes on one machine (prefork workers or separate
+  services) share a single copy; on GPU they are copied to the device
+  straight from the mapping.
+
+Snapshots record every parameter and buffer, including non-persistent
+buffers that a state dict leaves out, plus which names are aliases of
+tied weights. If the module tree built by the installed library does not
+match the snapshot, `SnapshotMismatch` is raised and the services fall
+back to the checkpoint, so a library upgrade costs a slow start, not an
+outage. The services only use a snapshot when KOKORO_SNAPSHOT or
+XTTS_SNAPSHOT names one; by default they load the checkpoint. The files are plain safetensors, readable by the `safetensors`
+package, but neither writing nor reading them needs it.
+
+Usage:
+    python model_snapshots.py export kokoro|xtts [--out PATH]
+    python model_snapshots.py bench kokoro|xtts [--snapshot PATH]
+
+`bench` loads the model both ways, each in a fresh process, and reports
+load time and the process's resident memory before and after, split into
+private (anonymous) and file-backed (shareable) pages.
+"""
+import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import torch
+
+DEFAULT_SNAPSHOTS = {
+    'kokoro': os.path.join('models', 'kokoro.safetensors'),
+    'xtts': os.path.join('models', 'xtts_v2.safetensors'),
+}
+XTTS_MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
+
+_DTYPES = {
+    'F64': torch.float64,
+    'F32': torch.float32,
+    'F16': torch.float16,
+    'BF16': torch.bfloat16,
+    'I64': torch.int64,
+    'I32': torch.int32,
+    'I16': torch.int16,
+    'I8': torch.int8,
+    'U8': torch.uint8,
+    'BOOL': torch.bool,
+}
+_DTYPE_NAMES = {dtype: name for name, dtype in _DTYPES.items()}
+
+
+class SnapshotMismatch(Exception):
+    """The snapshot does not fit the module tree built by the installed library."""
+
+
+def _itemsize(dtype):
+    return torch.empty((), dtype=dtype).element_size()
+
+
+def _named_tensors(module):
+    """Every parameter and buffer under every name it is reachable by."""
+    for name, param in module.named_parameters(remove_duplicate=False):
+        yield name, param
+    for name, buffer in module.named_buffers(remove_duplicate=False):
+        if buffer is not None:
+            yield name, buffer
+
+
+def save_snapshot(module, path, metadata=None):
+    """Write `module`'s parameters and buffers to a safetensors file at `path`."""
+    tensors, aliases = {}, {}
+    first_name = {}  # id(tensor) -> first name it was seen under
+    storages = set()
+    for name, tensor in _named_tensors(module):
+        if id(tensor) in first_name:
+            aliases[name] = first_name[id(tensor)]
+            continue
+        first_name[id(tensor)] = name
+        tensor = tensor.detach().to('cpu').contiguous()
+        if tensor.numel():
+            # Views of one storage must be written out separately
+            pointer = tensor.untyped_storage().data_ptr()
+            if pointer in storages:
+                tensor = tensor.clone()
+            storages.add(tensor.untyped_storage().data_ptr())
+        tensors[name] = tensor
+
+    # Largest elements first, so every tensor stays aligned to its element size
+    order = sorted(tensors, key=lambda n: (-tensors[n].element_size(), n))
+    header = {"__metadata__": {**{k: str(v) for k, v in (metadata or {}).items()}, "aliases": json.dumps(aliases)}}
+    offset = 0
+    for name in order:
+        tensor = tensors[name]
+        size = tensor.numel() * tensor.element_size()
+        header[name] = {"dtype": _DTYPE_NAMES[tensor.dtype], "shape": list(tensor.shape),
+                        "data_offsets": [offset, offset + size]}
+        offset += size
+    encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    encoded += b' ' * (-len(encoded) % 8)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(encoded)))
+        f.write(encoded)
+        for name in order:
+            tensor = tensors[name]
+            if tensor.numel():
+                f.write(tensor.reshape(-1).view(torch.uint8).numpy().data)
+    os.replace(tmp_path, path)
+    return offset
+
+
+def open_snapshot(path):
+    """Map a snapshot read-only; returns ({name: tensor}, metadata).
+
+    The tensors are views of the mapping, not copies. They must not be
+    written to.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    (length,) = struct.unpack_from('<Q', mapped, 0)
+    header = json.loads(mapped[8:8 + length])
+    metadata = header.pop('__metadata__', None) or {}
+    base = 8 + length
+    tensors = {}
+    with warnings.catch_warnings():
+        # torch warns that the buffer is not writable; that is the point
+        warnings.simplefilter('ignore', UserWarning)
+        for name, info in header.items():
+            dtype = _DTYPES[info['dtype']]
+            begin, end = info['data_offsets']
+            if end == begin:
+                tensors[name] = torch.empty(info['shape'], dtype=dtype)
+                continue
+            tensors[name] = torch.frombuffer(
+                mapped, dtype=dtype, count=(end - begin) // _itemsize(dtype), offset=base + begin,
+            ).reshape(info['shape'])
+    return tensors, metadata
+
+
+def _assign(module, name, value):
+    owner_name, _, leaf = name.rpartition('.')
+    owner = module.get_submodule(owner_name) if owner_name else module
+    current = owner._parameters.get(leaf) if leaf in owner._parameters else owner._buffers.get(leaf)
+    if current is not None and tuple(current.shape) != tuple(value.shape):
+        raise SnapshotMismatch(f"{name}: snapshot has shape {tuple(value.shape)}, model expects {tuple(current.shape)}")
+    if leaf in owner._parameters and not isinstance(value, torch.nn.Parameter):
+        value = torch.nn.Parameter(value, requires_grad=False)
+    # setattr (not the dicts) so modules that cache their weights, like RNNs, see the change
+    setattr(owner, leaf, value)
+    return value
+
+
+def load_snapshot(module, path):
+    """Point every parameter and buffer of `module` at the mapped snapshot in place; returns the metadata."""
+    from torch.nn.utils.weight_norm import WeightNorm
+
+    tensors, metadata = open_snapshot(path)
+    aliases = json.loads(metadata.get('aliases', '{}'))
+    expected = {name for name, _ in _named_tensors(module)}
+    provided = set(tensors) | set(aliases)
+    if expected != provided:
+        missing, unexpected = sorted(expected - provided), sorted(provided - expected)
+        raise SnapshotMismatch(
+            f"{path} does not match the model: {len(missing)} missing (e.g. {missing[:3]}), "
+            f"{len(unexpected)} unexpected (e.g. {unexpected[:3]})"
+        )
+    assigned = {}
+    for name, tensor in tensors.items():
+        assigned[name] = _assign(module, name, tensor)
+    for name, target in aliases.items():
+        _assign(module, name, assigned[target])
+
+    for module_name, submodule in module.named_modules():
+        # Old-style weight norm keeps the computed weight as a plain attribute
+        for hook in submodule._forward_pre_hooks.values():
+            if isinstance(hook, WeightNorm):
+                setattr(submodule, hook.name, hook.compute_weight(submodule))
+        for attr, value in vars(submodule).items():
+            if isinstance(value, torch.Tensor) and value.is_meta:
+                raise SnapshotMismatch(f"{module_name or 'model'}.{attr} is not in the snapshot")
+    return metadata
+
+
+def process_memory():
+    """Resident memory of this process in bytes: total, private (anonymous) and file-backed."""
+    fields = {'VmRSS': 'rss', 'RssAnon': 'rss_anon', 'RssFile': 'rss_file'}
+    memory = dict.fromkeys(fields.values())
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    memory[fields[key]] = int(value.split()[0]) * 1024
+    except OSError:
+        from metrics import resident_memory_bytes
+        memory['rss'] = resident_memory_bytes()
+    return memory
+
+
+def load_with_snapshot(path, from_snapshot, from_checkpoint, logger=None):
+    """Return (model, source): `from_snapshot(path)` if the snapshot exists and fits, else `from_checkpoint()`."""
+    started = time.perf_counter()
+    model, source = None, 'checkpoint'
+    if path and os.path.exists(path):
+        try:
+            model, source = from_snapshot(path), path
+        except Exception:
+            if logger:
+                logger.warning("Could not load weight snapshot %s; loading the checkpoint instead", path, exc_info=True)
+    if model is None:
+        model = from_checkpoint()
+    if logger:
+        memory = process_memory()
+        logger.info(
+            "Loaded weights from %s in %.2f s (RSS %s MB, private %s MB)", source, time.perf_counter() - started,
+            *(round(memory[k] / 2 ** 20) if memory[k] is not None else '?' for k in ('rss', 'rss_anon')),
+        )
+    return model, source
+
+
+def kokoro_from_checkpoint(repo_id, device):
+    from kokoro import KModel
+    return KModel(repo_id=repo_id).to(device).eval()
+
+
+def kokoro_from_snapshot(repo_id, path, device):
+    from kokoro import KModel
+    # KModel always reads a checkpoint; give it an empty one and fill the weights from the snapshot
+    fd, empty = tempfile.mkstemp(suffix='.pth')
+    os.close(fd)
+    try:
+        torch.save({}, empty)
+        with torch.device('meta'):
+            model = KModel(repo_id=repo_id, model=empty)
+    finally:
+        os.remove(empty)
+    load_snapshot(model, path)
+    return model.to(device).eval()
+
+
+def xtts_from_checkpoint(device):
+    from TTS.api import TTS
+    return TTS(XTTS_MODEL_NAME).to(device).synthesizer.tts_model
+
+
+def xtts_from_snapshot(model_dir, path, device):
+    from TTS.tts.configs.xtts_config import XttsConfig
+    from TTS.tts.models.xtts import Xtts
+
+    config = XttsConfig()
+    config.load_json(os.path.join(model_dir, 'config.json'))
+    with torch.device('meta'):
+        model = Xtts.init_from_config(config)
+        # Let the library build the tokenizer, managers and inference GPT as usual, minus reading model.pth
+        model.get_compatible_checkpoint_state_dict = lambda model_path: {}
+        model.load_checkpoint(config, checkpoint_dir=model_dir, eval=True, strict=False)
+    del model.get_compatible_checkpoint_state_dict
+    if getattr(model, 'speaker_manager', None) is not None:
+        # Built-in speaker embeddings are plain tensors, not module state; reload them off the meta device
+        model.speaker_manager = type(model.speaker_manager)(os.path.join(model_dir, 'speakers_xtts.pth'))
+    load_snapshot(model, path)
+    return model.to(device).eval()
+
+
+def xtts_model_dir():
+    from TTS.utils.manage import ModelManager
+    _, config_path, _ = ModelManager().download_model(XTTS_MODEL_NAME)
+    return os.path.dirname(config_path)
+
+
+def _load(engine, mode, path):
+    if engine == 'kokoro':
+        from kokoro_pool import REPO_ID
+        if mode == 'snapshot':
+            return kokoro_from_snapshot(REPO_ID, path, 'cpu')
+        return kokoro_from_checkpoint(REPO_ID, 'cpu')
+    if mode == 'snapshot':
+        return xtts_from_snapshot(xtts_model_dir(), path, 'cpu')
+    return xtts_from_checkpoint('cpu')
+
+
+def _mb(value):
+    return f"{value / 2 ** 20:8.0f}" if value is not None else '       ?'
+
+
+def _measure_child(engine, mode, path):
+    before = process_memory()
+    started = time.perf_counter()
+    model = _load(engine, mode, path)
+    seconds = time.perf_counter() - started
+    after = process_memory()
+    print(json.dumps({"mode": mode, "seconds": seconds, "before": before, "after": after,
+                      "parameters": sum(p.numel() for p in model.parameters())}))
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=('export', 'bench', '_measure'))
+    parser.add_argument('engine', choices=sorted(DEFAULT_SNAPSHOTS))
+    parser.add_argument('--out', '--snapshot', dest='path', default=None, help="snapshot path")
+    parser.add_argument('--mode', choices=('checkpoint', 'snapshot'), default='snapshot', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    path = args.path or DEFAULT_SNAPSHOTS[args.engine]
+
+    if args.command == 'export':
+        started = time.perf_counter()
+        model = _load(args.engine, 'checkpoint', None)
+        if args.engine == 'kokoro':
+            from kokoro_pool import REPO_ID as source
+        else:
+            source = XTTS_MODEL_NAME
+        size = save_snapshot(model, path, {"engine": args.engine, "source": source, "torch": torch.__version__})
+        print(f"Wrote {path} ({size / 2 ** 20:.0f} MB of weights) in {time.perf_counter() - started:.1f} s")
+        return 0
+    if args.command == '_measure':
+        _measure_child(args.engine, args.mode, path)
+        return 0
+
+    if not os.path.exists(path):
+        parser.error(f"{path} does not exist; run `export {args.engine}` first")
+    print(f"{'load from':<12} {'seconds':>8} {'RSS MB':>8} {'+RSS':>8} {'private':>8} {'+private':>8} {'file':>8}")
+    for mode in ('checkpoint', 'snapshot'):
+        out = subprocess.check_output(
+            [sys.executable, os.path.abspath(__file__), '_measure', args.engine, '--mode', mode, '--snapshot', path],
+            text=True,
+        )
+        result = json.loads(out.strip().splitlines()[-1])
+        before, after = result["before"], result["after"]
+        grew = {key: after[key] - before[key] for key in after if None not in (after[key], before[key])}
+        print(f"{mode:<12} {result['seconds']:8.2f} {_mb(after['rss'])} {_mb(grew.get('rss'))} "
+              f"{_mb(after['rss_anon'])} {_mb(grew.get('rss_anon'))} {_mb(after['rss_file'])}")
+    print("File-backed pages of a snapshot are shared between processes; private pages are per process.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Background archival of generated audio with size/age retention.
+
+Requests hand finished audio to `OutputArchive.submit`, which only enqueues
+it; a writer thread hashes and writes it and prunes the directory, so disk
+latency never reaches the response. Files are named by the SHA-256 of
+their contents (`<first 16 hex digits>.<ext>`), so concurrent requests
+never overwrite each other and repeated outputs are stored once. When the
+queue is full the copy is dropped (and counted) rather than blocking.
+
+Retention removes archive files older than `max_age_seconds`, then the
+oldest ones until the total is within `max_bytes`. Only files that look
+like archive entries are touched, so anything else in the directory is
+left alone.
+"""
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_ENTRY_RE = re.compile(r'^[0-9a-f]{16}\.[a-z0-9]+$')
+
+
+class OutputArchive:
+    """Write audio files to `directory` from a bounded background queue."""
+
+    def __init__(self, directory='outputs', max_bytes=None, max_age_seconds=None, max_queue=32, logger=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.logger = logger
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._lock = threading.Lock()
+        self._thread = None
+        self._entries = None  # name -> (size, mtime), oldest first; writer thread only
+        self._files = 0
+        self._bytes = 0
+        self.written = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.pruned = 0
+        self.errors = 0
+
+    def _start(self):
+        # Started on first use, so a process that forks before serving gets its own writer
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='output-archive', daemon=True)
+                self._thread.start()
+
+    def submit(self, parts, extension='wav'):
+        """Queue a file made of bytes-like `parts` for archiving; returns False if dropped.
+
+        The buffers are written as they are, so they must not be modified
+        afterwards (response buffers from encode_pcm never are).
+        """
+        self._start()
+        try:
+            self._queue.put_nowait((list(parts), extension))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.logger:
+                self.logger.warning("Output archive queue is full; dropping this copy")
+            return False
+
+    def _scan(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if _ENTRY_RE.match(name):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name, st.st_size))
+        self._entries = OrderedDict((name, (size, mtime)) for mtime, name, size in sorted(entries))
+
+    def _write(self, parts, extension):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part)
+        name = f'{digest.hexdigest()[:16]}.{extension}'
+        path = os.path.join(self.directory, name)
+        now = time.time()
+        if name in self._entries and os.path.exists(path):
+            os.utime(path, (now, now))
+            self.duplicates += 1
+        else:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                for part in parts:
+                    f.write(part)
+            os.replace(tmp_path, path)
+            self.written += 1
+            if self.logger:
+                self.logger.info(f"Archived generated audio to {path}")
+        self._entries[name] = (os.path.getsize(path), now)
+        self._entries.move_to_end(name)
+
+    def _prune(self):
+        now = time.time()
+        total = sum(size for size, _ in self._entries.values())
+        while self._entries:
+            name, (size, mtime) = next(iter(self._entries.items()))
+            expired = self.max_age_seconds and now - mtime > self.max_age_seconds
+            over = self.max_bytes and total > self.max_bytes
+            if not (expired or over):
+                break
+            del self._entries[name]
+            total -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+                self.pruned += 1
+            except FileNotFoundError:
+                pass
+        self._files = len(self._entries)
+        self._bytes = total
+
+    def _run(self):
+        while True:
+            parts, extension = self._queue.get()
+            try:
+                if self._entries is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._scan()
+                self._write(parts, extension)
+                self._prune()
+            except Exception as e:
+                self.errors += 1
+                if self.logger:
+                    self.logger.warning(f"Failed to archive generated audio: {e}")
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "pruned": self.pruned,
+            "errors": self.errors,
+            "files": self._files,
+            "bytes": self._bytes,
+        }
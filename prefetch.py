@@ -0,0 +1,64 @@
+"""Run a generator ahead of its consumer on a producer thread.
+
+Used to pipeline synthesis with encoding and sending: while the consumer
+post-processes item n, the producer is already computing item n+1 (torch
+releases the GIL during inference, so the two overlap). At most
+`lookahead` finished items are buffered, which bounds memory and keeps the
+producer from running far ahead of a slow client.
+"""
+import queue
+import threading
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def prefetch(iterable, lookahead=2, name='prefetch'):
+    """Yield the items of `iterable`, produced on a background thread.
+
+    Exceptions raised by the producer are re-raised in the consumer. If the
+    consumer stops early (e.g. the client disconnects), the producer stops
+    after the item it is working on. `lookahead` <= 0 iterates inline.
+    """
+    if lookahead <= 0:
+        yield from iterable
+        return
+
+    items = queue.Queue(maxsize=lookahead)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            put(_Failure(e))
+        finally:
+            put(_END)
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.exception
+            yield item
+    finally:
+        stopped.set()
@@ -0,0 +1,136 @@
+"""Prefork launcher for the CPU services.
+
+The parent process loads the model weights once, then forks `workers`
+children that all accept connections from one shared listening socket. The
+weights are inherited copy-on-write, so N workers cost roughly one model's
+worth of memory. Each worker pins its own torch thread count and a disjoint
+slice of CPUs, so workers do not fight over cores. Workers that die are
+re-forked from the parent.
+
+Forking is only safe before CUDA or any background threads start, so the
+launcher falls back to a single process when CUDA is initialised or
+`os.fork` is unavailable (Windows). Services must start their threads
+(schedulers, queues) in `post_fork`, not before.
+"""
+import gc
+import os
+import signal
+import socket
+import time
+
+import torch
+from werkzeug.serving import make_server
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_slice(index, threads, cpus):
+    """CPUs for worker `index`: consecutive blocks of `threads`, wrapping if oversubscribed."""
+    return [cpus[(index * threads + i) % len(cpus)] for i in range(threads)]
+
+
+def _run_worker(index, sock, app, threads, cpus, post_fork, logger):
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    pinned = cpu_slice(index, threads, cpus)
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, pinned)
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first inter-op parallel call
+        pass
+    if post_fork:
+        post_fork(index)
+    if logger:
+        logger.info(f"Worker {index} (pid {os.getpid()}) serving with {threads} torch threads on CPUs {pinned}")
+    server = make_server(sock.getsockname()[0], sock.getsockname()[1], app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+
+def serve_prefork(app, host, port, workers=1, threads_per_worker=None, post_fork=None, logger=None):
+    """Serve the WSGI `app` from `workers` forked processes sharing one socket.
+
+    `post_fork(index)` runs in each child before it starts serving. With a
+    single worker (or when forking is not possible) this is `app.run()`.
+    """
+    cuda_started = torch.cuda.is_available() and torch.cuda.is_initialized()
+    if workers > 1 and (cuda_started or not hasattr(os, 'fork')):
+        if logger:
+            logger.warning("Prefork needs os.fork and an uninitialised CUDA context; running a single worker")
+        workers = 1
+    if workers <= 1:
+        if post_fork:
+            post_fork(0)
+        app.run(host=host, port=port, threaded=True)
+        return
+
+    cpus = available_cpus()
+    threads = max(1, int(threads_per_worker or len(cpus) // workers))
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    # Move everything allocated so far out of the collector's view so the
+    # children's GC passes don't touch (and un-share) the parent's pages.
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                _run_worker(index, sock, app, threads, cpus, post_fork, logger)
+            except BaseException:
+                status = 1
+                if logger:
+                    logger.exception(f"Worker {index} crashed")
+            finally:
+                os._exit(status)
+        children[pid] = index
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    if logger:
+        logger.info(f"Forking {workers} workers with {threads} torch threads each on {len(cpus)} CPUs")
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is None or stopping:
+            continue
+        if logger:
+            logger.warning(f"Worker {index} (pid {pid}) exited with status {status}; restarting")
+        # Don't spin if a worker keeps dying on startup
+        time.sleep(1)
+        spawn(index)
+    sock.close()
@@ -147,7 +147,9 @@ def test_api_stream(input_text, output_filename):
     print("\nTesting /api/tts/stream endpoint...")
     tts_payload = {
         "text": text_content,
-        "voice_file": "voices/default.wav"
+        "voice_file": "voices/default.wav",
+        # One WAV header followed by raw 16-bit PCM frames
+        "stream_format": "wav"
     }
 
     try:
@@ -163,21 +165,39 @@ def test_api_stream(input_text, output_filename):
         all_audio = []
         sample_rate = None
         num_channels = None
+        header = b''
+        pending = b''
+        output_stream = None
 
-        for chunk in response.iter_content(chunk_size=None):
-            if chunk:
-                # Play each chunk as it arrives
-                play_audio(chunk)
-                
-                # Read the chunk's audio data
-                audio_file = io.BytesIO(chunk)
-                with wave.open(audio_file, 'rb') as wf:
-                    if sample_rate is None:
-                        # Get sample rate and channels from first chunk
+        try:
+            for chunk in response.iter_content(chunk_size=None):
+                if not chunk:
+                    continue
+                if sample_rate is None:
+                    # Collect the 44-byte WAV header, then read the format from it
+                    header += chunk
+                    if len(header) < 44:
+                        continue
+                    with wave.open(io.BytesIO(header[:44]), 'rb') as wf:
                         sample_rate = wf.getframerate()
                         num_channels = wf.getnchannels()
-                    audio_data = wf.readframes(wf.getnframes())
-                    all_audio.append(audio_data)
+                    output_stream = sd.RawOutputStream(samplerate=sample_rate, channels=num_channels, dtype='int16')
+                    output_stream.start()
+                    chunk = header[44:]
+
+                # Play whole frames as they arrive; keep any partial frame for the next chunk
+                data = pending + chunk
+                frame_bytes = 2 * num_channels
+                usable = len(data) - len(data) % frame_bytes
+                pending = data[usable:]
+                if usable:
+                    output_stream.write(data[:usable])
+                    all_audio.append(data[:usable])
+        finally:
+            if output_stream is not None:
+                output_stream.stop()
+                output_stream.close()
+        print("Finished playing audio")
 
         # If output filename is provided, save the complete audio
         if output_filename:
@@ -0,0 +1,160 @@
+"""Band-limited polyphase resampling for model output and client sample rates.
+
+`Resampler` converts between any two integer rates with a Kaiser-windowed
+sinc low-pass applied by `scipy.signal.upfirdn` (the polyphase kernel
+behind `resample_poly`), where up/down is the reduced rate ratio
+(24000 -> 8000 is 1/3, 44100 -> 24000 is 80/147). Filters are designed
+once per (source, target) pair and cached. The resampler keeps the input
+history the next outputs still need between blocks, so a stream resampled
+block by block matches resampling the whole signal, and output is aligned
+with the input (the filter delay is compensated).
+"""
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from scipy.signal import upfirdn
+
+# Rates clients may request with `sample_rate`
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+# Zero crossings of the sinc on each side of the centre, at the lower rate
+ZERO_CROSSINGS = 16
+# Cutoff as a fraction of the lower Nyquist frequency
+ROLLOFF = 0.94
+KAISER_BETA = 8.6
+
+
+def parse_sample_rate(value, default):
+    """Validate a request's `sample_rate` field; None or '' means `default`.
+
+    Raises ValueError for non-integers and rates outside 8-48 kHz. Whether
+    the output format can be encoded at the rate is checked separately, by
+    audio_encoders.output_sample_rate.
+    """
+    if value in (None, ''):
+        return int(default)
+    try:
+        rate = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"sample_rate must be an integer, got {value!r}")
+    if not MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE:
+        raise ValueError(f"sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE} Hz")
+    return rate
+
+
+@lru_cache(maxsize=32)
+def lowpass_filter(up, down):
+    """Return (h, delay) for an up/down resampler.
+
+    `h` is the low-pass at the upsampled rate, scaled by `up`; `delay` is
+    its centre in upsampled samples.
+    """
+    factor = max(up, down)
+    half = int(np.ceil(ZERO_CROSSINGS * factor / ROLLOFF))
+    n = np.arange(-half, half + 1, dtype=np.float64)
+    cutoff = ROLLOFF / (2.0 * factor)  # cycles per upsampled sample
+    h = (2.0 * cutoff * np.sinc(2.0 * cutoff * n) * np.kaiser(len(n), KAISER_BETA) * up).astype(np.float32)
+    h.setflags(write=False)
+    return h, half
+
+
+class Resampler:
+    """Stateful resampler from `src_rate` to `dst_rate`.
+
+    Feed blocks of shape (samples,) or (samples, channels) to `process` and
+    call `flush` at the end of the stream for the last few outputs.
+    """
+
+    def __init__(self, src_rate, dst_rate):
+        self.src_rate = int(src_rate)
+        self.dst_rate = int(dst_rate)
+        g = gcd(self.src_rate, self.dst_rate)
+        self.up = self.dst_rate // g
+        self.down = self.src_rate // g
+        self._h, self._delay = lowpass_filter(self.up, self.down)
+        # Input samples each output depends on
+        self._taps = -(-len(self._h) // self.up)
+        self._buf = None  # input history, starting at absolute index _buf_start
+        self._buf_start = -(self._taps - 1)
+        self._inputs = 0
+        self._outputs = 0
+
+    @property
+    def passthrough(self):
+        return self.up == self.down
+
+    def _newest_input(self, m):
+        # Index of the newest input sample that output m depends on
+        return (m * self.down + self._delay) // self.up
+
+    def _run(self, end):
+        if end <= self._outputs:
+            return np.zeros((0,) + self._buf.shape[1:], dtype=np.float32)
+        # Output m is sum(x[n] * h[m * down + delay - n * up]). upfirdn's output k
+        # is at m * down + delay = k * down + start * up for input starting at
+        # `start`, so start the input, zero-padded, where that offset is whole
+        pad = (self._buf_start * self.up - self._delay) % self.down * pow(self.up, -1, self.down) % self.down
+        x = self._buf
+        if pad:
+            x = np.concatenate([np.zeros((pad,) + x.shape[1:], dtype=np.float32), x])
+        first = self._outputs + (self._delay - (self._buf_start - pad) * self.up) // self.down
+        # Only the inputs the last output reads
+        x = x[:self._newest_input(end - 1) + 1 - (self._buf_start - pad)]
+        out = upfirdn(self._h, x, self.up, self.down, axis=0)[first:first + end - self._outputs]
+        self._outputs = end
+        # Drop history no later output needs, always keeping `taps - 1` samples
+        keep_from = min(self._newest_input(end) - self._taps + 1,
+                        self._buf_start + len(self._buf) - (self._taps - 1))
+        if keep_from > self._buf_start:
+            self._buf = self._buf[keep_from - self._buf_start:]
+            self._buf_start = keep_from
+        return out.astype(np.float32, copy=False)
+
+    def process(self, audio):
+        """Resample the next block; returns the outputs whose inputs have all arrived."""
+        audio = np.asarray(audio, dtype=np.float32)
+        if self.passthrough or not len(audio):
+            return audio
+        if self._buf is None:
+            self._buf = np.zeros((self._taps - 1,) + audio.shape[1:], dtype=np.float32)
+        self._buf = np.concatenate([self._buf, audio])
+        self._inputs += len(audio)
+        # Outputs m with _newest_input(m) <= _inputs - 1
+        end = max(self._outputs, (self._inputs * self.up - 1 - self._delay) // self.down + 1)
+        return self._run(end)
+
+    def flush(self):
+        """Return the remaining outputs, treating the input as zero after its end."""
+        if self.passthrough or self._buf is None:
+            return np.zeros(0, dtype=np.float32)
+        end = -(-self._inputs * self.up // self.down)
+        if end <= self._outputs:
+            return np.zeros((0,) + self._buf.shape[1:], dtype=np.float32)
+        needed = self._newest_input(end - 1) + 1 - (self._buf_start + len(self._buf))
+        if needed > 0:
+            self._buf = np.concatenate([self._buf, np.zeros((needed,) + self._buf.shape[1:], dtype=np.float32)])
+        return self._run(end)
+
+
+def resample(audio, src_rate, dst_rate):
+    """Resample a whole signal of shape (samples,) or (samples, channels)."""
+    resampler = Resampler(src_rate, dst_rate)
+    if resampler.passthrough:
+        return np.asarray(audio, dtype=np.float32)
+    return np.concatenate([resampler.process(audio), resampler.flush()])
+
+
+def resample_stream(blocks, src_rate, dst_rate):
+    """Yield `blocks` resampled to `dst_rate`, skipping empty outputs."""
+    resampler = Resampler(src_rate, dst_rate)
+    if resampler.passthrough:
+        yield from blocks
+        return
+    for block in blocks:
+        out = resampler.process(block)
+        if len(out):
+            yield out
+    out = resampler.flush()
+    if len(out):
+        yield out
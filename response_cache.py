@@ -0,0 +1,203 @@
+"""Two-tier cache of encoded /api/tts responses.
+
+Identical requests (same engine, model version, voice, speed, normalised
+text, format and sample rate) produce identical audio, so the encoded body
+is stored under a hash of those fields. The key doubles as the response
+ETag, which lets clients revalidate with If-None-Match and get a 304
+without any synthesis at all.
+
+- Memory tier: byte-capped LRU of response bodies.
+- Disk tier (optional): one file per key under `cache_dir`, byte-capped,
+  evicted least-recently-used by mtime. Files are read back through the
+  filesystem rather than a per-process index, so forked workers share
+  entries the others wrote. Only files named like entries are counted or
+  evicted, and a disk error costs that entry its disk copy, never the
+  response.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from cache_utils import content_hash
+from text_segmentation import normalize_whitespace
+
+# Entry files are <key>.<format>, where key is a hex SHA-256
+_ENTRY_RE = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+
+def response_key(engine, model_version, voice, speed, text, fmt, sample_rate, *extra):
+    """Cache key (hex SHA-256) for a synthesis request."""
+    return content_hash(
+        engine, model_version, voice, f'{float(speed):.3f}', normalize_whitespace(text), fmt, str(int(sample_rate)),
+        *(str(e) for e in extra),
+    )
+
+
+class ResponseCache:
+    """Map request keys to encoded bodies, in memory and optionally on disk."""
+
+    def __init__(self, max_memory_bytes=64 * 1024 * 1024, cache_dir=None, max_disk_bytes=1024 * 1024 * 1024,
+                 max_entry_bytes=8 * 1024 * 1024, logger=None):
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.logger = logger
+        self._memory = OrderedDict()  # key -> (body, fmt)
+        self._memory_bytes = 0
+        self._disk_bytes = 0  # estimate; recomputed from the directory when over the cap
+        self._lock = threading.Lock()
+        # Held while one thread trims the disk tier; never while holding _lock
+        self._evict_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_errors = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = self._scan_disk()[1]
+
+    def _path(self, key, fmt):
+        return os.path.join(self.cache_dir, f'{key}.{fmt}')
+
+    def _remember(self, key, body, fmt):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = (body, fmt)
+            self._memory_bytes += len(body)
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, (old, _) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(old)
+                self.evictions += 1
+
+    def get(self, key, fmt):
+        """Return (body, tier) for a cached response, or (None, None)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0], 'memory'
+        if self.cache_dir:
+            path = self._path(key, fmt)
+            try:
+                with open(path, 'rb') as f:
+                    body = f.read()
+            except FileNotFoundError:
+                body = None
+            except OSError as e:
+                self._disk_error(f"Could not read response cache entry {path}: {e}")
+                body = None
+            if body is not None:
+                try:
+                    # Mark it recently used for eviction
+                    os.utime(path)
+                except OSError:
+                    pass
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, body, fmt)
+                return body, 'disk'
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def put(self, key, fmt, body):
+        """Store an encoded body in both tiers; bodies over `max_entry_bytes` are skipped."""
+        if len(body) > self.max_entry_bytes:
+            return False
+        self._remember(key, body, fmt)
+        if self.cache_dir:
+            path = self._path(key, fmt)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                # Full or read-only disk: the entry stays in memory only
+                self._disk_error(f"Could not write response cache entry {path}: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return True
+            with self._lock:
+                self._disk_bytes += len(body)
+                over = self._disk_bytes > self.max_disk_bytes
+            if over:
+                self._evict_disk()
+        return True
+
+    def _disk_error(self, message):
+        with self._lock:
+            self.disk_errors += 1
+        if self.logger:
+            self.logger.warning(message)
+
+    def _scan_disk(self):
+        entries, total = [], 0
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            names = []
+        for name in names:
+            # Anything else in the directory (user files, temp files) is left alone
+            if not _ENTRY_RE.match(name):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name, st.st_size))
+            total += st.st_size
+        return sorted(entries), total
+
+    def _evict_disk(self):
+        # Directory I/O happens outside _lock so lookups never wait on it, and
+        # only one thread evicts at a time; the others' puts just skip it
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            # Other workers write here too, so re-read the directory rather than trusting our estimate
+            entries, total = self._scan_disk()
+            victims = []
+            for _, name, size in entries:
+                if total <= self.max_disk_bytes:
+                    break
+                victims.append((name, size))
+                total -= size
+            removed = 0
+            for name, size in victims:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    removed += 1
+                except FileNotFoundError:
+                    pass  # another worker evicted it
+                except OSError:
+                    total += size
+            with self._lock:
+                self._disk_bytes = total
+                self.evictions += removed
+        finally:
+            self._evict_lock.release()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "persistent": bool(self.cache_dir),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "disk_errors": self.disk_errors,
+            }
@@ -0,0 +1,136 @@
+"""Persistent cache of synthesised sentence audio.
+
+Documents often repeat sentences (greetings, disclaimers, boilerplate), and
+a sentence spoken by the same voice in the same language comes out of the
+model the same way every time it is worth reusing. `SentenceAudioCache`
+stores each sentence's raw model output (before loudness normalisation,
+resampling or the inter-sentence pause) as 16-bit PCM, one headerless
+`.pcm` file per sentence, so only novel sentences reach the model.
+
+Keys hash the whitespace-normalised sentence, the voice (the content hash
+its speaker latents were computed from), the language and a namespace for
+the model and its sampling settings, so changing either starts a fresh set
+of entries. An in-memory index of key -> size answers lookups without
+touching the filesystem and drives least-recently-used eviction under a
+byte cap; keys another worker wrote since the index was built are picked
+up with a single stat.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from audio_stream import pcm16_into
+from cache_utils import content_hash
+from text_segmentation import normalize_whitespace
+
+PCM_SCALE = 32767.0
+
+
+class SentenceAudioCache:
+    """Sentence key -> float32 audio, stored on disk as int16 PCM."""
+
+    def __init__(self, cache_dir, namespace='', max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # key -> size in bytes, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan()
+
+    def key(self, sentence, voice_id, language):
+        return content_hash(self.namespace, normalize_whitespace(sentence), voice_id, language)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.pcm')
+
+    def _scan(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.pcm'):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+    def get(self, key):
+        """Return the cached float32 audio for `key`, or None."""
+        path = self._path(key)
+        with self._lock:
+            known = key in self._index
+        if not known and not os.path.exists(path):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            pcm = np.fromfile(path, dtype='<i2')
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted (possibly by another worker) since it was indexed
+            with self._lock:
+                self._bytes -= self._index.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+            else:
+                self._index[key] = pcm.nbytes
+                self._bytes += pcm.nbytes
+            self.hits += 1
+        return pcm.astype(np.float32) / PCM_SCALE
+
+    def put(self, key, audio):
+        """Store float audio under `key` as 16-bit PCM; raises OSError if it cannot be written."""
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        pcm = np.empty(len(audio), dtype='<i2')
+        pcm16_into(audio, pcm)
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            pcm.tofile(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Don't leave a partial file behind on a full disk
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._bytes += pcm.nbytes - self._index.pop(key, 0)
+            self._index[key] = pcm.nbytes
+            self.stores += 1
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                old, size = self._index.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(old))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "stores": self.stores,
+                "evictions": self.evictions,
+            }
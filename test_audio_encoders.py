@@ -0,0 +1,99 @@
+import io
+import threading
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from audio_encoders import (
+    StreamEncoder, encode_audio, encode_stream, negotiate_format, negotiate_stream_format, output_sample_rate,
+)
+
+
+class SlowEncoder:
+    """Stands in for StreamEncoder; records whether it was closed."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.blocks = 0
+        self.closed = False
+
+    def encode(self, block):
+        time.sleep(self.delay)
+        self.blocks += 1
+        return b'x'
+
+    def close(self):
+        self.closed = True
+        return b'end'
+
+
+def encoder_threads():
+    return [t for t in threading.enumerate() if t.name == 'audio-encoder']
+
+
+def test_stream_yields_every_block_then_the_tail():
+    encoder = SlowEncoder(delay=0)
+    blocks = [np.zeros(10, dtype=np.float32)] * 5
+    assert b''.join(encode_stream(iter(blocks), encoder)) == b'x' * 5 + b'end'
+    assert encoder.closed
+    assert not encoder_threads()
+
+
+def test_closing_early_stops_the_worker():
+    encoder = SlowEncoder()
+    stream = encode_stream((np.zeros(10, dtype=np.float32) for _ in range(100)), encoder, max_pending=2)
+    next(stream)
+    # The worker is busy and the queue is full when the client goes away
+    stream.close()
+    deadline = time.monotonic() + 3
+    while encoder_threads() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not encoder_threads()
+    assert encoder.closed
+    assert encoder.blocks < 100
+
+
+def test_encoder_errors_reach_the_consumer():
+    class Broken(SlowEncoder):
+        def encode(self, block):
+            raise RuntimeError('codec failed')
+
+    with pytest.raises(RuntimeError, match='codec failed'):
+        list(encode_stream(iter([np.zeros(10, dtype=np.float32)]), Broken()))
+
+
+def test_ogg_stream_decodes():
+    rate = 24000
+    tone = np.sin(2 * np.pi * 440 * np.arange(rate) / rate).astype(np.float32) * 0.5
+    data = b''.join(encode_stream(iter(np.array_split(tone, 10)), StreamEncoder('ogg', rate)))
+    decoded, decoded_rate = sf.read(io.BytesIO(data), dtype='float32')
+    assert decoded_rate == rate
+    assert abs(len(decoded) - len(tone)) < rate // 10
+
+
+def test_whole_wav_round_trips():
+    audio = np.linspace(-0.5, 0.5, 1000, dtype=np.float32)
+    data, _ = encode_audio(audio, 16000, 'wav')
+    decoded, rate = sf.read(io.BytesIO(data), dtype='float32')
+    assert rate == 16000
+    np.testing.assert_allclose(decoded, audio, atol=1 / 32768)
+
+
+def test_negotiation():
+    assert negotiate_format('opus') == 'ogg'
+    assert negotiate_format(None) is None
+    assert negotiate_stream_format('wav', None) == (None, 'wav')
+    assert negotiate_stream_format('opus', None) == ('ogg', None)
+    with pytest.raises(ValueError):
+        negotiate_format('aiff')
+
+
+def test_opus_sample_rates():
+    assert output_sample_rate('ogg', 16000, 24000) == 16000
+    # A native rate Opus cannot take is raised to 48 kHz
+    assert output_sample_rate('ogg', 0, 44100) == 48000
+    with pytest.raises(ValueError):
+        output_sample_rate('ogg', 22050, 24000)
+    assert output_sample_rate('wav', 22050, 24000) == 22050
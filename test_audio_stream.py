@@ -0,0 +1,67 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from audio_stream import PCMBuffer, PCMStream, iter_chunks, pcm16_into, wav_bytes
+
+
+def read_wav(data):
+    with wave.open(io.BytesIO(data)) as f:
+        return f.getframerate(), np.frombuffer(f.readframes(f.getnframes()), dtype='<i2')
+
+
+def test_pcm16_scales_and_clips():
+    out = pcm16_into(np.array([0.0, 0.5, -1.0, 2.0, -2.0], dtype=np.float32), np.empty(5, dtype='<i2'))
+    assert out.tolist() == [0, 16383, -32767, 32767, -32767]
+
+
+def test_pcm16_gain_spans_scratch_blocks():
+    audio = np.full(200000, 0.25, dtype=np.float32)
+    out = pcm16_into(audio, np.empty(len(audio), dtype='<i2'), gain=2.0)
+    assert (out == 16383).all()
+
+
+def test_buffer_from_blocks_is_exact_and_serves_a_wav():
+    blocks = [np.full(n, 0.1, dtype=np.float32) for n in (3, 1000, 17)]
+    pcm = PCMBuffer.from_blocks(blocks)
+    assert pcm.length == 1020 and len(pcm._data) == 1020
+    rate, frames = read_wav(b''.join(iter_chunks(pcm.wav_parts(24000), chunk_bytes=100)))
+    assert rate == 24000
+    np.testing.assert_array_equal(frames, pcm.samples)
+
+
+def test_buffer_grows_and_appends_silence():
+    pcm = PCMBuffer()
+    pcm.append(np.ones(10, dtype=np.float32))
+    pcm.append_silence(5)
+    pcm.append(-np.ones(10, dtype=np.float32))
+    assert pcm.samples.tolist() == [32767] * 10 + [0] * 5 + [-32767] * 10
+    assert pcm.nbytes == 50
+
+
+def test_wav_bytes_round_trips():
+    audio = np.linspace(-1, 1, 101, dtype=np.float32)
+    rate, frames = read_wav(wav_bytes(audio, 16000))
+    assert rate == 16000
+    np.testing.assert_array_equal(frames, (audio * np.float32(32767)).astype(np.int16))
+
+
+def test_iter_chunks_bounds_chunk_size():
+    chunks = list(iter_chunks([b'a' * 250, memoryview(b'b' * 10)], chunk_bytes=100))
+    assert [len(c) for c in chunks] == [100, 100, 50, 10]
+    assert all(isinstance(c, bytes) for c in chunks)
+
+
+@pytest.mark.parametrize('fmt,header,first', [('wav', 44, b'\xff\x7f'), ('pcm', 0, b'\xff\x7f'), ('l16', 0, b'\x7f\xff')])
+def test_stream_framing(fmt, header, first):
+    stream = PCMStream(fmt, 22050)
+    assert len(stream.header()) == header
+    assert stream.frames(np.ones(2, dtype=np.float32))[:2] == first
+    assert stream.headers['X-Sample-Rate'] == '22050'
+
+
+def test_unknown_stream_format():
+    with pytest.raises(ValueError):
+        PCMStream('mp3', 24000)
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from inference_queue import JOB_DONE, InferenceExecutor, JobError, QueueFull
+
+
+async def drain(job):
+    items = []
+    while True:
+        item = await job.events.get()
+        if item is JOB_DONE:
+            return items
+        items.append(item)
+
+
+class Concurrency:
+    """Job factory that records how many of its jobs run at once."""
+
+    def __init__(self, seconds=0.05):
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def job(self):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        yield b'done'
+
+
+def test_jobs_forward_their_output():
+    def chunks():
+        yield b'a'
+        yield b'b'
+
+    async def main():
+        executor = InferenceExecutor()
+        job = executor.submit(chunks)
+        assert await drain(job) == [b'a', b'b']
+        executor.close()
+    asyncio.run(main())
+
+
+def test_job_errors_are_forwarded():
+    def failing():
+        yield b'a'
+        raise RuntimeError('boom')
+
+    async def main():
+        executor = InferenceExecutor()
+        items = await drain(executor.submit(failing))
+        assert items[0] == b'a'
+        assert isinstance(items[1], JobError) and str(items[1].exception) == 'boom'
+        executor.close()
+    asyncio.run(main())
+
+
+def test_each_key_runs_at_most_its_limit():
+    async def main():
+        executor = InferenceExecutor(limits={'kokoro': 3, 'xtts': 1}, max_queue=32)
+        kokoro, xtts = Concurrency(), Concurrency()
+        jobs = [executor.submit(kokoro.job, key='kokoro') for _ in range(6)]
+        jobs += [executor.submit(xtts.job, key='xtts') for _ in range(4)]
+        await asyncio.gather(*(drain(job) for job in jobs))
+        executor.close()
+        return kokoro.peak, xtts.peak
+
+    kokoro_peak, xtts_peak = asyncio.run(main())
+    assert kokoro_peak == 3
+    assert xtts_peak == 1
+
+
+def test_full_queue_is_rejected():
+    async def main():
+        executor = InferenceExecutor(workers=1, max_queue=1)
+        slow = Concurrency(seconds=0.2)
+        first = executor.submit(slow.job)
+        await asyncio.sleep(0.05)
+        second = executor.submit(slow.job)
+        with pytest.raises(QueueFull) as rejected:
+            executor.submit(slow.job)
+        assert rejected.value.status == 429 and rejected.value.retry_after >= 1
+        await drain(first)
+        await drain(second)
+        executor.close()
+        with pytest.raises(QueueFull) as closed:
+            executor.submit(slow.job)
+        assert closed.value.status == 503
+    asyncio.run(main())
+
+
+def test_zero_max_queue_accepts_when_a_worker_is_free():
+    async def main():
+        executor = InferenceExecutor(max_queue=0, limits={'kokoro': 2})
+        slow = Concurrency(seconds=0.2)
+        first = executor.submit(slow.job, key='kokoro')
+        second = executor.submit(slow.job, key='kokoro')
+        # Other keys have their own free thread
+        other = executor.submit(slow.job)
+        with pytest.raises(QueueFull):
+            executor.submit(slow.job, key='kokoro')
+        for job in (first, second, other):
+            await drain(job)
+        await asyncio.sleep(0.05)
+        third = executor.submit(slow.job, key='kokoro')
+        await drain(third)
+        executor.close()
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('torch')
+
+import kokoro_batching  # noqa: E402
+from kokoro_batching import MicroBatchScheduler  # noqa: E402
+
+
+class FakeModel:
+    """Per-segment fallback path: returns the phonemes it was given."""
+
+    def __call__(self, phonemes, ref_s, speed):
+        if phonemes == 'bad':
+            raise ValueError('bad segment')
+        return phonemes
+
+
+class Batches(list):
+    """Phonemes of each batch passed to forward_batch; the first one waits for `release`."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    recorded = Batches()
+
+    def forward_batch(model, items):
+        if not recorded:
+            recorded.release.wait(5)
+        recorded.append([phonemes for phonemes, _, _ in items])
+        if any(phonemes == 'bad' for phonemes, _, _ in items):
+            raise ValueError('bad segment')
+        return [phonemes for phonemes, _, _ in items]
+
+    monkeypatch.setattr(kokoro_batching, 'forward_batch', forward_batch)
+    return recorded
+
+
+def test_results_go_back_to_their_segments(batches):
+    batches.release.set()
+    scheduler = MicroBatchScheduler(FakeModel(), max_batch_size=4, max_wait_ms=5)
+    futures = [scheduler.submit(owner, f'{owner}{n}', None) for owner in 'ab' for n in range(3)]
+    assert [f.result(5) for f in futures] == ['a0', 'a1', 'a2', 'b0', 'b1', 'b2']
+    scheduler.close()
+    assert scheduler.stats()["segments"] == 6
+
+
+def test_batches_are_filled_round_robin(batches):
+    scheduler = MicroBatchScheduler(FakeModel(), max_batch_size=4, max_wait_ms=0)
+    first = scheduler.submit('warmup', 'w', None)
+    while scheduler.stats()["pending_segments"]:
+        time.sleep(0.001)
+    # While the first batch runs, one owner queues many segments and another a few
+    futures = [scheduler.submit('long', f'l{n}', None) for n in range(6)]
+    futures += [scheduler.submit('short', f's{n}', None) for n in range(2)]
+    batches.release.set()
+    first.result(5)
+    for future in futures:
+        future.result(5)
+    scheduler.close()
+    assert batches[1] == ['l0', 's0', 'l1', 's1']
+
+
+def test_a_bad_segment_fails_alone(batches):
+    batches.release.set()
+    scheduler = MicroBatchScheduler(FakeModel(), max_batch_size=8, max_wait_ms=50)
+    good = scheduler.submit('a', 'good', None)
+    bad = scheduler.submit('b', 'bad', None)
+    assert good.result(5) == 'good'
+    with pytest.raises(ValueError):
+        bad.result(5)
+    scheduler.close()
+    assert scheduler.stats()["fallbacks"] == 1
+
+
+def test_closed_scheduler_rejects_segments(batches):
+    batches.release.set()
+    scheduler = MicroBatchScheduler(FakeModel())
+    scheduler.close()
+    with pytest.raises(RuntimeError):
+        scheduler.submit('a', 'x', None)
@@ -0,0 +1,53 @@
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('kokoro')
+
+import kokoro_pool  # noqa: E402
+from kokoro_pool import PipelinePool, resolve_lang_code  # noqa: E402
+
+
+class FakeModel:
+    device = 'cpu'
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A pool whose front-ends and voice packs are built without downloads."""
+    monkeypatch.setattr(kokoro_pool, 'KPipeline', lambda lang_code, repo_id, model: ('frontend', lang_code))
+    # 1000 float32 values = 4000 bytes per voice
+    monkeypatch.setattr(PipelinePool, '_load_pack', lambda self, voice: torch.zeros(1000))
+    return PipelinePool(FakeModel(), max_pipelines=2, voice_budget_bytes=12000)
+
+
+def test_resolve_lang_code():
+    assert resolve_lang_code(None, 'af_heart') == 'a'
+    assert resolve_lang_code('B', 'af_heart') == 'b'
+    with pytest.raises(ValueError):
+        resolve_lang_code('xx', 'af_heart')
+
+
+def test_frontends_are_reused_and_evicted(pool):
+    first = pool.frontend('a')
+    assert pool.frontend('a') is first
+    pool.frontend('b')
+    pool.frontend('a')
+    pool.frontend('j')
+    assert pool.stats()["pipelines"] == ['a', 'j']
+    assert pool.stats()["pipeline_evictions"] == 1
+
+
+def test_voices_are_evicted_by_bytes(pool):
+    for voice in ('af_heart', 'af_bella', 'am_adam'):
+        pool.voice(voice)
+    pool.voice('af_heart')
+    pool.voice('bf_emma')
+    stats = pool.stats()
+    assert stats["voices"] == ['am_adam', 'af_heart', 'bf_emma']
+    assert stats["voice_bytes"] == 12000
+    assert stats["voice_loads"] == 4 and stats["voice_evictions"] == 1
+
+
+def test_invalid_voice_names_are_rejected():
+    with pytest.raises(ValueError):
+        PipelinePool(FakeModel())._load_pack('../../etc/passwd')
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from loudness import LoudnessNormalizer, db_to_gain, normalize_stream, sliding_min
+
+RATE = 24000
+
+
+def speech_like(seconds, level_db, seed=0):
+    """Noise bursts with pauses, at about `level_db` RMS while active."""
+    rng = np.random.default_rng(seed)
+    audio = rng.standard_normal(int(seconds * RATE)).astype(np.float32) * db_to_gain(level_db)
+    envelope = (np.arange(len(audio)) // (RATE // 4)) % 4 != 3
+    return audio * envelope
+
+
+def rms_db(audio):
+    active = audio[np.abs(audio) > 1e-6]
+    return 10 * np.log10(np.mean(active.astype(np.float64) ** 2))
+
+
+def run(blocks, **options):
+    return np.concatenate(list(normalize_stream(blocks, LoudnessNormalizer(RATE, **options))))
+
+
+def test_sliding_min_matches_naive():
+    rng = np.random.default_rng(1)
+    values = rng.standard_normal(1000).astype(np.float32)
+    for width in (1, 2, 7, 120, 1000):
+        expected = [values[j:j + width].min() for j in range(len(values) - width + 1)]
+        np.testing.assert_array_equal(sliding_min(values, width), expected)
+    assert len(sliding_min(values[:3], 5)) == 0
+
+
+def test_output_has_the_input_length():
+    audio = speech_like(2.3, -30)
+    assert len(run(np.array_split(audio, 7))) == len(audio)
+
+
+def test_block_size_does_not_change_the_result():
+    audio = speech_like(4, -30)
+    whole = run([audio])
+    rng = np.random.default_rng(2)
+    cuts = np.sort(rng.choice(len(audio), 40, replace=False))
+    np.testing.assert_allclose(run(np.split(audio, cuts)), whole, atol=1e-6)
+
+
+@pytest.mark.parametrize('level_db', [-35, -10])
+def test_level_approaches_the_target(level_db):
+    out = run([speech_like(12, level_db)], target_dbfs=-18.0)
+    # After the level estimate has settled
+    assert rms_db(out[6 * RATE:]) == pytest.approx(-18.0, abs=1.5)
+
+
+def test_peaks_stay_under_the_ceiling():
+    audio = speech_like(3, -25)
+    audio[RATE:RATE + 10] = 0.9
+    out = run(np.array_split(audio, 11), ceiling=0.98)
+    assert np.abs(out).max() <= 0.98 + 1e-6
+
+
+def test_silence_stays_silent():
+    out = run([np.zeros(RATE, dtype=np.float32)])
+    assert len(out) == RATE and not out.any()
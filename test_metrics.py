@@ -0,0 +1,96 @@
+import re
+
+import pytest
+from flask import Flask, Response, jsonify, request
+
+from metrics import Counter, Histogram, ServiceMetrics
+
+
+def sample(text, name, **labels):
+    """Value of the series `name` whose labels include `labels`, or None."""
+    for line in text.splitlines():
+        match = re.match(rf'{name}{{(.*)}} (\S+)$', line)
+        if match and all(f'{k}="{v}"' in match.group(1) for k, v in labels.items()):
+            return float(match.group(2))
+    return None
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    metrics = ServiceMetrics('test')
+    metrics.install(app)
+
+    @app.route('/api/tts', methods=['POST'])
+    def tts():
+        tracker = metrics.track('/api/tts')
+        data = request.get_json()
+        with tracker.stage('inference'):
+            voice = data.get('voice', 'default')
+        tracker.add_audio(2.0)
+        return jsonify({"voice": voice})
+
+    @app.route('/api/tts/stream', methods=['POST'])
+    def stream():
+        tracker = metrics.track('/api/tts/stream')
+        return Response(tracker.timed(iter([b'a', b'b']), 'encoding'), mimetype='audio/wav')
+
+    return app
+
+
+def test_request_is_counted_and_leaves_flight(app):
+    client = app.test_client()
+    assert client.post('/api/tts', json={"voice": "af"}).status_code == 200
+    text = client.get('/api/metrics').get_data(as_text=True)
+    assert sample(text, 'tts_requests_total', endpoint='/api/tts', status='200', voice='default') == 1
+    assert sample(text, 'tts_requests_in_flight', endpoint='/api/tts') == 0
+    assert sample(text, 'tts_audio_seconds_total', endpoint='/api/tts') == 2.0
+    assert sample(text, 'tts_stage_seconds_count', endpoint='/api/tts', stage='inference') == 1
+
+
+def test_unhandled_exception_leaves_flight(app):
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    client = app.test_client()
+    # A JSON array makes data.get raise AttributeError
+    response = client.post('/api/tts', json=['not', 'an', 'object'])
+    assert response.status_code == 500
+    # Flask serves the error page as a stream; the server closes it once sent
+    response.close()
+    text = client.get('/api/metrics').get_data(as_text=True)
+    assert sample(text, 'tts_requests_in_flight', endpoint='/api/tts') == 0
+    assert sample(text, 'tts_requests_total', endpoint='/api/tts', status='500') == 1
+
+
+def test_propagated_exception_leaves_flight(app):
+    app.testing = True
+    client = app.test_client()
+    with pytest.raises(AttributeError):
+        client.post('/api/tts', json=['not', 'an', 'object'])
+    text = client.get('/api/metrics').get_data(as_text=True)
+    assert sample(text, 'tts_requests_in_flight', endpoint='/api/tts') == 0
+
+
+def test_stream_finishes_after_last_chunk(app):
+    client = app.test_client()
+    response = client.post('/api/tts/stream', json={})
+    assert response.get_data() == b'ab'
+    text = client.get('/api/metrics').get_data(as_text=True)
+    assert sample(text, 'tts_requests_in_flight', endpoint='/api/tts/stream') == 0
+    assert sample(text, 'tts_requests_total', endpoint='/api/tts/stream', status='200') == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('h', 'help', ('a',), buckets=(1.0, 2.0))
+    for value in (0.5, 1.5, 3.0):
+        histogram.observe(value, a='x')
+    text = '\n'.join(histogram.render())
+    assert sample(text, 'h_bucket', le='1') == 1
+    assert sample(text, 'h_bucket', le='2') == 2
+    assert sample(text, 'h_bucket', le='+Inf') == 3
+    assert sample(text, 'h_count', a='x') == 3
+
+
+def test_label_values_are_escaped():
+    counter = Counter('c', 'help', ('voice',))
+    counter.inc(voice='a"b\\c\n')
+    assert 'voice="a\\"b\\\\c\\n"' in '\n'.join(counter.render())
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from resample import Resampler, parse_sample_rate, resample, resample_stream
+
+RATE_PAIRS = [(24000, 16000), (24000, 8000), (24000, 44100), (44100, 24000), (16000, 48000)]
+
+
+def stream(audio, src_rate, dst_rate, sizes):
+    resampler = Resampler(src_rate, dst_rate)
+    outputs, start = [], 0
+    for size in sizes:
+        outputs.append(resampler.process(audio[start:start + size]))
+        start += size
+    outputs.append(resampler.flush())
+    return np.concatenate(outputs)
+
+
+@pytest.mark.parametrize('src_rate,dst_rate', RATE_PAIRS)
+def test_random_blocks_match_whole_signal(src_rate, dst_rate):
+    rng = np.random.default_rng(src_rate + dst_rate)
+    audio = rng.standard_normal(20000).astype(np.float32)
+    sizes = []
+    while sum(sizes) < len(audio):
+        sizes.append(int(rng.choice([1, 1, 5, 20, rng.integers(1, 4000)])))
+    np.testing.assert_allclose(stream(audio, src_rate, dst_rate, sizes), resample(audio, src_rate, dst_rate),
+                               atol=1e-6)
+
+
+@pytest.mark.parametrize('sizes', [[1000, 1], [1] * 300, [5] * 300, [20] * 300])
+def test_short_blocks(sizes):
+    audio = np.random.default_rng(0).standard_normal(sum(sizes)).astype(np.float32)
+    np.testing.assert_allclose(stream(audio, 24000, 16000, sizes), resample(audio, 24000, 16000), atol=1e-6)
+
+
+def test_multichannel_matches_each_channel():
+    audio = np.random.default_rng(1).standard_normal((6000, 2)).astype(np.float32)
+    out = stream(audio, 24000, 16000, [700] * 9)
+    assert out.shape == (4000, 2)
+    for channel in range(2):
+        np.testing.assert_allclose(out[:, channel], resample(audio[:, channel], 24000, 16000), atol=1e-6)
+
+
+def test_output_length_and_tone():
+    t = np.arange(24000) / 24000
+    out = resample(np.sin(2 * np.pi * 440 * t).astype(np.float32), 24000, 16000)
+    assert len(out) == 16000
+    expected = np.sin(2 * np.pi * 440 * np.arange(16000) / 16000)
+    # Away from the edges, a tone well below both Nyquist rates passes unchanged
+    np.testing.assert_allclose(out[200:-200], expected[200:-200], atol=1e-3)
+
+
+def test_passthrough_and_empty_blocks():
+    audio = np.ones(100, dtype=np.float32)
+    assert next(resample_stream([audio], 24000, 24000)) is audio
+    resampler = Resampler(24000, 16000)
+    assert len(resampler.process(np.zeros(0, dtype=np.float32))) == 0
+    assert len(resampler.flush()) == 0
+
+
+def test_parse_sample_rate():
+    assert parse_sample_rate(None, 24000) == 24000
+    assert parse_sample_rate('16000', 24000) == 16000
+    with pytest.raises(ValueError):
+        parse_sample_rate('fast', 24000)
+    with pytest.raises(ValueError):
+        parse_sample_rate(96000, 24000)
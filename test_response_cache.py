@@ -0,0 +1,75 @@
+import os
+
+import response_cache
+from response_cache import ResponseCache, response_key
+
+
+def key(n):
+    return response_key('kokoro', 'v1', 'af_heart', 1.0, f'text {n}', 'wav', 24000)
+
+
+def test_key_ignores_whitespace_and_tracks_fields():
+    assert response_key('kokoro', 'v1', 'af', 1, 'a  b\n', 'wav', 24000) == response_key('kokoro', 'v1', 'af', 1.0, 'a b', 'wav', 24000)
+    assert response_key('kokoro', 'v1', 'af', 1, 'a b', 'wav', 24000) != response_key('kokoro', 'v1', 'af', 1, 'a b', 'wav', 16000)
+
+
+def test_memory_tier_is_lru_by_bytes():
+    cache = ResponseCache(max_memory_bytes=250)
+    for n in range(3):
+        cache.put(key(n), 'wav', bytes(100))
+    assert cache.get(key(0), 'wav') == (None, None)
+    assert cache.get(key(2), 'wav') == (bytes(100), 'memory')
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    ResponseCache(cache_dir=str(tmp_path)).put(key(0), 'wav', b'audio')
+    other = ResponseCache(cache_dir=str(tmp_path))
+    assert other.get(key(0), 'wav') == (b'audio', 'disk')
+    assert other.get(key(0), 'wav') == (b'audio', 'memory')
+
+
+def test_disk_eviction_keeps_foreign_files(tmp_path):
+    (tmp_path / 'notes.txt').write_bytes(bytes(1000))
+    cache = ResponseCache(max_memory_bytes=0, cache_dir=str(tmp_path), max_disk_bytes=250)
+    for n in range(3):
+        cache.put(key(n), 'wav', bytes(100))
+        os.utime(cache._path(key(n), 'wav'), (n, n))
+    cache.put(key(3), 'wav', bytes(100))
+    assert sorted(os.listdir(tmp_path)) == sorted(['notes.txt'] + [f'{key(n)}.wav' for n in (2, 3)])
+    assert cache.stats()["disk_bytes"] == 200
+
+
+def test_eviction_does_not_hold_the_lookup_lock(tmp_path, monkeypatch):
+    cache = ResponseCache(max_memory_bytes=0, cache_dir=str(tmp_path), max_disk_bytes=150)
+    remove = os.remove
+    held = []
+
+    def checked_remove(path):
+        held.append(cache._lock.locked())
+        remove(path)
+
+    monkeypatch.setattr(response_cache.os, 'remove', checked_remove)
+    for n in range(3):
+        cache.put(key(n), 'wav', bytes(100))
+    assert held and not any(held)
+    assert cache.stats()["evictions"] >= 2
+
+
+def test_disk_errors_keep_the_response(tmp_path, monkeypatch):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+
+    def full_disk(*args):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(response_cache.os, 'replace', full_disk)
+    assert cache.put(key(0), 'wav', b'audio')
+    assert cache.get(key(0), 'wav') == (b'audio', 'memory')
+    assert cache.stats()["disk_errors"] == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_oversized_bodies_are_not_cached():
+    cache = ResponseCache(max_entry_bytes=100)
+    assert not cache.put(key(0), 'wav', bytes(101))
+    assert cache.get(key(0), 'wav') == (None, None)
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+import sentence_cache
+from sentence_cache import SentenceAudioCache
+
+
+def tone(samples, level=0.5):
+    return (level * np.sin(np.arange(samples) / 10)).astype(np.float32)
+
+
+def test_round_trip_is_16_bit(tmp_path):
+    cache = SentenceAudioCache(str(tmp_path), 'xtts')
+    key = cache.key('Hello  there.', 'voice', 'en')
+    audio = tone(1000)
+    cache.put(key, audio)
+    np.testing.assert_allclose(cache.get(key), audio, atol=1 / 32767)
+    assert cache.stats()["hits"] == 1
+
+
+def test_key_depends_on_voice_language_and_namespace(tmp_path):
+    cache = SentenceAudioCache(str(tmp_path), 'a')
+    key = cache.key('Hello there.', 'voice', 'en')
+    assert key == cache.key(' Hello\nthere. ', 'voice', 'en')
+    assert key != cache.key('Hello there.', 'other', 'en')
+    assert key != cache.key('Hello there.', 'voice', 'de')
+    assert key != SentenceAudioCache(str(tmp_path), 'b').key('Hello there.', 'voice', 'en')
+
+
+def test_entries_are_shared_through_the_directory(tmp_path):
+    writer = SentenceAudioCache(str(tmp_path))
+    reader = SentenceAudioCache(str(tmp_path))
+    key = writer.key('Shared.', 'voice', 'en')
+    assert reader.get(key) is None
+    writer.put(key, tone(100))
+    assert reader.get(key) is not None
+    assert SentenceAudioCache(str(tmp_path)).stats()["entries"] == 1
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    cache = SentenceAudioCache(str(tmp_path), max_bytes=500)
+    keys = [cache.key(f'Sentence {n}.', 'voice', 'en') for n in range(3)]
+    cache.put(keys[0], tone(100))
+    cache.put(keys[1], tone(100))
+    cache.get(keys[0])
+    cache.put(keys[2], tone(100))
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.stats()["bytes"] == 400
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_entry_deleted_elsewhere_is_a_miss(tmp_path):
+    cache = SentenceAudioCache(str(tmp_path))
+    key = cache.key('Gone.', 'voice', 'en')
+    cache.put(key, tone(100))
+    os.remove(cache._path(key))
+    assert cache.get(key) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_failed_write_leaves_no_partial_file(tmp_path, monkeypatch):
+    cache = SentenceAudioCache(str(tmp_path))
+
+    def full_disk(*args):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(sentence_cache.os, 'replace', full_disk)
+    with pytest.raises(OSError):
+        cache.put(cache.key('Full.', 'voice', 'en'), tone(100))
+    assert os.listdir(tmp_path) == []
+    assert cache.stats()["entries"] == 0
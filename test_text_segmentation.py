@@ -0,0 +1,71 @@
+import os
+import time
+
+import pytest
+
+from text_segmentation import (
+    ENGINE_BUDGETS, normalize_whitespace, progressive_segments, segment_text, split_clauses, split_sentences,
+)
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'corpus_sample.txt')
+
+
+@pytest.mark.parametrize('text,expected', [
+    ("Hello there. How are you? Fine!", ["Hello there.", "How are you?", "Fine!"]),
+    ("Dr. Smith met Mr. Jones at 3.5 km.", ["Dr. Smith met Mr. Jones at 3.5 km."]),
+    ("J. R. R. Tolkien wrote it. Then he rested.", ["J. R. R. Tolkien wrote it.", "Then he rested."]),
+    ("I said no. Then I left.", ["I said no.", "Then I left."]),
+    ("Wait... what happened? \"Stop!\" He ran.", ["Wait... what happened?", "\"Stop!\"", "He ran."]),
+    ("No terminal punctuation", ["No terminal punctuation"]),
+    ("   ", []),
+])
+def test_split_sentences(text, expected):
+    assert split_sentences(text) == expected
+
+
+def test_split_clauses_keeps_numbers_whole():
+    assert split_clauses("It cost 1,000 dollars, which was a lot; too much.") == [
+        "It cost 1,000 dollars,", "which was a lot;", "too much.",
+    ]
+
+
+def test_normalize_whitespace():
+    assert normalize_whitespace("  a\n\tb   c ") == "a b c"
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINE_BUDGETS))
+def test_segments_fit_the_budget_and_keep_every_word(engine):
+    with open(CORPUS, encoding='utf-8') as f:
+        text = f.read()
+    segments = segment_text(text, engine)
+    assert all(len(s) <= ENGINE_BUDGETS[engine] for s in segments)
+    assert ' '.join(segments).split() == text.split()
+
+
+def test_packing_merges_short_sentences():
+    text = "Yes. No. Maybe. " * 5
+    assert segment_text(text, max_chars=40) != segment_text(text, max_chars=40, pack=False)
+    assert len(segment_text(text, max_chars=40)) < len(segment_text(text, max_chars=40, pack=False))
+
+
+def test_overlong_word_passes_through():
+    word = 'x' * 50
+    assert segment_text(f"a {word} b", max_chars=10) == ['a', word, 'b']
+
+
+def test_progressive_segments_start_short_and_grow():
+    text = ("This opening sentence has quite a few words in it before the first comma, "
+            "and then it keeps going for a while. ") * 6
+    segments = progressive_segments(text, 'kokoro', first_words=4, growth=2.0)
+    assert len(segments[0].split()) <= 4
+    assert all(len(s) <= ENGINE_BUDGETS['kokoro'] for s in segments)
+    assert ' '.join(segments).split() == text.split()
+    assert len(segments[1]) > len(segments[0])
+
+
+def test_segmentation_is_linear():
+    # A long run without sentence ends used to rescan the text at every period
+    text = "a. " * 20000
+    started = time.perf_counter()
+    split_sentences(text)
+    assert time.perf_counter() - started < 1.0
@@ -0,0 +1,154 @@
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip('torch')
+
+import sentence_cache  # noqa: E402
+import tts_engines  # noqa: E402
+from sentence_cache import SentenceAudioCache  # noqa: E402
+from tts_engines import MB, Engine, EngineRegistry, StubEngine, XTTSEngine  # noqa: E402
+
+
+class FakeEngine(Engine):
+    estimated_bytes = 100 * MB
+
+    def __init__(self, device):
+        super().__init__(device)
+        self.loaded = 0
+        self.unloaded = 0
+        self.gate = None
+
+    def load(self):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.loaded += 1
+
+    def unload(self):
+        self.unloaded += 1
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A registry of three fake 100 MB engines with room for two."""
+    for name in ('a', 'b', 'c'):
+        monkeypatch.setitem(tts_engines.ENGINE_CLASSES, name, type(f'Fake{name.upper()}', (FakeEngine,), {'name': name}))
+    # Use the engines' estimates rather than measured process memory
+    monkeypatch.setattr(tts_engines, 'memory_in_use', lambda device: None)
+    return EngineRegistry(['a', 'b', 'c'], 'cpu', budget_bytes=250 * MB)
+
+
+def loaded(registry):
+    return sorted(name for name, engine in registry.stats()["engines"].items() if engine["loaded"])
+
+
+def test_unknown_engines_are_rejected(registry):
+    with pytest.raises(ValueError):
+        EngineRegistry(['a', 'nope'], 'cpu')
+    with pytest.raises(ValueError):
+        registry.acquire('nope')
+
+
+def test_least_recently_used_engine_makes_room(registry):
+    for name in ('a', 'b', 'a', 'c'):
+        with registry.use(name):
+            pass
+    assert loaded(registry) == ['a', 'c']
+    assert registry.stats()["engines"]["b"]["evictions"] == 1
+
+
+def test_engines_in_use_are_never_unloaded(registry):
+    a = registry.acquire('a')
+    with registry.use('b'):
+        pass
+    with registry.use('c'):
+        pass
+    assert 'a' in loaded(registry) and a.unloaded == 0
+    registry.release('a')
+
+
+def test_idle_engines_are_unloaded(registry):
+    registry.idle_seconds = 1e-9
+    with registry.use('a'):
+        pass
+    assert loaded(registry) == []
+
+
+def test_resident_engine_does_not_wait_for_another_load(registry):
+    with registry.use('a'):
+        pass
+    gate = threading.Event()
+    registry._slots['b'].engine.gate = gate
+    loading = threading.Thread(target=registry.acquire, args=('b',))
+    loading.start()
+    acquired = threading.Event()
+
+    def use_a():
+        with registry.use('a'):
+            acquired.set()
+
+    threading.Thread(target=use_a).start()
+    try:
+        assert acquired.wait(2)
+    finally:
+        gate.set()
+        loading.join(5)
+
+
+def test_stub_engine_is_deterministic():
+    engine = StubEngine('cpu')
+    engine.load()
+    text = "Hello there. This is a test of the stub engine."
+    first = np.concatenate(list(engine.synthesize(text, engine.parse_options({}))))
+    second = np.concatenate(list(engine.synthesize(text, engine.parse_options({}))))
+    np.testing.assert_array_equal(first, second)
+    faster = np.concatenate(list(engine.synthesize(text, engine.parse_options({"speed": 2}))))
+    assert len(faster) == pytest.approx(len(first) / 2, rel=0.01)
+    with pytest.raises(ValueError):
+        engine.parse_options({"speed": 5})
+
+
+class FakeXTTSModel:
+    def __init__(self):
+        self.calls = 0
+
+    def inference(self, sentence, language, gpt_cond_latent, speaker_embedding, **settings):
+        self.calls += 1
+        return {"wav": np.full(100, 0.5, dtype=np.float32)}
+
+
+def test_sentence_survives_a_cache_disk_failure(tmp_path, monkeypatch):
+    engine = XTTSEngine('cpu')
+    engine.model = FakeXTTSModel()
+    engine.inference_settings = {}
+    engine.sentence_cache = SentenceAudioCache(str(tmp_path))
+
+    def full_disk(*args):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(sentence_cache.os, 'replace', full_disk)
+    tally = {"lookups": 0, "hits": 0}
+    audio = engine.synthesize_sentence("Hello.", ('voice', (None, None)), tally)
+    assert len(audio) == 100 + XTTSEngine.SENTENCE_PAUSE_SAMPLES
+    assert tally == {"lookups": 1, "hits": 0}
+
+
+def test_cached_sentence_skips_the_model(tmp_path):
+    engine = XTTSEngine('cpu')
+    engine.model = FakeXTTSModel()
+    engine.inference_settings = {}
+    engine.sentence_cache = SentenceAudioCache(str(tmp_path))
+    tally = {"lookups": 0, "hits": 0}
+    for _ in range(2):
+        engine.synthesize_sentence("Hello.", ('voice', (None, None)), tally)
+    assert engine.model.calls == 1
+    assert tally == {"lookups": 2, "hits": 1}
+
+
+def test_xtts_packs_sentences_unless_the_cache_is_on(tmp_path):
+    engine = XTTSEngine('cpu')
+    text = "One. Two. Three."
+    assert engine.split(text) == ["One. Two. Three."]
+    engine.sentence_cache = SentenceAudioCache(str(tmp_path))
+    assert engine.split(text) == ["One.", "Two.", "Three."]
@@ -0,0 +1,228 @@
+"""Sentence/clause segmentation and length-aware chunk packing.
+
+Splitting on `(?<=[.!?]) +` alone gives very uneven model calls: one-word
+sentences cost a full invocation and run-on paragraphs overflow the model's
+limit. `segment_text` splits on sentence boundaries (ignoring abbreviations,
+initials, decimals and mid-sentence ellipses), breaks over-long sentences at
+clause boundaries and then at word boundaries, and greedily packs the pieces
+toward an engine's character budget.
+"""
+import re
+from collections import deque
+
+# Approximate character budgets per engine. XTTS warns above 250 characters
+# for English. Kokoro's limit is 510 phonemes, about 1 per character, so
+# leave headroom for expansion of numbers and symbols. FishSpeech's default
+# chunk_length is 200 (it re-splits internally).
+ENGINE_BUDGETS = {
+    'xtts': 250,
+    'kokoro': 400,
+    'fishspeech': 200,
+    'parler': 200,
+}
+DEFAULT_BUDGET = 250
+
+ABBREVIATIONS = {
+    # Not 'no': "I said no. Then left." is far more common than "No. 5"
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'mt', 'ft', 'vs', 'etc', 'inc', 'ltd', 'co',
+    'corp', 'dept', 'est', 'approx', 'fig', 'vol', 'ch', 'sec', 'gen', 'col', 'capt', 'lt', 'sgt', 'rev',
+    'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec',
+    'e.g', 'i.e', 'a.m', 'p.m', 'u.s', 'u.k', 'u.s.a', 'ph.d',
+}
+
+# Candidate sentence end: terminal punctuation (optionally closing quotes or
+# brackets) followed by whitespace
+_SENTENCE_END_RE = re.compile(r'([.!?…]+)(["\'”’)\]]*)(\s+)')
+_CLAUSE_END_RE = re.compile(r'([,;:]|\s[–—-])(\s+)')
+_WORD_BEFORE_RE = re.compile(r'(\S+)$')
+# Characters before a candidate sentence end searched for the preceding word.
+# Only abbreviations and single letters matter, so a longer word may be cut off;
+# bounding the window keeps segmentation linear in the length of the text.
+_WORD_WINDOW = 32
+
+
+def normalize_whitespace(text):
+    return ' '.join(text.split())
+
+
+def _is_sentence_end(text, match):
+    """Decide whether the punctuation at `match` really ends a sentence."""
+    punct = match.group(1)
+    following = text[match.end():match.end() + 1]
+    # Periods and ellipses followed by lowercase continue the sentence
+    if set(punct) <= {'.', '…'} and following.islower():
+        return False
+    if punct == '.':
+        word = _WORD_BEFORE_RE.search(text[max(0, match.start() - _WORD_WINDOW):match.start()])
+        if word:
+            token = word.group(1).lstrip('("\'“').lower()
+            if token in ABBREVIATIONS:
+                return False
+            # Single-letter initials ("J. R. R. Tolkien")
+            if len(token) == 1 and token.isalpha():
+                return False
+    return True
+
+
+def split_sentences(text):
+    """Split `text` into sentences, keeping their punctuation."""
+    text = normalize_whitespace(text)
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END_RE.finditer(text):
+        if _is_sentence_end(text, match):
+            sentence = text[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def split_clauses(sentence):
+    """Split a sentence after commas, semicolons, colons and dashes."""
+    clauses = []
+    start = 0
+    for match in _CLAUSE_END_RE.finditer(sentence):
+        # Don't split inside numbers like "1,000"
+        if match.group(1) == ',' and sentence[match.start() - 1:match.start()].isdigit() \
+                and sentence[match.end():match.end() + 1].isdigit():
+            continue
+        clauses.append(sentence[start:match.end()].strip())
+        start = match.end()
+    tail = sentence[start:].strip()
+    if tail:
+        clauses.append(tail)
+    return [c for c in clauses if c]
+
+
+def _split_words(text, max_chars):
+    pieces, current = [], ''
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f'{current} {word}' if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _fit(sentence, max_chars):
+    """Break one sentence into pieces no longer than `max_chars` where possible."""
+    if len(sentence) <= max_chars:
+        return [sentence]
+    pieces = []
+    for clause in split_clauses(sentence):
+        if len(clause) <= max_chars:
+            pieces.append(clause)
+        else:
+            pieces.extend(_split_words(clause, max_chars))
+    return _pack(pieces, max_chars)
+
+
+def _pack(pieces, max_chars):
+    packed, current = [], ''
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            packed.append(current)
+            current = piece
+        else:
+            current = f'{current} {piece}' if current else piece
+    if current:
+        packed.append(current)
+    return packed
+
+
+def _pack_balanced(pieces, max_chars):
+    """Pack into as few segments as greedy packing, but of more even length.
+
+    Greedy packing fills every segment to the limit and leaves a short tail;
+    re-packing toward the mean length of that many segments evens them out.
+    """
+    greedy = _pack(pieces, max_chars)
+    if len(greedy) < 2:
+        return greedy
+    target = sum(len(p) + 1 for p in pieces) / len(greedy)
+    balanced, current = [], ''
+    for piece in pieces:
+        candidate = f'{current} {piece}' if current else piece
+        if current and (len(candidate) > max_chars or abs(len(candidate) - target) > abs(len(current) - target)):
+            balanced.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        balanced.append(current)
+    return balanced if len(balanced) <= len(greedy) else greedy
+
+
+def budget_for(engine=None, max_chars=None):
+    if max_chars:
+        return int(max_chars)
+    return ENGINE_BUDGETS.get(engine, DEFAULT_BUDGET)
+
+
+def segment_text(text, engine=None, max_chars=None, pack=True):
+    """Split `text` into segments of at most the engine's character budget.
+
+    Sentences longer than the budget are broken at clauses, then words.
+    With `pack`, consecutive pieces are merged into as few segments as fit,
+    balanced toward equal length, so short sentences share a model call. A
+    single word longer than the budget is
+    passed through unchanged.
+    """
+    limit = budget_for(engine, max_chars)
+    pieces = []
+    for sentence in split_sentences(text):
+        pieces.extend(_fit(sentence, limit))
+    return _pack_balanced(pieces, limit) if pack else pieces
+
+
+def progressive_segments(text, engine=None, max_chars=None, first_words=8, growth=2.0):
+    """Segments that start short and grow, for low time-to-first-audio.
+
+    The first segment is the first clause, cut to `first_words` words if it
+    is longer. Each later segment may be `growth` times longer than the one
+    before (and at least about `first_words` words), up to the engine
+    budget, so synthesis stays ahead of playback while quickly reaching
+    efficient segment sizes. Early segments may end mid-clause.
+    """
+    limit = budget_for(engine, max_chars)
+    first_words = max(1, int(first_words))
+    # Rough characters per word, used as a floor so tiny openers ("Sure.")
+    # don't make the following segments tiny too
+    floor = min(limit, first_words * 6)
+    words_queue = deque(clause for sentence in split_sentences(text) for clause in split_clauses(sentence))
+    if not words_queue:
+        return []
+
+    clause_words = words_queue.popleft().split()
+    segments = [' '.join(clause_words[:first_words])]
+    if clause_words[first_words:]:
+        words_queue.appendleft(' '.join(clause_words[first_words:]))
+
+    current = ''
+    while words_queue:
+        piece = words_queue.popleft()
+        budget = min(limit, max(len(segments[-1]) * growth, floor))
+        candidate = f'{current} {piece}' if current else piece
+        if len(candidate) <= budget:
+            current = candidate
+            continue
+        if current:
+            segments.append(current)
+            current = ''
+            words_queue.appendleft(piece)
+            continue
+        # A single piece over budget: take as many words as fit, requeue the rest
+        head, *tail = _split_words(piece, int(budget))
+        segments.append(head)
+        if tail:
+            words_queue.appendleft(' '.join(tail))
+    if current:
+        segments.append(current)
+    return segments
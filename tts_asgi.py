@@ -0,0 +1,236 @@
+"""Async (ASGI) serving mode for the unified TTS server.
+
+HTTP is handled on an asyncio event loop while synthesis runs on the
+dedicated threads of an `InferenceExecutor`. At most `TTS_MAX_QUEUE`
+requests wait for a worker; beyond that the server answers 429 with a
+`Retry-After` estimate instead of slowing every request down, and 503 while
+shutting down. Same endpoints and request fields as tts_server.py (JSON
+bodies only).
+
+Run with `python tts_asgi.py` (uses uvicorn) or any ASGI server:
+`uvicorn tts_asgi:app --port 5000`.
+"""
+import asyncio
+import json
+import os
+import time
+import traceback
+from contextlib import contextmanager
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from audio_encoders import (
+    StreamEncoder, encode_pcm, encode_stream, mimetype_for, negotiate_format, negotiate_stream_format,
+    output_sample_rate,
+)
+from audio_stream import PCMBuffer, PCMStream, iter_chunks
+from inference_queue import JOB_DONE, InferenceExecutor, JobError, QueueFull
+from resample import parse_sample_rate, resample_stream
+from tts_server import DEFAULT_ENGINE, device, logger, registry
+
+# Each engine gets its own worker threads. Kokoro micro-batches segments across
+# concurrent requests, so it needs as many jobs in flight as it can batch; other
+# engines default to one job at a time
+ENGINE_WORKERS = {name: int(os.getenv('TTS_INFERENCE_WORKERS', 1)) for name in registry.names}
+if 'kokoro' in ENGINE_WORKERS:
+    ENGINE_WORKERS['kokoro'] = int(os.getenv('KOKORO_MAX_BATCH_SIZE', 8))
+
+executor = InferenceExecutor(
+    limits=ENGINE_WORKERS,
+    max_queue=int(os.getenv('TTS_MAX_QUEUE', 16)),
+)
+
+
+class _Start:
+    """First item of every job: the response status line and headers."""
+
+    def __init__(self, mimetype, headers=None):
+        self.mimetype = mimetype
+        self.headers = headers or {}
+
+
+@contextmanager
+def _acquired(data):
+    """Pin the requested engine and provide (name, engine, options)."""
+    name = data.get('engine') or DEFAULT_ENGINE
+    engine = registry.acquire(name, logger)
+    try:
+        yield name, engine, engine.parse_options(data)
+    finally:
+        registry.release(name)
+
+
+def tts_job(data, accept_mimetypes):
+    def job():
+        output_format = negotiate_format(data.get('format'), accept_mimetypes) or 'wav'
+        requested_rate = output_sample_rate(output_format, parse_sample_rate(data.get('sample_rate'), 0), 0)
+        with _acquired(data) as (name, engine, options):
+            started = time.perf_counter()
+            audio_blocks = list(engine.synthesize(data['text'], options))
+            if not audio_blocks:
+                raise RuntimeError("No audio generated")
+            output_rate = output_sample_rate(output_format, requested_rate, engine.sample_rate)
+            pcm = PCMBuffer.from_blocks(resample_stream(audio_blocks, engine.sample_rate, output_rate))
+            parts, length, encode_seconds = encode_pcm(pcm, output_rate, output_format)
+            logger.info(
+                f"Generated {pcm.length / output_rate:.2f} s of audio with {name} in "
+                f"{time.perf_counter() - started:.2f} s ({output_format}, {length} bytes, encoded in {encode_seconds * 1000:.1f} ms)"
+            )
+            yield _Start(mimetype_for(output_format), {'Content-Length': str(length)})
+            yield from iter_chunks(parts)
+    return job
+
+
+def tts_stream_job(data, accept_mimetypes):
+    def job():
+        # A compressed format ('ogg') is encoded incrementally off this thread
+        output_format, stream_format = negotiate_stream_format(data.get('format'), accept_mimetypes, data.get('stream_format'))
+        requested_rate = output_sample_rate(output_format, parse_sample_rate(data.get('sample_rate'), 0), 0)
+        with _acquired(data) as (name, engine, options):
+            started = time.perf_counter()
+            output_rate = output_sample_rate(output_format, requested_rate, engine.sample_rate)
+            audio_blocks = resample_stream(engine.synthesize(data['text'], options), engine.sample_rate, output_rate)
+            if output_format:
+                encoder = StreamEncoder(output_format, output_rate)
+                yield _Start(mimetype_for(output_format))
+                yield from encode_stream(audio_blocks, encoder)
+            else:
+                pcm_stream = PCMStream(stream_format or 'wav', output_rate)
+                yield _Start(pcm_stream.mimetype, pcm_stream.headers)
+                yield pcm_stream.header()
+                for audio in audio_blocks:
+                    yield pcm_stream.frames(audio)
+            logger.info(f"Streamed audio with {name} in {(time.perf_counter() - started) * 1000.0:.0f} ms")
+    return job
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def _send_json(send, status, payload, headers=None):
+    body = json.dumps(payload).encode('utf-8')
+    raw_headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    raw_headers += [(k.lower().encode(), str(v).encode()) for k, v in (headers or {}).items()]
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _watch_disconnect(receive, job):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            job.cancelled.set()
+            return
+
+
+async def _run_job(send, receive, job):
+    """Relay a job's output as an HTTP response."""
+    watcher = asyncio.create_task(_watch_disconnect(receive, job))
+    started = False
+    try:
+        while True:
+            item = await job.events.get()
+            if item is JOB_DONE:
+                break
+            if isinstance(item, JobError):
+                e = item.exception
+                if started:
+                    # We can't return an error in a stream, so just log it
+                    logger.error(f"Error generating audio stream: {e}")
+                    break
+                status = 400 if isinstance(e, ValueError) else 500
+                if status == 500:
+                    logger.error(f"Error generating audio: {e}\n{''.join(traceback.format_exception(e))}")
+                else:
+                    logger.error(str(e))
+                await _send_json(send, status, {"error": str(e)})
+                return
+            if isinstance(item, _Start):
+                headers = [(b'content-type', item.mimetype.encode())]
+                headers += [(k.lower().encode(), str(v).encode()) for k, v in item.headers.items()]
+                await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+                started = True
+            elif item:
+                await send({'type': 'http.response.body', 'body': item, 'more_body': True})
+        if started:
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        job.cancelled.set()
+        watcher.cancel()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    method, path = scope['method'], scope['path']
+    if method == 'GET' and path == '/api/status':
+        stats = await asyncio.to_thread(registry.stats)
+        await _send_json(send, 200, {"status": "running", "device": device, "engines": stats, "executor": executor.stats()})
+        return
+    if method == 'GET' and path == '/api/engines':
+        await _send_json(send, 200, {"default": DEFAULT_ENGINE, "engines": registry.names})
+        return
+    if method != 'POST' or path not in ('/api/tts', '/api/tts/stream'):
+        await _send_json(send, 404, {"error": "Not found"})
+        return
+
+    body = await _read_body(receive)
+    if body is None:
+        return
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        await _send_json(send, 400, {"error": "Request body must be JSON"})
+        return
+    if not isinstance(data, dict) or not data.get('text'):
+        logger.error("No text provided in request")
+        await _send_json(send, 400, {"error": "Text is required"})
+        return
+
+    headers = dict(scope.get('headers') or [])
+    accept_mimetypes = parse_accept_header(headers.get(b'accept', b'').decode('latin-1'), MIMEAccept)
+    make_job = tts_stream_job if path == '/api/tts/stream' else tts_job
+    client = (scope.get('client') or ('-',))[0]
+    logger.info(f"Received {path} request from {client} (engine={data.get('engine') or DEFAULT_ENGINE})")
+    try:
+        job = executor.submit(make_job(data, accept_mimetypes), key=data.get('engine') or DEFAULT_ENGINE)
+    except QueueFull as e:
+        logger.warning(f"Rejected {path} request from {client}: {e}")
+        await _send_json(send, e.status, {"error": str(e)}, {'Retry-After': e.retry_after})
+        return
+    await _run_job(send, receive, job)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The async serving mode needs uvicorn: pip install uvicorn")
+
+    port = int(os.getenv('PORT', 5000))
+    logger.info(f"Starting async TTS service on port {port} (device={device}, engines={', '.join(registry.names)})")
+    uvicorn.run(app, host='0.0.0.0', port=port, log_level='warning')
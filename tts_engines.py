@@ -0,0 +1,693 @@
+"""Engine registry for the unified TTS server.
+
+Each engine wraps one model family (Kokoro, XTTS, FishSpeech, Parler) behind
+the same small interface: `parse_options(data)` validates a request body up
+front, and `synthesize(text, options)` yields float32 audio blocks at the
+engine's `sample_rate`. Engines are loaded on first use and kept resident
+while they fit in a memory budget; when loading another engine would exceed
+it, idle engines are unloaded least-recently-used first.
+
+The `stub` engine needs no weights: it returns deterministic tones, so
+benchmarks and CI can measure the serving path on their own.
+"""
+import gc
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from text_segmentation import segment_text
+
+MB = 1024 * 1024
+logger = logging.getLogger(__name__)
+
+
+def _peak_normalize(audio):
+    max_val = np.max(np.abs(audio)) if audio.size else 0
+    return audio / max_val if max_val > 0 else audio
+
+
+def memory_in_use(device):
+    """Bytes currently held on `device`: allocated VRAM for CUDA, process RSS otherwise.
+
+    Returns None when it cannot be measured (RSS is read from /proc).
+    """
+    if device == 'cuda':
+        return torch.cuda.memory_allocated()
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Engine:
+    """Base class; subclasses set `name`, `estimated_bytes` and implement load/synthesize."""
+
+    name = None
+    # Rough resident size used to make room before the first load
+    estimated_bytes = 0
+    sample_rate = 24000
+
+    def __init__(self, device):
+        self.device = device
+
+    def load(self):
+        raise NotImplementedError
+
+    def unload(self):
+        """Drop references to the model; the registry collects garbage afterwards."""
+
+    def parse_options(self, data):
+        """Validate engine-specific request fields and return an options dict."""
+        return {}
+
+    def synthesize(self, text, options):
+        raise NotImplementedError
+
+    def response_key(self, text, options, output_format, output_rate):
+        """Response cache key for a request, or None when the same request may sound different."""
+        return None
+
+    def stats(self):
+        return {}
+
+
+class KokoroEngine(Engine):
+    """Kokoro on one shared model: pooled G2P front-ends and voice packs, with
+    segments from concurrent requests micro-batched into one forward pass.
+
+    kokoro_tts.py serves this engine on its own; it loads the model with
+    `load_model()` before forking and starts the batching thread per worker.
+    """
+    name = 'kokoro'
+    estimated_bytes = 400 * MB
+    sample_rate = 24000
+    MIN_SPEED, MAX_SPEED = 0.5, 2.0
+
+    def __init__(self, device):
+        super().__init__(device)
+        self.default_voice = os.getenv('KOKORO_DEFAULT_VOICE', 'af_heart')
+        self.preload_voices = [
+            v.strip() for v in os.getenv('KOKORO_PRELOAD_VOICES', self.default_voice).split(';') if v.strip()
+        ]
+        # Segments from concurrent requests arriving within max_batch_wait_ms
+        # of each other share one forward pass
+        self.max_batch_size = int(os.getenv('KOKORO_MAX_BATCH_SIZE', 8))
+        self.max_batch_wait_ms = float(os.getenv('KOKORO_MAX_BATCH_WAIT_MS', 10))
+        self.model = self.pool = self.scheduler = None
+
+    def load(self):
+        self.load_model()
+        self.start_scheduler()
+
+    def load_model(self):
+        """Load the weights and the pipeline pool, without starting the batching thread."""
+        import kokoro
+        from kokoro_pool import REPO_ID, PipelinePool
+        from model_snapshots import kokoro_from_checkpoint, kokoro_from_snapshot, load_with_snapshot
+
+        self.model_version = f"{REPO_ID}@{getattr(kokoro, '__version__', 'unknown')}"
+        self.model, _ = load_with_snapshot(
+            os.getenv('KOKORO_SNAPSHOT', ''),
+            lambda path: kokoro_from_snapshot(REPO_ID, path, self.device),
+            lambda: kokoro_from_checkpoint(REPO_ID, self.device),
+            logger,
+        )
+        self.pool = PipelinePool(
+            self.model,
+            max_pipelines=int(os.getenv('KOKORO_MAX_PIPELINES', 3)),
+            voice_budget_bytes=int(float(os.getenv('KOKORO_VOICE_BUDGET_MB', 64)) * MB),
+        )
+        self.pool.preload(self.preload_voices)
+
+    def start_scheduler(self):
+        """Start the micro-batching thread; threads don't survive fork, so each worker calls this."""
+        from kokoro_batching import MicroBatchScheduler
+
+        self.scheduler = MicroBatchScheduler(
+            self.model, max_batch_size=self.max_batch_size, max_wait_ms=self.max_batch_wait_ms,
+        )
+
+    def unload(self):
+        if self.scheduler:
+            self.scheduler.close()
+        self.model = self.pool = self.scheduler = None
+
+    def parse_options(self, data):
+        from kokoro_pool import resolve_lang_code
+
+        voice = data.get('voice') or self.default_voice
+        lang_code = resolve_lang_code(data.get('lang_code'), voice)
+        try:
+            speed = float(data.get('speed', 1.0))
+        except (TypeError, ValueError):
+            raise ValueError("speed must be a number")
+        if not self.MIN_SPEED <= speed <= self.MAX_SPEED:
+            raise ValueError(f"speed must be between {self.MIN_SPEED} and {self.MAX_SPEED}")
+        # Load (or touch) the voice now so unknown voices fail before streaming starts
+        self.pool.voice(voice)
+        return {"voice": voice, "lang_code": lang_code, "speed": speed}
+
+    def synthesize_segments(self, text, options, segments=None, in_flight=None, tracker=None):
+        """Yield one audio tensor per pipeline segment of `text`, in order.
+
+        By default all segments are queued on the shared scheduler up front so
+        they can be batched with segments from other in-flight requests. With
+        `in_flight`, at most that many of this request's segments are queued at
+        once; the next is queued as soon as one finishes, so a short first
+        segment is not held back by being batched with the longer ones after it.
+        `segments` overrides the default packing of `text`. Segmentation and G2P
+        time and time waiting for the model are added to `tracker`, if given.
+        """
+        stage = tracker.stage if tracker else (lambda name: nullcontext())
+        frontend = self.pool.frontend(options["lang_code"])
+        pack = self.pool.voice(options["voice"])
+        owner = object()
+        if segments is None:
+            with stage('segmentation'):
+                segments = segment_text(text, self.name)
+        # One segment per line; KPipeline splits on newlines
+        phonemes = (ps for _, ps, _ in frontend('\n'.join(segments)) if ps)
+        pending = deque()
+
+        def submit_next():
+            with stage('segmentation'):
+                ps = next(phonemes, None)
+            if ps is not None:
+                pending.append(self.scheduler.submit(owner, ps, pack[len(ps) - 1], options["speed"]))
+
+        for _ in range(len(segments) if in_flight is None else in_flight):
+            submit_next()
+        while pending:
+            with stage('inference'):
+                audio = pending.popleft().result()
+            submit_next()
+            yield audio
+
+    def synthesize(self, text, options):
+        for audio in self.synthesize_segments(text, options):
+            yield audio.cpu().numpy()
+
+    def response_key(self, text, options, output_format, output_rate):
+        from response_cache import response_key
+
+        # Kokoro is deterministic: identical requests give identical audio
+        return response_key(
+            self.name, self.model_version, options["voice"], options["speed"], text, output_format, output_rate,
+            options["lang_code"],
+        )
+
+    def stats(self):
+        return {"batching": self.scheduler.stats(), "pool": self.pool.stats()}
+
+
+class XTTSEngine(Engine):
+    """XTTS v2 with cached speaker latents, an optional sentence audio cache and
+    loudness normalisation across each request.
+
+    xtts2.py serves this engine on its own, adding incremental streaming and a
+    synthesis producer thread on top of `synthesize_sentence`/`stream_sentence`.
+    """
+    name = 'xtts'
+    estimated_bytes = 2200 * MB
+    MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
+    # `tts.tts()` appends this much silence after every sentence
+    SENTENCE_PAUSE_SAMPLES = 10000
+
+    def __init__(self, device):
+        super().__init__(device)
+        # Sentences are packed into segments of up to this many characters (XTTS
+        # warns above 250 for English), so short sentences share a model call
+        self.segment_chars = int(os.getenv('XTTS_SEGMENT_CHARS', 250))
+        # Speech level every response is normalised to (see loudness.py)
+        self.target_dbfs = float(os.getenv('XTTS_TARGET_LEVEL_DBFS', -18))
+        # Raw sentence audio keyed by (sentence, voice, language), stored as 16-bit
+        # PCM so repeated sentences skip the model. Off (0) unless set: while it
+        # is on, sentences are not packed into longer segments (see split)
+        self.sentence_cache_mb = int(os.getenv('XTTS_SENTENCE_CACHE_MB', 0))
+        self.model = self.voice_cache = self.sentence_cache = None
+
+    def load(self):
+        from cache_utils import content_hash
+        from model_snapshots import (
+            load_with_snapshot, xtts_from_checkpoint, xtts_from_snapshot, xtts_model_dir,
+        )
+        from sentence_cache import SentenceAudioCache
+        from xtts_voices import VoiceLatentCache
+
+        self.model, _ = load_with_snapshot(
+            os.getenv('XTTS_SNAPSHOT', ''),
+            lambda path: xtts_from_snapshot(xtts_model_dir(), path, self.device),
+            lambda: xtts_from_checkpoint(self.device),
+            logger,
+        )
+        self.sample_rate = self.model.config.audio.output_sample_rate
+        config = self.model.config
+        # Same sampling settings `tts.tts()` would pick up from the model config
+        self.inference_settings = {
+            "temperature": config.temperature,
+            "length_penalty": config.length_penalty,
+            "repetition_penalty": config.repetition_penalty,
+            "top_k": config.top_k,
+            "top_p": config.top_p,
+        }
+        # Speaker latents keyed by reference-audio content hash, persisted under voices/.latents
+        self.voice_cache = VoiceLatentCache(
+            self.model,
+            os.path.join('voices', '.latents'),
+            max_entries=int(os.getenv('XTTS_VOICE_CACHE_SIZE', 32)),
+        )
+        self.sentence_cache = SentenceAudioCache(
+            os.getenv('XTTS_SENTENCE_CACHE_DIR', os.path.join('outputs', 'sentence_cache')),
+            namespace=content_hash("xtts_v2", repr(sorted(self.inference_settings.items()))),
+            max_bytes=self.sentence_cache_mb * MB,
+        ) if self.sentence_cache_mb > 0 else None
+
+    def unload(self):
+        self.model = self.voice_cache = self.sentence_cache = None
+
+    def resolve_voice(self, data):
+        """Return (voice_id, speaker latents) for a request's `voice_id` or `voice_file`.
+
+        Raises ValueError if the voice id is unknown or the file does not exist.
+        """
+        voice_id = data.get('voice_id')
+        if voice_id:
+            latents = self.voice_cache.get(voice_id)
+            if latents is None:
+                raise ValueError(f"Unknown voice_id: {voice_id}")
+            return voice_id, latents
+        voice_file = data.get('voice_file', 'voices/default.wav')
+        if not os.path.isfile(voice_file):
+            raise ValueError(f"Voice file not found: {voice_file}")
+        voice_id = self.voice_cache.register_file(voice_file)
+        return voice_id, self.voice_cache.get(voice_id)
+
+    def parse_options(self, data):
+        return {"voice": self.resolve_voice(data), "language": data.get('language', 'en')}
+
+    def split(self, text):
+        # With the sentence cache on, segments stay one sentence each (long ones
+        # are still split at clauses): packed segments depend on their
+        # neighbours, so they would rarely repeat across documents
+        return segment_text(text, self.name, max_chars=self.segment_chars, pack=self.sentence_cache is None)
+
+    def _cached_sentence(self, sentence, voice_id, language, tally):
+        """Return (key, audio) for a sentence from the sentence cache; audio is None on a miss.
+
+        `tally` counts this request's lookups and hits; key is None when the cache is off.
+        """
+        if self.sentence_cache is None:
+            return None, None
+        key = self.sentence_cache.key(sentence, voice_id, language)
+        try:
+            audio = self.sentence_cache.get(key)
+        except OSError as e:
+            logger.warning(f"Could not read cached sentence audio: {e}")
+            audio = None
+        tally["lookups"] += 1
+        tally["hits"] += audio is not None
+        return key, audio
+
+    def _store_sentence(self, key, audio):
+        # A full or unwritable cache disk must not cost the request this sentence
+        try:
+            self.sentence_cache.put(key, audio)
+        except OSError as e:
+            logger.warning(f"Could not cache sentence audio: {e}")
+
+    def synthesize_sentence(self, sentence, voice, tally, language='en'):
+        """Return one sentence's audio followed by the sentence pause.
+
+        `voice` is (voice_id, latents) from resolve_voice.
+        """
+        voice_id, (gpt_cond_latent, speaker_embedding) = voice
+        key, wav = self._cached_sentence(sentence, voice_id, language, tally)
+        if wav is None:
+            out = self.model.inference(sentence, language, gpt_cond_latent, speaker_embedding, **self.inference_settings)
+            wav = np.asarray(out["wav"], dtype=np.float32).squeeze()
+            if key:
+                self._store_sentence(key, wav)
+        return np.concatenate([wav, np.zeros(self.SENTENCE_PAUSE_SAMPLES, dtype=wav.dtype)])
+
+    def stream_sentence(self, sentence, voice, tally, stream_chunk_size, overlap, language='en'):
+        """Yield audio for one sentence in chunks as the GPT decodes it.
+
+        Each chunk is vocoded from `stream_chunk_size` new GPT tokens; XTTS
+        cross-fades `overlap` samples between chunks. The sentence pause follows
+        the last chunk. A cached sentence is yielded whole, and a new one is
+        stored once all of its chunks have been decoded.
+        """
+        voice_id, (gpt_cond_latent, speaker_embedding) = voice
+        key, wav = self._cached_sentence(sentence, voice_id, language, tally)
+        if wav is not None:
+            yield wav
+        else:
+            chunks = self.model.inference_stream(
+                sentence, language, gpt_cond_latent, speaker_embedding,
+                stream_chunk_size=stream_chunk_size, overlap_wav_len=overlap, **self.inference_settings
+            )
+            decoded = []
+            for chunk in chunks:
+                chunk = chunk.cpu().numpy().squeeze()
+                if key:
+                    decoded.append(chunk)
+                yield chunk
+            if key and decoded:
+                self._store_sentence(key, np.concatenate(decoded))
+        yield np.zeros(self.SENTENCE_PAUSE_SAMPLES, dtype=np.float32)
+
+    def normalized(self, audio_blocks):
+        """Loudness-normalise one request's audio in a single pass, block by block."""
+        from loudness import LoudnessNormalizer, normalize_stream
+
+        return normalize_stream(audio_blocks, LoudnessNormalizer(self.sample_rate, target_dbfs=self.target_dbfs))
+
+    def synthesize(self, text, options):
+        tally = Counter()
+        sentences = (
+            self.synthesize_sentence(sentence, options["voice"], tally, options["language"])
+            for sentence in self.split(text) if sentence.strip()
+        )
+        yield from self.normalized(sentences)
+
+    def stats(self):
+        return {
+            "voice_cache": self.voice_cache.stats(),
+            "sentence_cache": self.sentence_cache.stats() if self.sentence_cache is not None else None,
+        }
+
+
+class FishSpeechEngine(Engine):
+    """FishSpeech driven through its inference engine directly (as
+    `FishSpeech.__call__` does), so reference prompts come from the prompt
+    cache instead of being re-encoded. fishspeech.py serves this engine on its own.
+    """
+    name = 'fishspeech'
+    estimated_bytes = 2000 * MB
+
+    def load(self):
+        # fish_speech_lib locates its configs relative to a .project-root marker
+        Path('.project-root').touch(exist_ok=True)
+        from fish_speech_lib.inference import FishSpeech
+        from fish_prompts import ReferencePromptCache
+
+        self.fish = FishSpeech(device=self.device)
+        self.engine = self.fish.engine
+        self.sample_rate = self.engine.decoder_model.spec_transform.sample_rate
+        # Encoded reference prompts, keyed by hash of reference audio bytes + ref_text.
+        # Set FISH_PROMPT_CACHE_DIR to also persist them across restarts.
+        self.prompt_cache = ReferencePromptCache(
+            self.engine,
+            max_entries=int(os.getenv('FISH_PROMPT_CACHE_SIZE', 16)),
+            cache_dir=os.getenv('FISH_PROMPT_CACHE_DIR') or None,
+        )
+
+    def unload(self):
+        self.fish = self.engine = self.prompt_cache = None
+
+    def parse_options(self, data):
+        ref_audio_path = data.get('ref_audio_path') or os.path.join('voices', 'default.wav')
+        if not os.path.isfile(ref_audio_path):
+            raise ValueError(f"Reference audio not found: {ref_audio_path}")
+        with open(ref_audio_path, 'rb') as f:
+            ref_audio_bytes = f.read()
+        return {
+            "ref_audio_bytes": ref_audio_bytes,
+            "ref_text": data.get('ref_text') or "",
+            "max_new_tokens": int(data.get('max_new_tokens', 1000)),
+            "chunk_length": int(data.get('chunk_length', 1000)),
+        }
+
+    def synthesize(self, text, options):
+        from fish_speech_lib.fish_speech.utils.schema import ServeTTSRequest
+
+        prompt_tokens, prompt_texts = self.prompt_cache.get(options["ref_audio_bytes"], options["ref_text"])
+        req = ServeTTSRequest(
+            text=text,
+            references=[],
+            max_new_tokens=options["max_new_tokens"],
+            chunk_length=options["chunk_length"],
+            top_p=0.7,
+            repetition_penalty=1.2,
+            temperature=0.7,
+            seed=None,
+            streaming=False,
+            normalize=True,
+        )
+        response_queue = self.engine.send_Llama_request(req, prompt_tokens, prompt_texts)
+        while True:
+            wrapped_result = response_queue.get()
+            if wrapped_result.status == "error":
+                error = wrapped_result.response
+                raise error if isinstance(error, Exception) else RuntimeError("Unknown FishSpeech error")
+            result = wrapped_result.response
+            if result.action == "next":
+                break
+            with torch.inference_mode():
+                segment = self.engine.get_audio_segment(result)
+            yield np.asarray(segment, dtype=np.float32)
+
+    def stats(self):
+        return {"prompt_cache": self.prompt_cache.stats()}
+
+
+class ParlerEngine(Engine):
+    name = 'parler'
+    estimated_bytes = 3500 * MB
+    MODEL_NAME = "parler-tts/parler-tts-mini-jenny-30H"
+    DEFAULT_DESCRIPTION = (
+        "Jenny delivers a slightly expressive and animated speech with a moderate speed and pitch. "
+        "The recording is of very high quality, with the speaker's voice sounding clear and very close up."
+    )
+
+    def load(self):
+        from parler_tts import ParlerTTSForConditionalGeneration
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.MODEL_NAME)
+        self.model = ParlerTTSForConditionalGeneration.from_pretrained(self.MODEL_NAME).to(self.device)
+        self.sample_rate = self.model.config.sampling_rate
+
+    def unload(self):
+        self.tokenizer = self.model = None
+
+    def parse_options(self, data):
+        return {"description": data.get('description') or self.DEFAULT_DESCRIPTION}
+
+    def synthesize(self, text, options):
+        input_ids = self.tokenizer(options["description"], return_tensors="pt").input_ids.to(self.device)
+        for sentence in segment_text(text, self.name):
+            prompt_input_ids = self.tokenizer(sentence, return_tensors="pt").input_ids.to(self.device)
+            with torch.inference_mode():
+                generation = self.model.generate(input_ids=input_ids, prompt_input_ids=prompt_input_ids)
+            yield _peak_normalize(generation.cpu().numpy().squeeze().astype(np.float32))
+
+
+class StubEngine(Engine):
+    """Deterministic stand-in for a model, for load tests without weights or a GPU.
+
+    Each segment becomes a tone whose pitch is derived from a hash of its
+    text and whose length is proportional to its character count, so the
+    same request always produces the same audio. `TTS_STUB_RTF` makes each
+    segment take that fraction of its duration to "synthesise" (0 returns
+    immediately, isolating serving overhead).
+    """
+    name = 'stub'
+    estimated_bytes = 0
+    sample_rate = 24000
+    SECONDS_PER_CHAR = 0.065
+
+    def load(self):
+        self.rtf = float(os.getenv('TTS_STUB_RTF', 0))
+
+    def parse_options(self, data):
+        try:
+            speed = float(data.get('speed', 1.0))
+        except (TypeError, ValueError):
+            raise ValueError("speed must be a number")
+        if not 0.5 <= speed <= 2.0:
+            raise ValueError("speed must be between 0.5 and 2.0")
+        return {"speed": speed}
+
+    def synthesize(self, text, options):
+        for segment in segment_text(text, 'kokoro'):
+            seconds = len(segment) * self.SECONDS_PER_CHAR / options["speed"]
+            digest = hashlib.sha256(segment.encode('utf-8')).digest()
+            frequency = 110.0 + int.from_bytes(digest[:2], 'little') % 330
+            t = np.arange(int(seconds * self.sample_rate), dtype=np.float32) / self.sample_rate
+            if self.rtf > 0:
+                time.sleep(seconds * self.rtf)
+            yield (0.25 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+ENGINE_CLASSES = {cls.name: cls for cls in (KokoroEngine, XTTSEngine, FishSpeechEngine, ParlerEngine, StubEngine)}
+# Engines enabled when TTS_ENGINES is not set; the stub is only served on request
+DEFAULT_ENGINES = ('kokoro', 'xtts', 'fishspeech', 'parler')
+
+
+class _Slot:
+    def __init__(self, engine):
+        self.engine = engine
+        self.loaded = False
+        self.resident_bytes = None  # measured at load time
+        self.in_use = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = None
+
+
+class EngineRegistry:
+    """Load engines on demand and keep them resident within `budget_bytes`.
+
+    `idle_seconds` (if > 0) additionally unloads engines that have not been
+    used for that long. Engines with requests in flight are never unloaded.
+    """
+
+    def __init__(self, names, device, budget_bytes=None, idle_seconds=0):
+        unknown = [name for name in names if name not in ENGINE_CLASSES]
+        if unknown:
+            raise ValueError(f"Unknown engine(s): {', '.join(unknown)} (expected {', '.join(ENGINE_CLASSES)})")
+        self.device = device
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self._slots = {name: _Slot(ENGINE_CLASSES[name](device)) for name in names}
+        self._lock = threading.Lock()
+        # Loads are serialised so memory deltas are attributable to one engine
+        self._load_lock = threading.Lock()
+
+    @property
+    def names(self):
+        return list(self._slots)
+
+    def _resident_bytes(self):
+        return sum(slot.resident_bytes or slot.engine.estimated_bytes for slot in self._slots.values() if slot.loaded)
+
+    def _unload(self, name):
+        slot = self._slots[name]
+        slot.engine.unload()
+        slot.loaded = False
+        slot.resident_bytes = None
+        slot.evictions += 1
+        gc.collect()
+        if self.device == 'cuda':
+            torch.cuda.empty_cache()
+
+    def _evict_idle(self):
+        """Unload engines idle past `idle_seconds`; returns evicted names. Caller holds _lock."""
+        evicted = []
+        if not self.idle_seconds:
+            return evicted
+        now = time.monotonic()
+        for name, slot in self._slots.items():
+            if slot.loaded and not slot.in_use and now - slot.last_used > self.idle_seconds:
+                self._unload(name)
+                evicted.append(name)
+        return evicted
+
+    def _make_room(self, needed_bytes):
+        """Unload idle engines LRU-first until `needed_bytes` fits. Caller holds _lock."""
+        evicted = []
+        if self.budget_bytes is None:
+            return evicted
+        candidates = sorted(
+            (slot.last_used, name) for name, slot in self._slots.items() if slot.loaded and not slot.in_use
+        )
+        for _, name in candidates:
+            if self._resident_bytes() + needed_bytes <= self.budget_bytes:
+                break
+            self._unload(name)
+            evicted.append(name)
+        return evicted
+
+    def _ensure_loaded(self, name, logger=None):
+        slot = self._slots[name]
+        # Requests for an already-resident engine must not queue behind another engine's load
+        with self._lock:
+            if slot.loaded:
+                return
+        with self._load_lock:
+            with self._lock:
+                if slot.loaded:
+                    return
+                evicted = self._evict_idle()
+                evicted += self._make_room(slot.engine.estimated_bytes)
+            if logger and evicted:
+                logger.info(f"Unloaded engine(s) {', '.join(evicted)} to make room for {name}")
+            before = memory_in_use(self.device)
+            started = time.perf_counter()
+            slot.engine.load()
+            load_seconds = time.perf_counter() - started
+            after = memory_in_use(self.device)
+            with self._lock:
+                slot.loaded = True
+                slot.loads += 1
+                slot.load_seconds = round(load_seconds, 2)
+                if before is not None and after is not None and after > before:
+                    slot.resident_bytes = after - before
+                if self.budget_bytes is not None and self._resident_bytes() > self.budget_bytes and logger:
+                    logger.warning(f"Resident engines exceed the memory budget after loading {name}")
+            if logger:
+                logger.info(f"Loaded engine {name} in {load_seconds:.1f} s")
+
+    def acquire(self, name, logger=None):
+        """Return engine `name`, loading it if needed, and pin it until `release(name)`."""
+        if name not in self._slots:
+            raise ValueError(f"Unknown engine '{name}' (expected one of {', '.join(self._slots)})")
+        slot = self._slots[name]
+        # Pin before loading so a concurrent load cannot evict it right after
+        with self._lock:
+            slot.in_use += 1
+        try:
+            self._ensure_loaded(name, logger)
+        except Exception:
+            self.release(name)
+            raise
+        with self._lock:
+            slot.last_used = time.monotonic()
+        return slot.engine
+
+    def release(self, name):
+        slot = self._slots[name]
+        with self._lock:
+            slot.in_use -= 1
+            slot.last_used = time.monotonic()
+
+    @contextmanager
+    def use(self, name, logger=None):
+        engine = self.acquire(name, logger)
+        try:
+            yield engine
+        finally:
+            self.release(name)
+
+    def stats(self):
+        with self._lock:
+            self._evict_idle()
+            engines = {}
+            for name, slot in self._slots.items():
+                engines[name] = {
+                    "loaded": slot.loaded,
+                    "in_use": slot.in_use,
+                    "resident_mb": round((slot.resident_bytes or slot.engine.estimated_bytes) / MB, 1) if slot.loaded else 0,
+                    "loads": slot.loads,
+                    "evictions": slot.evictions,
+                    "last_load_seconds": slot.load_seconds,
+                }
+                if slot.loaded:
+                    engines[name].update(slot.engine.stats())
+            return {
+                "budget_mb": round(self.budget_bytes / MB, 1) if self.budget_bytes is not None else None,
+                "resident_mb": round(self._resident_bytes() / MB, 1),
+                "idle_seconds": self.idle_seconds,
+                "engines": engines,
+            }
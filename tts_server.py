@@ -0,0 +1,293 @@
+"""Unified TTS server: one process serving every engine in tts_engines.
+
+Requests pick an engine with the `engine` field (default `TTS_DEFAULT_ENGINE`,
+else kokoro). Engines load on first use and stay resident within
+`TTS_MEMORY_BUDGET_MB` of RAM (CPU) or VRAM (CUDA); idle ones are unloaded
+least-recently-used to make room, or after `TTS_ENGINE_IDLE_SECONDS`.
+Whole responses from deterministic engines (Kokoro) are cached as in
+kokoro_tts.py, and Prometheus metrics are labelled by the engine used.
+"""
+import logging
+import os
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+
+import torch
+from dotenv import load_dotenv
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+
+from audio_encoders import (
+    StreamEncoder, encode_pcm, encode_stream, mimetype_for, negotiate_format, negotiate_stream_format,
+    output_sample_rate,
+)
+from audio_stream import PCMBuffer, PCMStream, iter_chunks
+from metrics import ServiceMetrics
+from resample import parse_sample_rate, resample_stream
+from response_cache import ResponseCache
+from tts_engines import DEFAULT_ENGINES, MB, EngineRegistry
+
+load_dotenv()
+
+# Set up logging
+log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service.log')
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Create formatter
+formatter = logging.Formatter('%(asctime)s %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+try:
+    # Create rotating file handler
+    file_handler = RotatingFileHandler(log_file, maxBytes=10485760, backupCount=5)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+except PermissionError:
+    # Fallback to a unique log file if the main one is locked
+    import tempfile
+    temp_dir = tempfile.gettempdir()
+    fallback_log = os.path.join(temp_dir, f'tts_service_{os.getpid()}.log')
+    file_handler = RotatingFileHandler(fallback_log, maxBytes=10485760, backupCount=5)
+    file_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+    logger.warning(f"Could not write to {log_file}, using fallback log file: {fallback_log}")
+
+# Remove any existing handlers from the root logger
+logging.getLogger().handlers = []
+
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+ENABLED_ENGINES = [name.strip() for name in os.getenv('TTS_ENGINES', ','.join(DEFAULT_ENGINES)).split(',') if name.strip()]
+DEFAULT_ENGINE = os.getenv('TTS_DEFAULT_ENGINE', ENABLED_ENGINES[0] if ENABLED_ENGINES else 'kokoro')
+MEMORY_BUDGET_MB = float(os.getenv('TTS_MEMORY_BUDGET_MB', 0))
+
+registry = EngineRegistry(
+    ENABLED_ENGINES,
+    device,
+    budget_bytes=int(MEMORY_BUDGET_MB * MB) if MEMORY_BUDGET_MB > 0 else None,
+    idle_seconds=float(os.getenv('TTS_ENGINE_IDLE_SECONDS', 0)),
+)
+
+# Encoded /api/tts responses of deterministic engines (see response_cache.py).
+# TTS_RESPONSE_CACHE_MB=0 disables the cache; an empty TTS_RESPONSE_CACHE_DIR
+# keeps it in memory only.
+RESPONSE_CACHE_MB = float(os.getenv('TTS_RESPONSE_CACHE_MB', 64))
+response_cache = ResponseCache(
+    max_memory_bytes=int(RESPONSE_CACHE_MB * MB),
+    cache_dir=os.getenv('TTS_RESPONSE_CACHE_DIR', os.path.join('outputs', 'response_cache')) or None,
+    max_disk_bytes=int(float(os.getenv('TTS_RESPONSE_CACHE_DISK_MB', 1024)) * MB),
+    logger=logger,
+) if RESPONSE_CACHE_MB > 0 else None
+
+app = Flask(__name__)
+CORS(app)  # Enable CORS for all routes
+
+# Prometheus metrics, served at /api/metrics (see metrics.py); request series
+# are labelled with the engine that served them
+metrics = ServiceMetrics('unified')
+metrics.install(app)
+
+
+@app.after_request
+def after_request(response):
+    logger.info(f'{request.remote_addr} - "{request.method} {request.path}" {response.status_code}')
+    return response
+
+
+def _request_data():
+    if request.is_json:
+        return request.get_json() or {}
+    return request.form.to_dict()
+
+
+def _track(endpoint, name):
+    # Unknown engine names are rejected, so they share one label
+    return metrics.track(endpoint, engine=name if name in registry.names else 'unknown')
+
+
+def _acquire_engine(name, data):
+    """Return (engine, options) for a request, raising ValueError if invalid.
+
+    The engine is pinned in the registry; the caller must release it.
+    """
+    engine = registry.acquire(name, logger)
+    try:
+        options = engine.parse_options(data)
+    except Exception:
+        registry.release(name)
+        raise
+    return engine, options
+
+
+@app.route('/api/tts', methods=['POST'])
+def text_to_speech():
+    data = _request_data()
+    text = data.get('text')
+    name = data.get('engine') or DEFAULT_ENGINE
+    tracker = _track('tts', name)
+    logger.info(f"Received TTS request from {request.remote_addr} (engine={name})")
+
+    if not text:
+        logger.error("No text provided in request")
+        return jsonify({"error": "Text is required"}), 400
+
+    try:
+        with tracker.stage('preprocess'):
+            output_format = negotiate_format(data.get('format'), request.accept_mimetypes) or 'wav'
+            # 0 keeps the engine's native rate
+            requested_rate = output_sample_rate(output_format, parse_sample_rate(data.get('sample_rate'), 0), 0)
+            engine, options = _acquire_engine(name, data)
+    except ValueError as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error loading engine: {e}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 503
+
+    try:
+        output_rate = output_sample_rate(output_format, requested_rate, engine.sample_rate)
+        # Identical requests give identical audio, so the cache key is also the ETag
+        key = engine.response_key(text, options, output_format, output_rate) if response_cache else None
+        headers = {}
+        if key:
+            headers['ETag'] = f'"{key}"'
+            if request.if_none_match.contains(key):
+                logger.info("Client copy is current (304)")
+                return Response(status=304, headers={**headers, 'X-Cache': 'HIT'})
+            body, tier = response_cache.get(key, output_format)
+            if body is not None:
+                tracker.first_audio()
+                logger.info(f"Served cached audio from {tier} ({name}, {output_format}, {len(body)} bytes)")
+                return Response(body, mimetype=mimetype_for(output_format), headers={**headers, 'X-Cache': 'HIT', 'X-Cache-Tier': tier})
+
+        started = time.perf_counter()
+        audio_blocks = list(tracker.timed(engine.synthesize(text, options), 'inference'))
+        if not audio_blocks:
+            logger.error("No audio generated")
+            return jsonify({"error": "No audio generated"}), 500
+        with tracker.stage('encoding'):
+            pcm = PCMBuffer.from_blocks(resample_stream(audio_blocks, engine.sample_rate, output_rate))
+            parts, length, encode_seconds = encode_pcm(pcm, output_rate, output_format)
+        tracker.add_audio(pcm.length / output_rate)
+        tracker.first_audio()
+        logger.info(
+            f"Generated {pcm.length / output_rate:.2f} s of audio with {name} in "
+            f"{time.perf_counter() - started:.2f} s ({output_format}, {length} bytes, encoded in {encode_seconds * 1000:.1f} ms)"
+        )
+        if key:
+            headers['X-Cache'] = 'MISS'
+            if length <= response_cache.max_entry_bytes:
+                body = b''.join(parts)
+                response_cache.put(key, output_format, body)
+                return Response(body, mimetype=mimetype_for(output_format), headers=headers)
+        headers['Content-Length'] = str(length)
+        return Response(iter_chunks(parts), mimetype=mimetype_for(output_format), headers=headers)
+    except Exception as e:
+        logger.error(f"Error generating audio: {e}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
+    finally:
+        registry.release(name)
+
+
+@app.route('/api/tts/stream', methods=['POST'])
+def text_to_speech_stream():
+    data = _request_data()
+    text = data.get('text')
+    name = data.get('engine') or DEFAULT_ENGINE
+    tracker = _track('tts_stream', name)
+    logger.info(f"Received streaming TTS request from {request.remote_addr} (engine={name})")
+
+    if not text:
+        logger.error("No text provided in request")
+        return jsonify({"error": "Text is required"}), 400
+
+    try:
+        with tracker.stage('preprocess'):
+            # A compressed format ('ogg') is encoded incrementally off the inference thread
+            output_format, stream_format = negotiate_stream_format(
+                data.get('format'), request.accept_mimetypes, data.get('stream_format'),
+            )
+            requested_rate = output_sample_rate(output_format, parse_sample_rate(data.get('sample_rate'), 0), 0)
+            engine, options = _acquire_engine(name, data)
+    except ValueError as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error loading engine: {e}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 503
+
+    output_rate = output_sample_rate(output_format, requested_rate, engine.sample_rate)
+    pcm_stream = None
+    if not output_format:
+        try:
+            pcm_stream = PCMStream(stream_format or 'wav', output_rate)
+        except ValueError as e:
+            registry.release(name)
+            logger.error(str(e))
+            return jsonify({"error": str(e)}), 400
+
+    def timed_audio():
+        source = resample_stream(tracker.timed(engine.synthesize(text, options), 'inference'), engine.sample_rate, output_rate)
+        for audio in tracker.timed(source, 'encoding'):
+            tracker.add_audio(len(audio) / output_rate)
+            yield audio
+
+    def generate():
+        started = time.perf_counter()
+        ttfb_ms = None
+        encoder = None
+        try:
+            if output_format:
+                encoder = StreamEncoder(output_format, output_rate)
+                chunks = encode_stream(timed_audio(), encoder)
+            else:
+                yield pcm_stream.header()
+                chunks = tracker.timed((pcm_stream.frames(audio) for audio in timed_audio()), 'encoding')
+            for chunk in chunks:
+                tracker.first_audio()
+                if ttfb_ms is None:
+                    ttfb_ms = (time.perf_counter() - started) * 1000.0
+                yield chunk
+            logger.info(f"Streamed audio with {name}: ttfb={ttfb_ms or 0:.0f} ms, total={(time.perf_counter() - started) * 1000.0:.0f} ms")
+        except Exception as e:
+            logger.error(f"Error generating audio stream: {e}\n{traceback.format_exc()}")
+            # We can't return an error in a stream, so just log it
+        finally:
+            if encoder:
+                # The encoder runs on its own thread; its time is added once
+                tracker.add('encoding', encoder.encode_seconds)
+
+    if output_format:
+        response = Response(generate(), mimetype=mimetype_for(output_format))
+    else:
+        response = Response(generate(), mimetype=pcm_stream.mimetype, headers=pcm_stream.headers)
+    # Keep the engine pinned until the stream is done (or the client goes away)
+    response.call_on_close(lambda: registry.release(name))
+    return response
+
+
+@app.route('/api/engines', methods=['GET'])
+def list_engines():
+    return jsonify({"default": DEFAULT_ENGINE, "engines": registry.names}), 200
+
+
+@app.route('/api/status', methods=['GET'])
+def status():
+    logger.info(f"Status check from {request.remote_addr}")
+    return jsonify({
+        "status": "running", "device": device, "engines": registry.stats(),
+        "response_cache": response_cache.stats() if response_cache else None,
+    }), 200
+
+
+if __name__ == '__main__':
+    os.makedirs('outputs', exist_ok=True)
+
+    # Get port from environment variable, default to 5000 if not set
+    port = int(os.getenv('PORT', 5000))
+
+    logger.info(f"Starting unified TTS service on port {port} (device={device}, engines={', '.join(registry.names)})")
+
+    # Run the Flask app
+    app.run(host='0.0.0.0', port=port)
@@ -1,25 +1,39 @@
 import torch
-from TTS.api import TTS
 from TTS.utils.manage import ModelManager
 from dotenv import load_dotenv
 import logging
 from logging.handlers import RotatingFileHandler
 from flask import Response
-import io
 
 # Pre-download the model and accept the license
 ModelManager().download_model("tts_models/multilingual/multi-dataset/xtts_v2")
-import numpy as np
-import re
-import wave
 import os
-from flask import Flask, request, jsonify, send_file
+import threading
+import time
+from collections import Counter
+from flask import Flask, request, jsonify
 from flask_cors import CORS
+from cache_utils import content_hash
+from resample import parse_sample_rate, resample_stream
+from audio_stream import PCMBuffer, PCMStream, iter_chunks, wav_bytes
+from metrics import ServiceMetrics
+from prefork import serve_prefork
+from prefetch import prefetch
+from tts_engines import XTTSEngine
+from text_segmentation import normalize_whitespace
+from audio_encoders import (
+    StreamEncoder, encode_pcm, encode_stream, mimetype_for, negotiate_format, negotiate_stream_format,
+    output_sample_rate,
+)
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Prometheus metrics, served at /api/metrics (see metrics.py)
+metrics = ServiceMetrics('xtts')
+metrics.install(app)
+
 # Set up logging
 log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'service.log')
 logger = logging.getLogger(__name__)
@@ -59,78 +73,132 @@ if torch.cuda.is_available():
     print(f"CUDA device count: {torch.cuda.device_count()}")
     print(f"CUDA device name: {torch.cuda.get_device_name(0)}")
 
-# Init TTS with explicit device handling
-tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2")
-if torch.cuda.is_available():
-    tts = tts.to("cuda")
-else:
+if not torch.cuda.is_available():
     print("WARNING: CUDA not available, using CPU")
-    tts = tts.to("cpu")
 
-# Set up audio stream
-sample_rate = tts.synthesizer.output_sample_rate
+# The same engine the unified server uses (see tts_engines.py): the XTTS model
+# called directly with cached speaker latents, an optional sentence audio cache
+# and loudness normalisation, configured by the XTTS_* variables in tts-api.md.
+# Set XTTS_SNAPSHOT to a weight snapshot (see model_snapshots.py) to memory-map
+# it instead of loading the checkpoint; unset, the checkpoint is always used.
+engine = XTTSEngine(device)
+engine.load()
+sample_rate = engine.sample_rate
+voice_cache = engine.voice_cache
+sentence_cache = engine.sentence_cache
+
+# Incremental streaming: GPT tokens per decoded audio chunk, and the number
+# of samples cross-faded between consecutive chunks to hide the seams
+STREAM_CHUNK_SIZE = int(os.getenv('XTTS_STREAM_CHUNK_SIZE', 20))
+STREAM_OVERLAP_SAMPLES = int(os.getenv('XTTS_STREAM_OVERLAP', 1024))
+INCREMENTAL_STREAMING = os.getenv('XTTS_INCREMENTAL_STREAMING', '0') == '1'
+
+# Sentences (or stream chunks) synthesised ahead of the one being encoded and
+# sent; 0 runs synthesis inline with encoding as before
+LOOKAHEAD = int(os.getenv('XTTS_LOOKAHEAD', 2))
+
+# Per-request streaming latency, reported by /api/status
+_stream_stats = {"streams": 0, "incremental": 0, "total_ttfb_ms": 0.0, "total_rtf": 0.0, "last": None}
+_stream_stats_lock = threading.Lock()
+
+# Sentence cache hit ratio of the most recent request, reported by /api/status
+_sentence_cache_last = {"hits": 0, "lookups": 0}
 
 def preprocess_text(text):
     """Clean and prepare text for TTS processing"""
-    # Remove newlines and extra spaces
-    text = ' '.join(text.split())
-    # Add any other preprocessing steps here if needed
-    return text.strip()
+    # Remove newlines and extra spaces; benchmarks/hotpath_bench.py times this
+    # as text.preprocess, so add any other preprocessing steps there too
+    return normalize_whitespace(text)
 
-def split_into_sentences(text):
-    # Simple sentence splitting
-    return re.split('(?<=[.!?]) +', text)
+def _record_sentence_cache(tally):
+    """Log one request's sentence cache hit ratio and keep it for /api/status."""
+    if not tally["lookups"]:
+        return
+    with _stream_stats_lock:
+        _sentence_cache_last.update(hits=tally["hits"], lookups=tally["lookups"])
+    logger.info(
+        f"Sentence cache: {tally['hits']}/{tally['lookups']} sentences reused "
+        f"({tally['hits'] / tally['lookups']:.0%} hit ratio)"
+    )
 
-def tts_generator(sentences, audio_segments, voice_file):
-    for sentence in sentences:
-        if sentence.strip():  # Skip empty sentences
-            wav = tts.tts(sentence, speaker_wav=voice_file, language="en")
-            audio = np.array(wav)
-            audio_segments.append(audio)  # Collect audio for saving
+def _record_stream(ttfb_ms, total_s, audio_s, incremental):
+    rtf = total_s / audio_s if audio_s else None
+    with _stream_stats_lock:
+        _stream_stats["streams"] += 1
+        _stream_stats["incremental"] += int(incremental)
+        _stream_stats["total_ttfb_ms"] += ttfb_ms or 0.0
+        _stream_stats["total_rtf"] += rtf or 0.0
+        _stream_stats["last"] = {
+            "incremental": incremental,
+            "ttfb_ms": round(ttfb_ms, 1) if ttfb_ms is not None else None,
+            "rtf": round(rtf, 3) if rtf is not None else None,
+        }
+    logger.info(
+        f"Stream finished ({'incremental' if incremental else 'per-sentence'}): ttfb={ttfb_ms or 0:.0f} ms, "
+        f"audio={audio_s:.2f} s, total={total_s:.2f} s, rtf={rtf or 0:.3f}"
+    )
+
+def normalized(audio_blocks, output_rate):
+    """Loudness-normalise one request's audio in a single pass, block by block,
+    and resample it to `output_rate`."""
+    return resample_stream(engine.normalized(audio_blocks), sample_rate, output_rate)
+
+def tts_generator(sentences, pcm, voice, tracker, output_rate=sample_rate):
+    """Synthesise `sentences`, normalise them and convert them into `pcm`.
+
+    The next sentence is synthesised and normalised on a producer thread
+    while this one is converted. `voice` is (voice_id, latents) from
+    XTTSEngine.resolve_voice.
+    """
+    tally = Counter()
+    synthesized = (engine.synthesize_sentence(sentence, voice, tally) for sentence in sentences if sentence.strip())
+    source = tracker.timed(normalized(tracker.timed(synthesized, 'inference'), output_rate), 'encoding')
+    for audio in prefetch(source, LOOKAHEAD, name='xtts-producer'):
+        with tracker.stage('encoding'):
+            pcm.append(audio)
+    _record_sentence_cache(tally)
 
 
 @app.route('/api/tts', methods=['POST'])
 def text_to_speech():
     logger.info(f"Received TTS request from {request.remote_addr}")
+    tracker = metrics.track('tts')
     data = request.json
     text = data.get('text')
-    voice_file = data.get('voice_file', 'voices/default.wav')
 
     if not text:
         logger.error("No text provided in request")
         return jsonify({"error": "Text is required"}), 400
 
     # Preprocess the text
-    text = preprocess_text(text)
-    sentences = split_into_sentences(text)
-    audio_segments = []
+    with tracker.stage('preprocess'):
+        text = preprocess_text(text)
+    with tracker.stage('segmentation'):
+        sentences = engine.split(text)
 
     try:
-        tts_generator(sentences, audio_segments, voice_file)
-        
-        # Concatenate audio segments
-        concatenated_audio = np.concatenate(audio_segments)
-        
-        # Normalize audio
-        max_val = np.max(np.abs(concatenated_audio))
-        if max_val > 0:
-            concatenated_audio = concatenated_audio / max_val
-        
-        # Convert to 16-bit PCM
-        concatenated_audio = (concatenated_audio * 32767).astype(np.int16)
+        with tracker.stage('preprocess'):
+            voice = engine.resolve_voice(data)
+            output_format = negotiate_format(data.get('format'), request.accept_mimetypes) or 'wav'
+            output_rate = output_sample_rate(output_format, parse_sample_rate(data.get('sample_rate'), 0), sample_rate)
+    except ValueError as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 400
+    tracker.voice = voice[0]
+
+    try:
+        # Normalized audio is converted to 16-bit PCM as it is produced
+        pcm = PCMBuffer()
+        tts_generator(sentences, pcm, voice, tracker, output_rate)
         
-        # Create in-memory WAV file
-        import io
-        wav_io = io.BytesIO()
-        with wave.open(wav_io, 'wb') as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(sample_rate)
-            wf.writeframes(concatenated_audio.tobytes())
+        # Encode in the negotiated format (WAV unless asked otherwise)
+        with tracker.stage('encoding'):
+            parts, length, encode_seconds = encode_pcm(pcm, output_rate, output_format)
+        tracker.add_audio(pcm.length / output_rate)
+        tracker.first_audio()
         
-        wav_io.seek(0)
-        logger.info("Successfully generated audio")
-        return send_file(wav_io, mimetype='audio/wav')
+        logger.info(f"Successfully generated audio ({output_format}, {length} bytes, encoded in {encode_seconds * 1000:.1f} ms)")
+        return Response(iter_chunks(parts), mimetype=mimetype_for(output_format), headers={'Content-Length': str(length)})
         
     except Exception as e:
         logger.error(f"Error generating audio: {str(e)}")
@@ -140,53 +208,196 @@ def text_to_speech():
 @app.route('/api/tts/stream', methods=['POST'])
 def text_to_speech_stream():
     logger.info(f"Received streaming TTS request from {request.remote_addr}")
+    started = time.perf_counter()
+    tracker = metrics.track('tts_stream')
     data = request.json
     text = data.get('text')
-    voice_file = data.get('voice_file', 'voices/default.wav')
 
     if not text:
         logger.error("No text provided in request")
         return jsonify({"error": "Text is required"}), 400
 
     # Preprocess the text
-    text = preprocess_text(text)
-    sentences = split_into_sentences(text)
+    with tracker.stage('preprocess'):
+        text = preprocess_text(text)
+    with tracker.stage('segmentation'):
+        sentences = engine.split(text)
 
-    def generate():
+    try:
+        with tracker.stage('preprocess'):
+            voice = engine.resolve_voice(data)
+    except ValueError as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 400
+    tracker.voice = voice[0]
+
+    # A compressed format ('ogg') is encoded incrementally off the inference thread
+    try:
+        output_format, stream_format = negotiate_stream_format(
+            data.get('format'), request.accept_mimetypes, data.get('stream_format'),
+        )
+        output_rate = output_sample_rate(output_format, parse_sample_rate(data.get('sample_rate'), 0), sample_rate)
+    except ValueError as e:
+        logger.error(str(e))
+        return jsonify({"error": str(e)}), 400
+
+    # 'wav_chunks' (default) sends a standalone WAV file per sentence; 'wav', 'pcm'
+    # and 'l16' send one continuous PCM stream (see audio_stream.PCMStream)
+    stream_format = stream_format or 'wav_chunks'
+    pcm_stream = None
+    if stream_format != 'wav_chunks' and not output_format:
+        try:
+            pcm_stream = PCMStream(stream_format, output_rate)
+        except ValueError as e:
+            logger.error(str(e))
+            return jsonify({"error": str(e)}), 400
+
+    # Strings such as "false" (form fields, hand-written JSON) must not count as true
+    incremental = str(data.get('incremental', INCREMENTAL_STREAMING)).lower() in ('1', 'true', 'yes')
+    try:
+        stream_chunk_size = int(data.get('stream_chunk_size', STREAM_CHUNK_SIZE))
+        overlap = int(data.get('overlap', STREAM_OVERLAP_SAMPLES))
+    except (TypeError, ValueError):
+        return jsonify({"error": "stream_chunk_size and overlap must be integers"}), 400
+    if stream_chunk_size < 1 or overlap < 0:
+        return jsonify({"error": "stream_chunk_size must be >= 1 and overlap >= 0"}), 400
+
+    tally = Counter()
+
+    def sentence_audio():
         for sentence in sentences:
             if sentence.strip():
                 try:
-                    wav = tts.tts(sentence, speaker_wav=voice_file, language="en")
-                    audio = np.array(wav)
-                    
-                    # Normalize audio
-                    max_val = np.max(np.abs(audio))
-                    if max_val > 0:
-                        audio = audio / max_val
-                    
-                    # Convert to 16-bit PCM
-                    audio = (audio * 32767).astype(np.int16)
-                    
-                    # Create WAV file for this sentence
-                    wav_io = io.BytesIO()
-                    with wave.open(wav_io, 'wb') as wf:
-                        wf.setnchannels(1)
-                        wf.setsampwidth(2)
-                        wf.setframerate(sample_rate)
-                        wf.writeframes(audio.tobytes())
-                    
-                    wav_io.seek(0)
-                    yield wav_io.getvalue()
+                    audio = engine.synthesize_sentence(sentence, voice, tally)
                 except Exception as e:
                     logger.error(f"Error generating audio for sentence: {str(e)}")
                     continue
+                yield audio
+
+    def incremental_chunks():
+        for sentence in sentences:
+            if sentence.strip():
+                try:
+                    yield from engine.stream_sentence(sentence, voice, tally, stream_chunk_size, overlap)
+                except Exception as e:
+                    logger.error(f"Error generating audio for sentence: {str(e)}")
+
+    def timed_audio():
+        """Audio source for this request, recording time to first audio and real-time factor."""
+        ttfb_ms = None
+        samples = 0
+        # Sentences and chunks are normalised as one continuous stream, to the
+        # same level as /api/tts
+        source = tracker.timed(incremental_chunks() if incremental else sentence_audio(), 'inference')
+        source = tracker.timed(normalized(source, output_rate), 'encoding')
+        # Synthesis runs up to LOOKAHEAD items ahead of encoding and sending
+        for audio in prefetch(source, LOOKAHEAD, name='xtts-producer'):
+            if ttfb_ms is None:
+                ttfb_ms = (time.perf_counter() - started) * 1000.0
+            samples += len(audio)
+            yield audio
+        tracker.add_audio(samples / output_rate)
+        _record_stream(ttfb_ms, time.perf_counter() - started, samples / output_rate, incremental)
+        _record_sentence_cache(tally)
+
+    def generate_encoded():
+        encoder = None
+        try:
+            encoder = StreamEncoder(output_format, output_rate)
+            for chunk in encode_stream(timed_audio(), encoder):
+                tracker.first_audio()
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error encoding audio stream: {str(e)}")
+            return
+        finally:
+            # The encoder runs on its own thread; its time is added once
+            if encoder:
+                tracker.add('encoding', encoder.encode_seconds)
+        logger.info(f"Streamed {output_format} audio: {encoder.bytes_out} bytes, encoded in {encoder.encode_seconds * 1000:.1f} ms")
 
+    if output_format:
+        return Response(generate_encoded(), mimetype=mimetype_for(output_format))
+
+    def generate():
+        if pcm_stream:
+            yield pcm_stream.header()
+        for audio in timed_audio():
+            with tracker.stage('encoding'):
+                if pcm_stream:
+                    chunk = pcm_stream.frames(audio)
+                else:
+                    # Standalone 16-bit WAV file for this sentence
+                    chunk = wav_bytes(audio, output_rate)
+            tracker.first_audio()
+            yield chunk
+
+    if pcm_stream:
+        return Response(generate(), mimetype=pcm_stream.mimetype, headers=pcm_stream.headers)
     return Response(generate(), mimetype='audio/wav')
 
+@app.route('/api/voices', methods=['POST'])
+def register_voice():
+    """Register a reference voice and return an id usable as `voice_id`.
+
+    Accepts a multipart upload in the `voice` field, or JSON with a
+    `voice_file` path on disk.
+    """
+    logger.info(f"Received voice registration from {request.remote_addr}")
+    uploaded_file = request.files.get('voice')
+    try:
+        if uploaded_file:
+            audio_bytes = uploaded_file.read()
+            if not audio_bytes:
+                return jsonify({"error": "Uploaded voice file is empty"}), 400
+            # Store uploads by content hash so re-uploading the same clip is a no-op
+            voice_path = os.path.join('voices', f"{content_hash(audio_bytes)[:16]}.wav")
+            if not os.path.exists(voice_path):
+                os.makedirs('voices', exist_ok=True)
+                with open(voice_path, 'wb') as f:
+                    f.write(audio_bytes)
+        else:
+            data = request.get_json(silent=True) or {}
+            voice_path = data.get('voice_file')
+            if not voice_path:
+                return jsonify({"error": "Upload a 'voice' file or provide 'voice_file'"}), 400
+            if not os.path.isfile(voice_path):
+                return jsonify({"error": f"Voice file not found: {voice_path}"}), 400
+        voice_id = voice_cache.register_file(voice_path)
+        logger.info(f"Registered voice {voice_id} from {voice_path}")
+        return jsonify({"voice_id": voice_id}), 200
+    except Exception as e:
+        logger.error(f"Error registering voice: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/voices', methods=['GET'])
+def list_voices():
+    return jsonify({"voices": voice_cache.list_ids()}), 200
+
+def _start_worker(index):
+    metrics.worker = str(index)
+
 @app.route('/api/status', methods=['GET'])
 def status():
     logger.info(f"Status check from {request.remote_addr}")
-    return jsonify({"status": "running", "device": device}), 200
+    with _stream_stats_lock:
+        streams = _stream_stats["streams"]
+        streaming = {
+            "streams": streams,
+            "incremental": _stream_stats["incremental"],
+            "mean_ttfb_ms": round(_stream_stats["total_ttfb_ms"] / streams, 1) if streams else None,
+            "mean_rtf": round(_stream_stats["total_rtf"] / streams, 3) if streams else None,
+            "last": _stream_stats["last"],
+        }
+        last = dict(_sentence_cache_last)
+    sentences = None
+    if sentence_cache is not None:
+        sentences = sentence_cache.stats()
+        sentences["last_request_hit_ratio"] = round(last["hits"] / last["lookups"], 3) if last["lookups"] else None
+    return jsonify({
+        "status": "running", "device": device, "voice_cache": voice_cache.stats(), "sentence_cache": sentences,
+        "streaming": streaming,
+    }), 200
 
 if __name__ == '__main__':
     # Load environment variables
@@ -202,5 +413,11 @@ if __name__ == '__main__':
     logger.info(f"Starting TTS service on port {port}")
     logger.info(f"Using device: {device}")
     
-    # Run the Flask app 
-    app.run(host='0.0.0.0', port=port)
+    # Run the Flask app, forking TTS_WORKERS processes that share the loaded weights (CPU only)
+    serve_prefork(
+        app, '0.0.0.0', port,
+        workers=int(os.getenv('TTS_WORKERS', 1)),
+        threads_per_worker=int(os.getenv('TTS_THREADS_PER_WORKER', 0)) or None,
+        post_fork=_start_worker,
+        logger=logger,
+    )
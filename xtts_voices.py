@@ -0,0 +1,126 @@
+"""Persistent cache of XTTS speaker-conditioning latents.
+
+XTTS conditions every generation on a GPT latent and a speaker embedding
+computed from the reference WAV. Computing them means loading, resampling
+and encoding the reference audio, so this module computes them once per
+distinct reference file (keyed by the SHA-256 of its contents), keeps the
+hot ones in memory and persists them as `.npz` files so restarts skip the
+encoder pass too.
+"""
+import os
+import re
+import threading
+
+import numpy as np
+import torch
+
+from cache_utils import LRUCache, content_hash
+
+VOICE_ID_LENGTH = 16
+_VOICE_ID_RE = re.compile(r'^[0-9a-f]{%d}$' % VOICE_ID_LENGTH)
+# Reference files whose voice id is remembered without re-hashing
+MAX_FILE_IDS = 1024
+
+
+class VoiceLatentCache:
+    """Compute-once store for (gpt_cond_latent, speaker_embedding) pairs."""
+
+    def __init__(self, model, cache_dir, max_entries=32):
+        self.model = model
+        self.cache_dir = cache_dir
+        self._memory = LRUCache(max_entries)
+        # (path, mtime, size) -> voice id, so unchanged files are not re-hashed.
+        # Its own lock, not self._lock, so lookups never wait behind a latent computation
+        self._file_ids = LRUCache(MAX_FILE_IDS)
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def is_voice_id(value):
+        return isinstance(value, str) and bool(_VOICE_ID_RE.match(value))
+
+    def _npz_path(self, voice_id):
+        return os.path.join(self.cache_dir, f"{voice_id}.npz")
+
+    def _file_voice_id(self, path):
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        voice_id = self._file_ids.get(key)
+        if voice_id is None:
+            with open(path, 'rb') as f:
+                voice_id = content_hash(f.read())[:VOICE_ID_LENGTH]
+            self._file_ids.put(key, voice_id)
+        return voice_id
+
+    def _load(self, voice_id):
+        latents = self._memory.get(voice_id)
+        if latents is not None:
+            return latents
+        npz_path = self._npz_path(voice_id)
+        if not os.path.exists(npz_path):
+            return None
+        with np.load(npz_path) as data:
+            latents = (
+                torch.from_numpy(data['gpt_cond_latent']).to(self.model.device),
+                torch.from_numpy(data['speaker_embedding']).to(self.model.device),
+            )
+        self._memory.put(voice_id, latents)
+        return latents
+
+    def _compute(self, voice_id, path):
+        config = self.model.config
+        gpt_cond_latent, speaker_embedding = self.model.get_conditioning_latents(
+            audio_path=[path],
+            gpt_cond_len=config.gpt_cond_len,
+            gpt_cond_chunk_len=config.gpt_cond_chunk_len,
+            max_ref_length=config.max_ref_len,
+            sound_norm_refs=config.sound_norm_refs,
+        )
+        # Write to a temp name first so a crash never leaves a truncated cache file
+        tmp_path = self._npz_path(voice_id) + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            gpt_cond_latent=gpt_cond_latent.detach().cpu().numpy(),
+            speaker_embedding=speaker_embedding.detach().cpu().numpy(),
+        )
+        os.replace(tmp_path, self._npz_path(voice_id))
+        latents = (gpt_cond_latent, speaker_embedding)
+        self._memory.put(voice_id, latents)
+        return latents
+
+    def _get_or_compute(self, voice_id, path):
+        latents = self._load(voice_id)
+        if latents is None:
+            with self._lock:
+                # Another request may have computed it while we waited
+                latents = self._load(voice_id)
+                if latents is None:
+                    latents = self._compute(voice_id, path)
+        return latents
+
+    def register_file(self, path):
+        """Ensure latents exist for the reference WAV at `path` and return its voice id."""
+        voice_id = self._file_voice_id(path)
+        self._get_or_compute(voice_id, path)
+        return voice_id
+
+    def get(self, voice_id):
+        """Return cached latents for a registered voice id, or None if unknown."""
+        if not self.is_voice_id(voice_id):
+            return None
+        return self._load(voice_id)
+
+    def get_for_file(self, path):
+        """Return latents for the reference WAV at `path`, computing them on first use."""
+        return self._get_or_compute(self._file_voice_id(path), path)
+
+    def list_ids(self):
+        return sorted(
+            name[:-len('.npz')] for name in os.listdir(self.cache_dir)
+            if name.endswith('.npz') and self.is_voice_id(name[:-len('.npz')])
+        )
+
+    def stats(self):
+        stats = self._memory.stats()
+        stats["persisted"] = len(self.list_ids())
+        return stats